@@ -1,17 +1,63 @@
-"""CCUPP - Chinese Common User Passwords Profiler."""
+"""CCUPP - Chinese Common User Passwords Profiler.
+
+The public names below are imported on first access (PEP 562), so
+``import ccupp`` and the CLI's startup do not pay for pydantic, pypinyin
+and the generation engine until they are actually used.
+"""
+from __future__ import annotations
+
+from importlib import import_module
+from typing import Any
+from typing import TYPE_CHECKING
 
 __version__ = '0.1.0'
 
-from ccupp.api import generate_passwords
-from ccupp.config import load_profiles
-from ccupp.extractors.components import extract_components
-from ccupp.generator import PasswordGenerator
-from ccupp.models import Profile
+if TYPE_CHECKING:
+    from ccupp.api import estimate_passwords
+    from ccupp.api import generate_hybrid
+    from ccupp.api import generate_passwords
+    from ccupp.api import generate_rules
+    from ccupp.config import load_profiles
+    from ccupp.extractors.components import extract_components
+    from ccupp.generator import PasswordGenerator
+    from ccupp.models import Profile
+    from ccupp.stats import GenerationStats
+
+# Public name -> module defining it
+_EXPORTS = {
+    'GenerationStats': 'ccupp.stats',
+    'Profile': 'ccupp.models',
+    'PasswordGenerator': 'ccupp.generator',
+    'estimate_passwords': 'ccupp.api',
+    'extract_components': 'ccupp.extractors.components',
+    'generate_hybrid': 'ccupp.api',
+    'generate_passwords': 'ccupp.api',
+    'generate_rules': 'ccupp.api',
+    'load_profiles': 'ccupp.config',
+}
 
 __all__ = [
+    'GenerationStats',
     'Profile',
     'PasswordGenerator',
+    'estimate_passwords',
     'extract_components',
+    'generate_hybrid',
     'generate_passwords',
+    'generate_rules',
     'load_profiles',
 ]
+
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(module), name)
+    # Cache it, so later lookups skip this hook
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *_EXPORTS])
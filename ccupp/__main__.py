@@ -1,21 +1,53 @@
-"""CCUPP CLI — Chinese Common User Passwords Profiler."""
+"""CCUPP CLI — Chinese Common User Passwords Profiler.
+
+Only the standard library, typer and the light ccupp modules are imported
+at startup; rich, structlog, yaml, pydantic and the generation engine are
+imported by the commands that use them, so ``ccupp --help`` and argument
+errors come back quickly.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
 import json
+import os
 import sys
+import time
+import tracemalloc
 from collections import Counter
+from collections.abc import Iterator
 from importlib import resources
 from pathlib import Path
 from typing import Any
+from typing import BinaryIO
+from typing import TYPE_CHECKING
 
-import structlog
 import typer
-import yaml
-from pydantic import ValidationError
-from rich.console import Console
-from rich.table import Table
 
-from ccupp.config import load_profiles
-from ccupp.extractors.components import extract_components
-from ccupp.generator import PasswordGenerator
+from ccupp.affixes import DEFAULT_TOP
+from ccupp.checkpoint import Checkpoint
+from ccupp.checkpoint import SAVE_INTERVAL
+from ccupp.dedup import CuckooFilter
+from ccupp.dedup import Deduplicator
+from ccupp.dedup import DEFAULT_FP_RATE
+from ccupp.dedup import make_deduplicator
+from ccupp.dedup import parse_size
+from ccupp.metrics import DEFAULT_PROGRESS_INTERVAL
+from ccupp.metrics import ProgressTracker
+from ccupp.ngram import DEFAULT_ORDER
+from ccupp.ngram import MAX_ORDER
+from ccupp.ngram import NgramModel
+from ccupp.output import DEFAULT_BUFFER_SIZE
+from ccupp.output import open_writer
+from ccupp.output import OUTPUT_FORMATS
+from ccupp.output import PasswordWriter
+from ccupp.policy import PasswordPolicy
+from ccupp.stats import GenerationStats
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+    from ccupp.models import Profile
 
 app = typer.Typer(
     name='ccupp',
@@ -75,8 +107,14 @@ BENCHMARK_SETUP_GUIDE = """[bold cyan]Benchmark Setup Guide[/bold cyan]
   This computes Success Rate @ N, Guess Number, Guess Curve,
   and compares with published results from TarGuess, RFGuess, PassLLM, etc.
 """
-logger = structlog.get_logger()
-console = Console(stderr=True)
+
+
+@functools.cache
+def _console() -> Console:
+    """The rich console for messages, on stderr (stdout is reserved for passwords)."""
+    from rich.console import Console
+
+    return Console(stderr=True)
 
 
 def _get_resource(filename: str) -> str:
@@ -94,7 +132,10 @@ def generate(
         None, '--output', '-o', help='Output file path (default: stdout)',
     ),
     format: str = typer.Option(
-        'txt', '--format', '-f', help='Output format: txt, json',
+        'txt', '--format', '-f',
+        help='Output format: txt, jsonl, json, hashcat-rules (base words to -o plus a .rule file next to it) '
+        'or hashcat-hybrid (word stems to -o plus .append/.prepend.hcmask tail masks next to it); '
+        'both also write each profile\'s joined words to a .joined.txt file',
     ),
     min_length: int = typer.Option(
         0, '--min-length', help='Minimum password length',
@@ -102,6 +143,15 @@ def generate(
     max_length: int = typer.Option(
         0, '--max-length', help='Maximum password length (0 = unlimited)',
     ),
+    require: str = typer.Option(
+        None, '--require', help='Character classes every password must contain, e.g. digit,upper (digit, lower, upper, special)',
+    ),
+    forbid: str = typer.Option(
+        '', '--forbid', help='Characters no password may contain',
+    ),
+    pattern: str = typer.Option(
+        None, '--pattern', help='Regex every password must match (anchor with ^...$ for a full match)',
+    ),
     no_leetspeak: bool = typer.Option(
         False, '--no-leetspeak', help='Disable leetspeak transforms',
     ),
@@ -111,74 +161,405 @@ def generate(
     no_keyboard: bool = typer.Option(
         False, '--no-keyboard', help='Disable keyboard pattern generation',
     ),
+    scored: bool = typer.Option(
+        False, '--scored', help='Emit candidates in descending estimated probability across all rule families',
+    ),
+    budget: int = typer.Option(
+        0, '--budget', min=0,
+        help='At most this many guesses per profile, split between rule families by expected yield (0 = no budget)',
+    ),
+    weights: str = typer.Option(
+        None, '--weights', help='Rule ordering learned by train-order (reorders families, affix tables and category pairs)',
+    ),
+    ngram_model: str = typer.Option(
+        None, '--ngram-model', help='n-gram model from train-ngram: emit each rule family most human-like first',
+    ),
+    affixes: str = typer.Option(
+        None, '--affixes', help='Affix file from mine-affixes (replaces the suffix, prefix, delimiter and lucky-number tables)',
+    ),
+    widen_tails: bool = typer.Option(
+        False, '--widen-tails', help='hashcat-hybrid: mask suffixes and lucky numbers by shape (123 → ?d?d?d), not literally',
+    ),
     stats: bool = typer.Option(
         False, '--stats', help='Print generation statistics to stderr',
     ),
+    profile: bool = typer.Option(
+        False, '--profile', help='Print per-family counts and timings and pinyin time to stderr',
+    ),
+    trace_memory: bool = typer.Option(
+        False, '--trace-memory',
+        help='Like --profile, plus peak memory traced by tracemalloc (slows the run, so the timings are inflated)',
+    ),
+    limit: int = typer.Option(
+        0, '--limit', '-n', help='Stop after this many unique passwords (0 = unlimited)',
+    ),
+    dedup_backend: str = typer.Option(
+        'exact', '--dedup',
+        help='Dedup backend: exact, bloom, cuckoo (fixed memory, approximate), external (exact, spills to disk)',
+    ),
+    dedup_memory: str = typer.Option(
+        '64M', '--dedup-memory', help='Memory cap for bloom/cuckoo/external dedup, e.g. 256M, 1G',
+    ),
+    dedup_fp_rate: float = typer.Option(
+        DEFAULT_FP_RATE, '--dedup-fp-rate', help='Target false-positive rate for bloom/cuckoo dedup',
+    ),
+    shard: str = typer.Option(
+        None, '--shard', help='Only produce shard i of k, e.g. 1/4 (1-based); all k shards together give the full output',
+    ),
+    workers: int = typer.Option(
+        1, '--workers', '-j', min=1, help='Generate profiles in this many worker processes',
+    ),
+    skip: int = typer.Option(
+        0, '--skip', min=0, help='Start at this raw plan position (candidates before dedup)',
+    ),
+    resume_from: str = typer.Option(
+        None, '--resume-from', help='Checkpoint file: resume from it if it exists, and keep it updated',
+    ),
+    pipe: bool = typer.Option(
+        False, '--pipe', help='Write raw newline-separated batches to stdout for a cracker to read, e.g. hashcat',
+    ),
+    progress_interval: float = typer.Option(
+        DEFAULT_PROGRESS_INTERVAL, '--progress-interval', min=0,
+        help='Seconds between structured progress events on stderr (0 = only the final one)',
+    ),
+    metrics_file: str = typer.Option(
+        None, '--metrics-file',
+        help='Keep progress metrics in this file: Prometheus text if it ends in .prom (node-exporter textfile collector), else JSON',
+    ),
+    pinyin_cache: str = typer.Option(
+        None, '--pinyin-cache', envvar='CCUPP_PINYIN_CACHE',
+        help='Persistent pinyin cache file shared across runs (created if missing)',
+    ),
 ) -> None:
     """Generate passwords based on user profile information."""
-    # Load profiles
+    import structlog
+
+    from ccupp.affixes import AffixTables
+    from ccupp.api import generate_passwords
+    from ccupp.hybrid import HYBRID_FORMAT
+    from ccupp.rules import RULES_FORMAT
+    from ccupp.weights import OrderWeights
+
+    _configure_logging()
+    profiles = _load_profiles_or_exit(config)
+
+    if format == RULES_FORMAT:
+        _export_rules(profiles, output, no_leetspeak, no_cultural, no_keyboard)
+        return
+    if format == HYBRID_FORMAT:
+        _export_hybrid(profiles, output, no_cultural, widen_tails)
+        return
+    if format not in OUTPUT_FORMATS:
+        formats = ', '.join((*OUTPUT_FORMATS, RULES_FORMAT, HYBRID_FORMAT))
+        _console().print(f'[red]Error:[/red] Unknown format: {format} (use {formats})')
+        sys.exit(1)
+    if pipe and (output or format != 'txt'):
+        _console().print('[red]Error:[/red] --pipe writes plain text to stdout; drop --output/--format')
+        sys.exit(1)
+    if ngram_model and scored:
+        _console().print('[red]Error:[/red] --ngram-model reorders rule families, which --scored merges; use one')
+        sys.exit(1)
+
+    try:
+        dedup = make_deduplicator(dedup_backend, parse_size(dedup_memory), dedup_fp_rate)
+        shard_index, num_shards = _parse_shard(shard) if shard else (0, 1)
+        checkpoint = _load_checkpoint(resume_from, skip) if resume_from else None
+        policy = PasswordPolicy.from_options(
+            min_length, max_length, require.split(',') if require else (), forbid, pattern,
+        )
+        order_weights = OrderWeights.load(weights) if weights else None
+        ngram = NgramModel.load(ngram_model) if ngram_model else None
+        affix_tables = AffixTables.load(affixes) if affixes else None
+    except (ValueError, FileNotFoundError) as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+
+    # Resuming appends to the output left by the interrupted run
+    resuming = checkpoint is not None and checkpoint.emitted > 0
+    if resuming and format == 'json':
+        _console().print('[red]Error:[/red] Cannot resume json output (use txt or jsonl)')
+        sys.exit(1)
+    if checkpoint is not None and checkpoint.position != skip:
+        _console().print(f'[dim]Resuming at plan position {checkpoint.position:,}[/dim]')
+
+    # Generate passwords (deduplicated across all profiles), streaming them
+    # to the output as they are produced
+    length_counter: Counter[str] | None = Counter() if stats else None
+    generation_stats = GenerationStats() if profile or trace_memory else None
+    options: dict[str, Any] = dict(
+        policy=policy,
+        enable_leetspeak=not no_leetspeak,
+        enable_cultural_numbers=not no_cultural,
+        enable_keyboard_patterns=not no_keyboard,
+        scored=scored,
+        budget=budget,
+        weights=order_weights,
+        ngram=ngram,
+        affixes=affix_tables,
+        limit=limit,
+        dedup=dedup,
+        shard_index=shard_index,
+        num_shards=num_shards,
+        workers=workers,
+        start=checkpoint.position if checkpoint is not None else skip,
+        checkpoint=checkpoint,
+        stats=generation_stats,
+        pinyin_cache=pinyin_cache,
+    )
+    progress = ProgressTracker(
+        len(profiles), structlog.get_logger().info, progress_interval, metrics_file,
+        dedup if isinstance(dedup, Deduplicator) else None,
+    )
+    # Tracing every allocation slows generation down, so only on request
+    if trace_memory:
+        tracemalloc.start()
+    if pipe:
+        batches = generate_passwords(_track_profiles(profiles, progress), as_bytes=True, **options)
+        total = _pipe_batches(batches, checkpoint, resume_from, length_counter, progress)
+    else:
+        candidates = generate_passwords(_track_profiles(profiles, progress), **options)
+        total = _write_passwords(
+            candidates, format, output, resuming, checkpoint, resume_from, length_counter, progress,
+        )
+    if trace_memory:
+        tracemalloc.stop()
+    progress.written(total)
+    progress.report('generation.finished')
+
+    if isinstance(dedup, CuckooFilter) and dedup.overflowed:
+        _console().print(
+            f'[yellow]Warning:[/yellow] cuckoo filter overflowed {dedup.overflowed:,} times; '
+            'some duplicates may have been written (raise --dedup-memory)',
+        )
+
+    # Statistics
+    if generation_stats is not None:
+        _print_profile(generation_stats)
+    if length_counter is not None:
+        _print_stats(total, length_counter)
+    elif output:
+        _console().print(f'[green]Generated {total} unique passwords → {output}[/green]')
+
+
+def _export_rules(
+    profiles: list[Profile],
+    output: str | None,
+    no_leetspeak: bool,
+    no_cultural: bool,
+    no_keyboard: bool,
+) -> None:
+    """Write base words to ``output`` and hashcat rules next to it."""
+    from ccupp.api import generate_rules
+
+    if not output:
+        _console().print('[red]Error:[/red] hashcat-rules needs --output for the word list (the .rule file goes next to it)')
+        sys.exit(1)
+    rule_set = generate_rules(
+        profiles,
+        enable_leetspeak=not no_leetspeak,
+        enable_cultural_numbers=not no_cultural,
+        enable_keyboard_patterns=not no_keyboard,
+    )
+    rules_path = Path(output).with_suffix('.rule')
+    joined_path = Path(output).with_suffix('.joined.txt')
+    rule_set.write(output, rules_path, joined_path)
+    _console().print(
+        f'[green]Wrote {len(rule_set.words)} base words → {output}, '
+        f'{len(rule_set.rules)} rules → {rules_path} '
+        f'and {len(rule_set.joined)} joined words → {joined_path}[/green]',
+    )
+    _console().print(f'[dim]hashcat -a 0 <hashes> {output} -r {rules_path}[/dim]')
+    _console().print(f'[dim]hashcat -a 0 <hashes> {joined_path}[/dim]')
+
+
+def _export_hybrid(profiles: list[Profile], output: str | None, no_cultural: bool, widen_tails: bool) -> None:
+    """Write word stems to ``output`` and the tail masks and joined words next to it."""
+    from ccupp.api import generate_hybrid
+
+    if not output:
+        _console().print('[red]Error:[/red] hashcat-hybrid needs --output for the word list (the .hcmask files go next to it)')
+        sys.exit(1)
+    attack = generate_hybrid(profiles, enable_cultural_numbers=not no_cultural, widen_tails=widen_tails)
+    append_path = Path(output).with_suffix('.append.hcmask')
+    prepend_path = Path(output).with_suffix('.prepend.hcmask')
+    joined_path = Path(output).with_suffix('.joined.txt')
+    attack.write(output, append_path, prepend_path, joined_path)
+    _console().print(
+        f'[green]Wrote {len(attack.words)} word stems → {output}, '
+        f'{len(attack.append_masks)} append masks → {append_path}, '
+        f'{len(attack.prepend_masks)} prepend masks → {prepend_path} '
+        f'and {len(attack.joined)} joined words → {joined_path}[/green]',
+    )
+    _console().print(f'[dim]hashcat -a 6 <hashes> {output} {append_path}[/dim]')
+    _console().print(f'[dim]hashcat -a 7 <hashes> {prepend_path} {output}[/dim]')
+    _console().print(f'[dim]hashcat -a 0 <hashes> {joined_path}[/dim]')
+
+
+def _write_passwords(
+    passwords: Iterator[str],
+    format: str,
+    output: str | None,
+    append: bool,
+    checkpoint: Checkpoint | None,
+    checkpoint_path: str,
+    length_counter: Counter[str] | None,
+    progress: ProgressTracker,
+) -> int:
+    """Stream passwords to the output file (or stdout); return how many were written."""
+    if not output:
+        stream: BinaryIO = sys.stdout.buffer
+    elif append:
+        stream = open(output, 'ab', buffering=DEFAULT_BUFFER_SIZE)
+    else:
+        stream = open(output, 'wb', buffering=DEFAULT_BUFFER_SIZE)
+    emitted = checkpoint.emitted if checkpoint is not None else 0
+    written = 0
+    next_save = time.monotonic() + SAVE_INTERVAL
+    # None until created, so an error creating it is not masked below
+    writer: PasswordWriter | None = None
+    try:
+        writer = open_writer(format, stream)
+        with writer:
+            for pw in passwords:
+                writer.write(pw)
+                if length_counter is not None:
+                    bucket = _length_bucket(len(pw))
+                    length_counter[bucket] += 1
+                if writer.count == written:
+                    continue
+                # A batch went out. Save only then, once it is flushed past
+                # the stream buffer, so the checkpoint never runs ahead of
+                # the output
+                written = writer.count
+                progress.written(written)
+                if checkpoint is not None:
+                    if time.monotonic() >= next_save:
+                        stream.flush()
+                        checkpoint.emitted = emitted + written
+                        checkpoint.save(checkpoint_path)
+                        next_save = time.monotonic() + SAVE_INTERVAL
+    finally:
+        count = writer.count if writer is not None else 0
+        if output:
+            stream.close()
+        if checkpoint is not None:
+            checkpoint.emitted = emitted + count
+            checkpoint.save(checkpoint_path)
+    return count
+
+
+def _pipe_batches(
+    batches: Iterator[bytes],
+    checkpoint: Checkpoint | None,
+    checkpoint_path: str,
+    length_counter: Counter[str] | None,
+    progress: ProgressTracker,
+) -> int:
+    """Write pre-encoded batches straight to stdout; return the passwords written.
+
+    Each batch goes out in a single write, which blocks while the reader
+    is busy and so holds generation back too. A reader that exits early
+    (say, hashcat has cracked every hash) ends the run quietly.
+    """
+    out = sys.stdout.buffer
+    emitted = checkpoint.emitted if checkpoint is not None else 0
+    written = 0
+    next_save = time.monotonic() + SAVE_INTERVAL
+    try:
+        for batch in batches:
+            out.write(batch)
+            written += batch.count(b'\n')
+            progress.written(written)
+            if length_counter is not None:
+                for pw in batch.decode('utf-8').split('\n')[:-1]:
+                    length_counter[_length_bucket(len(pw))] += 1
+            if checkpoint is not None and time.monotonic() >= next_save:
+                out.flush()
+                checkpoint.emitted = emitted + written
+                checkpoint.save(checkpoint_path)
+                next_save = time.monotonic() + SAVE_INTERVAL
+        out.flush()
+    except BrokenPipeError:
+        # Point stdout at /dev/null so the final flush at exit cannot fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, out.fileno())
+    finally:
+        if checkpoint is not None:
+            checkpoint.emitted = emitted + written
+            checkpoint.save(checkpoint_path)
+    return written
+
+
+def _load_profiles_or_exit(config: str) -> list[Profile]:
+    """Load profiles from a YAML config, exiting with a message on failure."""
+    import yaml
+    from pydantic import ValidationError
+
+    from ccupp.config import load_profiles
+
     try:
         profiles = load_profiles(config)
-        console.print(f'[dim]Loaded {len(profiles)} profile(s) from {config}[/dim]')
+        _console().print(f'[dim]Loaded {len(profiles)} profile(s) from {config}[/dim]')
     except FileNotFoundError:
-        console.print(f'[red]Error:[/red] Configuration file not found: {config}')
-        console.print('[yellow]Hint:[/yellow] Use [cyan]ccupp init[/cyan] to generate an example config file')
+        _console().print(f'[red]Error:[/red] Configuration file not found: {config}')
+        _console().print('[yellow]Hint:[/yellow] Use [cyan]ccupp init[/cyan] to generate an example config file')
         sys.exit(1)
     except yaml.YAMLError as e:
-        console.print(f'[red]Error:[/red] Invalid YAML: {e}')
+        _console().print(f'[red]Error:[/red] Invalid YAML: {e}')
         sys.exit(1)
     except ValidationError as e:
-        console.print(f'[red]Error:[/red] Configuration validation failed:\n{e}')
+        _console().print(f'[red]Error:[/red] Configuration validation failed:\n{e}')
         sys.exit(1)
+    return profiles
 
-    # Generate passwords
-    seen: set[str] = set()
-    passwords: list[str] = []
-    length_counter: Counter[str] = Counter()
-
-    for idx, profile in enumerate(profiles, 1):
-        console.print(f'[dim]Processing profile {idx}/{len(profiles)}: {profile.surname}{profile.first_name or ""}[/dim]')
-        components = extract_components(profile)
 
-        generator = PasswordGenerator(
-            components=components,
-            enable_leetspeak=not no_leetspeak,
-            enable_cultural_numbers=not no_cultural,
-            enable_keyboard_patterns=not no_keyboard,
-        )
+def _load_checkpoint(path: str, skip: int) -> Checkpoint:
+    """Load a checkpoint to resume from, or start a new one at ``skip``."""
+    try:
+        return Checkpoint.load(path)
+    except FileNotFoundError:
+        return Checkpoint(position=skip)
 
-        for pw in generator.generate():
-            # Apply length filters
-            if min_length and len(pw) < min_length:
-                continue
-            if max_length and len(pw) > max_length:
-                continue
-            # Dedup across all profiles
-            if pw not in seen:
-                seen.add(pw)
-                passwords.append(pw)
-                if stats:
-                    bucket = _length_bucket(len(pw))
-                    length_counter[bucket] += 1
 
-    # Output
-    out = open(output, 'w', encoding='utf-8') if output else sys.stdout
+def _parse_shard(text: str) -> tuple[int, int]:
+    """Parse a 1-based ``i/k`` shard spec into a 0-based (index, count) pair."""
+    index, sep, count = text.partition('/')
     try:
-        if format == 'json':
-            json.dump(passwords, out, ensure_ascii=False, indent=2)
-            out.write('\n')
-        else:
-            for pw in passwords:
-                out.write(pw + '\n')
-    finally:
-        if output:
-            out.close()
+        shard_index, num_shards = int(index) - 1, int(count)
+    except ValueError:
+        raise ValueError(f'Invalid shard: {text!r} (expected i/k, e.g. 1/4)') from None
+    if not sep or num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f'Invalid shard: {text!r} (expected i/k with 1 <= i <= k)')
+    return shard_index, num_shards
 
-    # Statistics
-    if stats:
-        _print_stats(len(passwords), length_counter)
-    elif output:
-        console.print(f'[green]Generated {len(passwords)} unique passwords → {output}[/green]')
+
+def _track_profiles(profiles: list[Profile], progress: ProgressTracker) -> Iterator[Profile]:
+    """Yield profiles, counting each one as generation reaches it."""
+    for profile in profiles:
+        progress.profile_started()
+        yield profile
+
+
+def _configure_logging() -> None:
+    """Send structlog events to stderr: human-readable on a terminal, else JSON lines.
+
+    Configured per command, so the events follow whatever ``sys.stderr``
+    is at the time (stdout is reserved for passwords).
+    """
+    import structlog
+
+    renderer: Any = (
+        structlog.dev.ConsoleRenderer() if sys.stderr.isatty()
+        else structlog.processors.JSONRenderer()
+    )
+    structlog.configure(
+        processors=[
+            structlog.processors.add_log_level,
+            structlog.processors.TimeStamper(fmt='iso'),
+            renderer,
+        ],
+        logger_factory=structlog.PrintLoggerFactory(sys.stderr),
+    )
 
 
 def _length_bucket(length: int) -> str:
@@ -197,13 +578,15 @@ def _length_bucket(length: int) -> str:
 
 def _print_stats(total: int, length_counter: Counter[str]) -> None:
     """Print generation statistics."""
-    console.print()
+    from rich.table import Table
+
+    _console().print()
     table = Table(title='Generation Statistics')
     table.add_column('Metric', style='cyan')
     table.add_column('Value', style='green', justify='right')
 
     table.add_row('Total passwords', str(total))
-    console.print(table)
+    _console().print(table)
 
     if length_counter:
         len_table = Table(title='Length Distribution')
@@ -216,7 +599,378 @@ def _print_stats(total: int, length_counter: Counter[str]) -> None:
             pct = f'{count / total * 100:.1f}%'
             len_table.add_row(bucket, str(count), pct)
 
-        console.print(len_table)
+        _console().print(len_table)
+
+
+def _print_profile(stats: GenerationStats) -> None:
+    """Print the per-family profile of a generation run."""
+    from rich.table import Table
+
+    _console().print()
+    table = Table(title='Generation Profile')
+    table.add_column('Family', style='cyan')
+    table.add_column('Candidates', justify='right')
+    table.add_column('Filtered', justify='right')
+    table.add_column('Duplicates', justify='right')
+    table.add_column('Emitted', justify='right', style='green')
+    table.add_column('Wall', justify='right', style='yellow')
+    table.add_column('CPU', justify='right', style='yellow')
+    for fam in stats.families.values():
+        table.add_row(
+            fam.family, f'{fam.candidates:,}', f'{fam.filtered + fam.other_shards:,}',
+            f'{fam.duplicates:,}', f'{fam.emitted:,}',
+            f'{fam.wall_time:.3f}s', f'{fam.cpu_time:.3f}s',
+        )
+    _console().print(table)
+
+    totals = Table(title='Run Totals')
+    totals.add_column('Metric', style='cyan')
+    totals.add_column('Value', style='green', justify='right')
+    totals.add_row('Emitted', f'{stats.emitted:,}')
+    totals.add_row('Cross-profile duplicates', f'{stats.cross_profile_duplicates:,}')
+    totals.add_row('Wall time', f'{stats.wall_time:.3f}s')
+    totals.add_row('CPU time', f'{stats.cpu_time:.3f}s')
+    totals.add_row('Component extraction', f'{stats.extract_time:.3f}s')
+    totals.add_row('Pinyin conversion', f'{stats.pinyin_time:.3f}s ({stats.pinyin_calls:,} words)')
+    if stats.peak_memory:
+        totals.add_row('Peak traced memory', f'{stats.peak_memory / 2**20:.1f} MiB')
+    _console().print(totals)
+
+
+@app.command()
+def estimate(
+    config: str = typer.Option(
+        'config.yaml', '--config', '-c', help='Path to YAML configuration file',
+    ),
+    min_length: int = typer.Option(
+        0, '--min-length', help='Minimum password length',
+    ),
+    max_length: int = typer.Option(
+        0, '--max-length', help='Maximum password length (0 = unlimited)',
+    ),
+    no_leetspeak: bool = typer.Option(
+        False, '--no-leetspeak', help='Disable leetspeak transforms',
+    ),
+    no_cultural: bool = typer.Option(
+        False, '--no-cultural', help='Disable Chinese cultural number patterns',
+    ),
+    no_keyboard: bool = typer.Option(
+        False, '--no-keyboard', help='Disable keyboard pattern generation',
+    ),
+    scored: bool = typer.Option(
+        False, '--scored', help='Estimate for generate --scored (fixed per-family budget quotas)',
+    ),
+    budget: int = typer.Option(
+        0, '--budget', min=0, help='At most this many guesses per profile (0 = no budget)',
+    ),
+    weights: str = typer.Option(
+        None, '--weights', help='Rule ordering learned by train-order',
+    ),
+    affixes: str = typer.Option(
+        None, '--affixes', help='Affix file from mine-affixes',
+    ),
+    as_json: bool = typer.Option(
+        False, '--json', help='Print the estimate as JSON to stdout',
+    ),
+) -> None:
+    """Estimate how many passwords generate would produce, without generating them.
+
+    Counts before dedup are exact; the unique count is an upper bound.
+    Only length is counted: --require, --forbid and --pattern can only
+    lower the count, so they are not taken here.
+    """
+    from rich.console import Console
+    from rich.table import Table
+
+    from ccupp.affixes import AffixTables
+    from ccupp.api import estimate_passwords
+    from ccupp.weights import OrderWeights
+
+    profiles = _load_profiles_or_exit(config)
+
+    try:
+        order_weights = OrderWeights.load(weights) if weights else None
+        affix_tables = AffixTables.load(affixes) if affixes else None
+    except (ValueError, FileNotFoundError) as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+
+    result = estimate_passwords(
+        profiles,
+        min_length=min_length,
+        max_length=max_length,
+        enable_leetspeak=not no_leetspeak,
+        enable_cultural_numbers=not no_cultural,
+        enable_keyboard_patterns=not no_keyboard,
+        scored=scored,
+        budget=budget,
+        weights=order_weights,
+        affixes=affix_tables,
+    )
+
+    if as_json:
+        data = {
+            'families': {
+                name: {
+                    'candidates': fam.candidates,
+                    'in_length': fam.in_length,
+                    'max_unique': fam.max_unique,
+                }
+                for name, fam in result.families.items()
+            },
+            'candidates': result.candidates,
+            'in_length': result.in_length,
+            'max_unique': result.max_unique,
+        }
+        sys.stdout.write(json.dumps(data, indent=2) + '\n')
+        return
+
+    table = Table(title=f'Estimate for {len(profiles)} profile(s)')
+    table.add_column('Family', style='cyan')
+    table.add_column('Candidates', justify='right')
+    table.add_column('In length range', justify='right', style='green')
+    table.add_column('Unique (≤)', justify='right', style='yellow')
+    for name, fam in result.families.items():
+        table.add_row(name, f'{fam.candidates:,}', f'{fam.in_length:,}', f'{fam.max_unique:,}')
+    table.add_row(
+        '[bold]total[/bold]',
+        f'{result.candidates:,}', f'{result.in_length:,}', f'{result.max_unique:,}',
+    )
+    Console().print(table)
+
+
+@app.command()
+def train_order(
+    dataset: str = typer.Argument(..., help='PII-password paired dataset (JSONL/CSV) to learn from'),
+    output: str = typer.Option(
+        'weights.json', '--output', '-o', help='Weights file to write (use with generate --weights)',
+    ),
+    workers: int = typer.Option(
+        1, '--workers', '-j', min=1, help='Measure records in this many worker processes',
+    ),
+    max_records: int = typer.Option(
+        0, '--max-records', min=0, help='Only learn from the first N records (0 = all)',
+    ),
+) -> None:
+    """Learn which rule families, affixes and category pairs crack a population first.
+
+    Streams the dataset, records which family and table entries produce each
+    target and at what rank, and writes a weights file that generate --weights
+    uses to reorder its rules.
+    """
+    from itertools import islice
+
+    from rich.table import Table
+
+    from ccupp.benchmark.datasets import iter_paired_dataset
+    from ccupp.training import train_order as measure
+
+    try:
+        records = iter_paired_dataset(dataset)
+    except (FileNotFoundError, ValueError) as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+    if max_records:
+        records = islice(records, max_records)
+    weights = measure(records, workers=workers).to_weights()
+    weights.save(output)
+
+    table = Table(title=f'{weights.cracked:,} of {weights.records:,} targets cracked')
+    table.add_column('Family', style='cyan')
+    table.add_column('Hits', justify='right', style='green')
+    table.add_column('Mean rank', justify='right')
+    table.add_column('Weight', justify='right', style='yellow')
+    for name in weights.family_order:
+        fam = weights.families[name]
+        table.add_row(name, f'{fam.hits:,}', f'{fam.mean_rank:,.1f}', f'{fam.weight:.4f}')
+    _console().print(table)
+    _console().print(f'[green]Wrote rule ordering → {output}[/green]')
+
+
+@app.command()
+def train_ngram(
+    wordlist: str = typer.Argument(..., help='Password list to learn from (one per line, plain or .gz)'),
+    output: str = typer.Option(
+        'ngram.bin', '--output', '-o', help='Model file to write (use with generate --ngram-model)',
+    ),
+    order: int = typer.Option(
+        DEFAULT_ORDER, '--order', min=2, max=MAX_ORDER, help='Characters per n-gram',
+    ),
+    max_passwords: int = typer.Option(
+        0, '--max-passwords', min=0, help='Only learn from the first N passwords (0 = all)',
+    ),
+) -> None:
+    """Train a character n-gram model that ranks candidates within each rule family.
+
+    Streams the list in one pass (duplicates count, so keep a leak's
+    frequencies), and writes a compact model file for generate --ngram-model.
+    """
+    from itertools import islice
+
+    from ccupp.benchmark.datasets import iter_password_list
+
+    try:
+        passwords = iter_password_list(wordlist)
+    except FileNotFoundError as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+    if max_passwords:
+        passwords = islice(passwords, max_passwords)
+    model = NgramModel.train(passwords, order)
+    model.save(output)
+    _console().print(f'[green]Trained {order}-gram model on {model.passwords:,} passwords → {output}[/green]')
+
+
+@app.command()
+def mine_affixes(
+    wordlist: str = typer.Argument(..., help='Password list to mine (one per line, plain or .gz)'),
+    output: str = typer.Option(
+        'affixes.json', '--output', '-o', help='Affix file to write (use with generate --affixes)',
+    ),
+    top: int = typer.Option(
+        DEFAULT_TOP, '--top', '-k', min=1, help='Entries to keep per table',
+    ),
+    memory: str = typer.Option(
+        '64M', '--memory', help='Count-min sketch size, e.g. 16M, 256M (bounds memory whatever the list size)',
+    ),
+    max_passwords: int = typer.Option(
+        0, '--max-passwords', min=0, help='Only mine the first N passwords (0 = all)',
+    ),
+) -> None:
+    """Mine ranked suffix, prefix, delimiter and digit-tail tables from a password list.
+
+    Streams the list in one pass with fixed memory (count-min sketch plus
+    heavy hitters), so RockYou-sized lists need no more than --memory.
+    """
+    from itertools import islice
+
+    from rich.table import Table
+
+    from ccupp.affixes import AFFIX_TABLES
+    from ccupp.affixes import mine_affixes as mine
+    from ccupp.benchmark.datasets import iter_password_list
+
+    try:
+        sketch_memory = parse_size(memory)
+        passwords = iter_password_list(wordlist)
+    except (ValueError, FileNotFoundError) as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+    if max_passwords:
+        passwords = islice(passwords, max_passwords)
+    tables = mine(passwords, top=top, memory=sketch_memory)
+    tables.save(output)
+
+    table = Table(title=f'Affixes of {tables.passwords:,} passwords')
+    table.add_column('Table', style='cyan')
+    table.add_column('Most frequent', style='green')
+    for name in AFFIX_TABLES:
+        table.add_row(name, ' '.join(repr(entry) for entry in getattr(tables, name)[:10]))
+    _console().print(table)
+    _console().print(f'[green]Wrote affix tables → {output}[/green]')
+
+
+@app.command()
+def audit(
+    hashes: str = typer.Argument(..., help='Hash file of user:hash[:salt] lines (hex MD5/SHA-1/SHA-256 of password + salt)'),
+    config: str = typer.Option(
+        'config.yaml', '--config', '-c', help='Path to YAML configuration file',
+    ),
+    min_length: int = typer.Option(
+        0, '--min-length', help='Minimum password length',
+    ),
+    max_length: int = typer.Option(
+        0, '--max-length', help='Maximum password length (0 = unlimited)',
+    ),
+    no_leetspeak: bool = typer.Option(
+        False, '--no-leetspeak', help='Disable leetspeak transforms',
+    ),
+    no_cultural: bool = typer.Option(
+        False, '--no-cultural', help='Disable Chinese cultural number patterns',
+    ),
+    no_keyboard: bool = typer.Option(
+        False, '--no-keyboard', help='Disable keyboard pattern generation',
+    ),
+    limit: int = typer.Option(
+        0, '--limit', '-n', help='Guesses per profile (0 = all candidates)',
+    ),
+    workers: int = typer.Option(
+        1, '--workers', '-j', min=1, help='Hash candidates in this many worker processes',
+    ),
+    as_json: bool = typer.Option(
+        False, '--json', help='Print the matches as JSON to stdout',
+    ),
+    pinyin_cache: str = typer.Option(
+        None, '--pinyin-cache', envvar='CCUPP_PINYIN_CACHE',
+        help='Persistent pinyin cache file shared across runs (created if missing)',
+    ),
+) -> None:
+    """Crack a local hash file with each profile's candidates and report guess ranks.
+
+    Users listed in a profile's accounts are tried with that profile only;
+    other users are tried with every profile.
+    """
+    from rich.console import Console
+    from rich.table import Table
+
+    from ccupp.audit import audit_profiles
+    from ccupp.audit import load_targets
+    from ccupp.transforms.pinyin import pinyin_cache as use_pinyin_cache
+
+    profiles = _load_profiles_or_exit(config)
+    try:
+        targets = load_targets(hashes)
+    except FileNotFoundError:
+        _console().print(f'[red]Error:[/red] Hash file not found: {hashes}')
+        sys.exit(1)
+    except ValueError as e:
+        _console().print(f'[red]Error:[/red] {e}')
+        sys.exit(1)
+    _console().print(f'[dim]Loaded {len(targets)} hash(es) from {hashes}[/dim]')
+
+    # One cache for the whole audit, rather than one per profile
+    with use_pinyin_cache(pinyin_cache) if pinyin_cache else contextlib.nullcontext():
+        matches = list(
+            audit_profiles(
+                profiles,
+                targets,
+                workers=workers,
+                min_length=min_length,
+                max_length=max_length,
+                enable_leetspeak=not no_leetspeak,
+                enable_cultural_numbers=not no_cultural,
+                enable_keyboard_patterns=not no_keyboard,
+                limit=limit,
+            ),
+        )
+
+    if as_json:
+        data = {
+            'targets': len(targets),
+            'cracked': len(matches),
+            'matches': [
+                {
+                    'user': m.user,
+                    'password': m.password,
+                    'rank': m.rank,
+                    'profile': m.profile + 1,
+                    'seconds': round(m.seconds, 6),
+                }
+                for m in matches
+            ],
+        }
+        sys.stdout.write(json.dumps(data, indent=2, ensure_ascii=False) + '\n')
+        return
+
+    table = Table(title=f'Cracked {len(matches)}/{len(targets)} hash(es)')
+    table.add_column('User', style='cyan')
+    table.add_column('Password', style='green')
+    table.add_column('Guess rank', justify='right', style='yellow')
+    table.add_column('Profile', justify='right')
+    table.add_column('Time', justify='right')
+    for m in matches:
+        table.add_row(m.user, m.password, f'{m.rank:,}', str(m.profile + 1), f'{m.seconds:.3f}s')
+    Console().print(table)
 
 
 @app.command()
@@ -230,39 +984,43 @@ def init(
     try:
         example_config = _get_resource('config.example.yaml')
     except FileNotFoundError:
-        console.print('[red]Error:[/red] Example config resource not found')
+        _console().print('[red]Error:[/red] Example config resource not found')
         sys.exit(1)
 
     output_path = Path(output)
     if output_path.exists():
-        console.print(f'[yellow]Warning:[/yellow] File {output} already exists')
+        _console().print(f'[yellow]Warning:[/yellow] File {output} already exists')
         if not typer.confirm('Overwrite?'):
-            console.print('[yellow]Cancelled.[/yellow]')
+            _console().print('[yellow]Cancelled.[/yellow]')
             return
 
     output_path.write_text(example_config, encoding='utf-8')
-    console.print(f'[green]Created:[/green] {output_path}')
-    console.print('[cyan]Next:[/cyan] Edit the file and run [cyan]ccupp generate[/cyan]')
+    _console().print(f'[green]Created:[/green] {output_path}')
+    _console().print('[cyan]Next:[/cyan] Edit the file and run [cyan]ccupp generate[/cyan]')
 
 
 @app.command()
 def example() -> None:
     """Show example configuration format."""
+    from rich.console import Console
+
     try:
         content = _get_resource('config.example.commented.yaml')
     except FileNotFoundError:
-        console.print('[red]Error:[/red] Example config resource not found')
+        _console().print('[red]Error:[/red] Example config resource not found')
         sys.exit(1)
 
-    console.print('[bold cyan]Configuration Format:[/bold cyan]\n')
+    _console().print('[bold cyan]Configuration Format:[/bold cyan]\n')
     Console().print(content)
-    console.print('\n[cyan]Use[/cyan] [bold]ccupp init[/bold] [cyan]to generate a config file.[/cyan]')
+    _console().print('\n[cyan]Use[/cyan] [bold]ccupp init[/bold] [cyan]to generate a config file.[/cyan]')
 
 
 @app.command()
 def interactive() -> None:
     """Interactively build a configuration file by answering questions."""
-    console.print('[bold cyan]CCUPP Interactive Profile Builder[/bold cyan]\n')
+    import yaml
+
+    _console().print('[bold cyan]CCUPP Interactive Profile Builder[/bold cyan]\n')
 
     data: dict[str, Any] = {}
     data['surname'] = typer.prompt('Surname (姓氏)', default='')
@@ -303,8 +1061,8 @@ def interactive() -> None:
 
     existing.append(data)
     path.write_text(yaml.dump(existing, allow_unicode=True, default_flow_style=False), encoding='utf-8')
-    console.print(f'\n[green]Profile saved to {path}[/green]')
-    console.print(f'[cyan]Run:[/cyan] [bold]ccupp generate -c {path}[/bold]')
+    _console().print(f'\n[green]Profile saved to {path}[/green]')
+    _console().print(f'[cyan]Run:[/cyan] [bold]ccupp generate -c {path}[/bold]')
 
 
 @app.command()
@@ -345,6 +1103,10 @@ def benchmark(
         False, '--setup',
         help='Show setup instructions for tools and datasets',
     ),
+    pinyin_cache: str = typer.Option(
+        None, '--pinyin-cache', envvar='CCUPP_PINYIN_CACHE',
+        help='Persistent pinyin cache file shared across runs (created if missing)',
+    ),
 ) -> None:
     """Benchmark CCUPP against other tools using standard profiles and datasets.
 
@@ -364,6 +1126,8 @@ def benchmark(
         ccupp benchmark --setup
     """
     if setup_help:
+        from rich.console import Console
+
         Console().print(BENCHMARK_SETUP_GUIDE)
         return
     from ccupp.benchmark.datasets import find_password_lists
@@ -379,16 +1143,16 @@ def benchmark(
         passllm_path=passllm_path,
     )
     tool_names = [t.name for t in tools]
-    console.print(f'[dim]Available tools: {", ".join(tool_names)}[/dim]')
+    _console().print(f'[dim]Available tools: {", ".join(tool_names)}[/dim]')
 
     if len(tools) < 2:
-        console.print(
+        _console().print(
             '[yellow]Hint:[/yellow] To compare with CUPP, clone it first:\n'
             '  [cyan]git clone https://github.com/Mebus/cupp.git /tmp/cupp[/cyan]'
         )
 
     # Set up runner
-    runner = BenchmarkRunner(tools=tools, console=console)
+    runner = BenchmarkRunner(tools=tools, console=_console(), pinyin_cache=pinyin_cache)
 
     # Load datasets
     if datasets:
@@ -397,12 +1161,12 @@ def benchmark(
             try:
                 runner.add_dataset_file(ds_name, ds_path)
             except FileNotFoundError:
-                console.print(f'[red]Warning:[/red] Dataset not found: {ds_path}')
+                _console().print(f'[red]Warning:[/red] Dataset not found: {ds_path}')
     else:
         # Auto-detect system password lists
         found = find_password_lists()
         for f in found:
-            console.print(f'[dim]Found system wordlist: {f}[/dim]')
+            _console().print(f'[dim]Found system wordlist: {f}[/dim]')
             runner.add_dataset_file(f.stem, f)
 
     # Load paired datasets
@@ -412,7 +1176,7 @@ def benchmark(
             try:
                 runner.add_paired_dataset(pd_name, pd_path)
             except (FileNotFoundError, ValueError) as e:
-                console.print(f'[red]Warning:[/red] {e}')
+                _console().print(f'[red]Warning:[/red] {e}')
 
     # Select profiles
     if profiles:
@@ -429,7 +1193,7 @@ def benchmark(
     # Export JSON if requested
     if output:
         runner.export_json(report, output)
-        console.print(f'\n[green]Results exported to {output}[/green]')
+        _console().print(f'\n[green]Results exported to {output}[/green]')
 
 
 if __name__ == '__main__':
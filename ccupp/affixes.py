@@ -0,0 +1,315 @@
+"""Mine affix tables from large password lists (``ccupp mine-affixes``).
+
+The generator's suffix, prefix and delimiter tables and its lucky numbers
+(:data:`~ccupp.generator.COMMON_SUFFIXES` and friends) are hand-written.
+This module rebuilds them from a leaked password list: every password is
+split into the affixes it was likely built from (see :func:`split_affixes`),
+and the most frequent ones of each table are kept, ranked.
+
+Lists like RockYou have millions of distinct tails, so counting them
+exactly takes gigabytes. Counts go into a :class:`CountMinSketch` instead,
+a fixed-size table of counters that never underestimates, and
+:class:`HeavyHitters` keeps a bounded set of candidates per table by their
+estimated count. Memory stays fixed however big the list is; lines are
+counted exactly within chunks first, so the sketch sees each frequent
+affix once per chunk rather than once per line.
+
+The resulting affix file is JSON, each table mapping its entries, most
+frequent first, to their estimated counts::
+
+    {"version": 1, "passwords": 14344391,
+     "suffixes": {"": 5813062, "1": 393542, "123": 187035, ...},
+     "prefixes": {...}, "delimiters": {...}, "digit_tails": {...}}
+
+:class:`~ccupp.generator.PasswordGenerator` loads it as ``affixes``: each
+table it has replaces the built-in one, and ``digit_tails`` replaces the
+lucky numbers.
+"""
+from __future__ import annotations
+
+import json
+import os
+import re
+from array import array
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from hashlib import blake2b
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+AFFIXES_VERSION = 1
+
+# Tables an affix file holds
+AFFIX_TABLES = ('suffixes', 'prefixes', 'delimiters', 'digit_tails')
+
+# Entries kept per table
+DEFAULT_TOP = 30
+
+# Longest affix counted; longer tails are mostly dates and phone numbers
+MAX_AFFIX_LENGTH = 8
+
+DEFAULT_SKETCH_MEMORY = 64 * 1024 * 1024
+SKETCH_DEPTH = 4
+
+# Lines counted exactly before their affixes go into the sketch
+CHUNK_LINES = 65536
+
+# Candidates tracked per table, per entry kept
+_CANDIDATES_PER_ENTRY = 8
+
+# The non-letter run after the last letter, before the first one, the
+# digit run after the last non-digit, and 1-2 symbols between letters or
+# digits; letters and digits running straight into each other join with ''
+_SUFFIX = re.compile(r'(?<=[A-Za-z])[^A-Za-z]+$')
+_PREFIX = re.compile(r'^[^A-Za-z]+(?=[A-Za-z])')
+_DIGIT_TAIL = re.compile(r'(?<=\D)\d+$')
+_SEPARATOR = re.compile(r'(?<=[A-Za-z0-9])[^A-Za-z0-9]{1,2}(?=[A-Za-z0-9])')
+_JOIN = re.compile(r'[A-Za-z](?=[0-9])|[0-9](?=[A-Za-z])')
+
+
+def split_affixes(password: str, max_length: int = MAX_AFFIX_LENGTH) -> list[tuple[str, str]]:
+    """The ``(table, entry)`` pairs ``password`` counts towards.
+
+    Passwords with letters have a suffix and a prefix, possibly ``''``;
+    each separator counts once per password.
+
+    >>> split_affixes('li_wei@123')
+    [('suffixes', '@123'), ('prefixes', ''), ('digit_tails', '123'), ('delimiters', '_'), ('delimiters', '@')]
+    >>> split_affixes('520liwei')
+    [('suffixes', ''), ('prefixes', '520'), ('delimiters', '')]
+    """
+    affixes = []
+    if any('a' <= char <= 'z' or 'A' <= char <= 'Z' for char in password):
+        suffix = _SUFFIX.search(password)
+        prefix = _PREFIX.search(password)
+        affixes.append(('suffixes', suffix.group() if suffix else ''))
+        affixes.append(('prefixes', prefix.group() if prefix else ''))
+    tail = _DIGIT_TAIL.search(password)
+    if tail:
+        affixes.append(('digit_tails', tail.group()))
+    separators = dict.fromkeys(_SEPARATOR.findall(password))
+    if _JOIN.search(password):
+        separators[''] = None
+    affixes.extend(('delimiters', separator) for separator in separators)
+    return [(table, entry) for table, entry in affixes if len(entry) <= max_length]
+
+
+class CountMinSketch:
+    """Fixed-memory frequency estimates; never below the true count.
+
+    Each item bumps one counter per row, picked by double hashing, and
+    its estimate is the smallest of them. Updates are conservative: only
+    counters below the new estimate are raised, which keeps collisions
+    from inflating the estimates of frequent items.
+
+    Args:
+        memory: Size of the counters in bytes (4 per counter).
+        depth: Number of rows.
+    """
+
+    def __init__(self, memory: int = DEFAULT_SKETCH_MEMORY, depth: int = SKETCH_DEPTH) -> None:
+        if depth < 1:
+            raise ValueError(f'Sketch depth must be at least 1, got {depth}')
+        self.depth = depth
+        self.width = max(1, memory // (4 * depth))
+        self._counters = array('I', bytes(4 * self.width * depth))
+        # Total count added
+        self.total = 0
+
+    def _positions(self, item: str) -> list[int]:
+        digest = blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        width = self.width
+        # Row i, column h1 + i*h2 (mod width)
+        return [i * width + (h1 + i * h2) % width for i in range(self.depth)]
+
+    def add(self, item: str, count: int = 1) -> int:
+        """Count ``item`` ``count`` more times; returns its new estimate."""
+        counters = self._counters
+        positions = self._positions(item)
+        estimate = min(counters[pos] for pos in positions) + count
+        for pos in positions:
+            if counters[pos] < estimate:
+                counters[pos] = estimate
+        self.total += count
+        return estimate
+
+    def estimate(self, item: str) -> int:
+        """Estimated count of ``item``."""
+        counters = self._counters
+        return min(counters[pos] for pos in self._positions(item))
+
+
+class HeavyHitters:
+    """The items with the highest estimated counts, in bounded memory.
+
+    Keeps up to ``2 * capacity`` candidates; when full, it drops all but
+    the ``capacity`` best, and from then on only admits new items whose
+    estimate beats the worst one kept.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._estimates: dict[str, int] = {}
+        self._floor = 0
+
+    def __len__(self) -> int:
+        return len(self._estimates)
+
+    def offer(self, item: str, estimate: int) -> None:
+        """Record ``item``'s current estimate."""
+        estimates = self._estimates
+        if item not in estimates and estimate <= self._floor:
+            return
+        estimates[item] = estimate
+        if len(estimates) > 2 * self.capacity:
+            kept = sorted(estimates.items(), key=lambda entry: -entry[1])[:self.capacity]
+            self._estimates = dict(kept)
+            self._floor = kept[-1][1]
+
+    def top(self, k: int) -> list[tuple[str, int]]:
+        """The ``k`` best items and their estimates; ties by item, so the order is deterministic."""
+        return sorted(self._estimates.items(), key=lambda entry: (-entry[1], entry[0]))[:k]
+
+
+@dataclass
+class AffixTables:
+    """A loaded affix file.
+
+    Attributes:
+        passwords: Passwords mined.
+        suffixes, prefixes, delimiters, digit_tails: Entries, most
+            frequent first.
+        counts: Per table, the estimated count of each entry, in order.
+    """
+
+    passwords: int = 0
+    suffixes: list[str] = field(default_factory=list)
+    prefixes: list[str] = field(default_factory=list)
+    delimiters: list[str] = field(default_factory=list)
+    digit_tails: list[str] = field(default_factory=list)
+    counts: dict[str, list[int]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: str | Path) -> AffixTables:
+        """Read an affix file written by :meth:`save`.
+
+        Raises:
+            FileNotFoundError: If there is no file at ``path``.
+            ValueError: If the file is not a valid affix file of this version.
+        """
+        with open(path, encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+                if data.get('version') != AFFIXES_VERSION:
+                    raise ValueError(f'unsupported version {data.get("version")!r}')
+                return cls.from_dict(data)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f'Invalid affix file {path}: {e}') from None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> AffixTables:
+        tables: dict[str, list[str]] = {}
+        counts: dict[str, list[int]] = {}
+        for table in AFFIX_TABLES:
+            entries = [(str(entry), int(count)) for entry, count in data.get(table, {}).items()]
+            tables[table] = [entry for entry, _ in entries]
+            counts[table] = [count for _, count in entries]
+        return cls(passwords=int(data.get('passwords', 0)), counts=counts, **tables)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data form, as saved."""
+        data: dict[str, Any] = {'version': AFFIXES_VERSION, 'passwords': self.passwords}
+        for table in AFFIX_TABLES:
+            entries = getattr(self, table)
+            counts = self.counts.get(table, [0] * len(entries))
+            data[table] = dict(zip(entries, counts))
+        return data
+
+    def save(self, path: str | Path) -> None:
+        """Write the affix file atomically."""
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp, path)
+
+
+class AffixMiner:
+    """Streams passwords into per-table heavy hitters over one shared sketch.
+
+    Args:
+        top: Entries to keep per table.
+        memory: Sketch size in bytes.
+        max_length: Longest affix counted.
+    """
+
+    def __init__(
+        self,
+        top: int = DEFAULT_TOP,
+        memory: int = DEFAULT_SKETCH_MEMORY,
+        max_length: int = MAX_AFFIX_LENGTH,
+    ) -> None:
+        if top < 1:
+            raise ValueError(f'top must be at least 1, got {top}')
+        self.top = top
+        self.max_length = max_length
+        self.sketch = CountMinSketch(memory)
+        capacity = max(top * _CANDIDATES_PER_ENTRY, 64)
+        self.hitters = {table: HeavyHitters(capacity) for table in AFFIX_TABLES}
+        self.passwords = 0
+
+    def add(self, passwords: Iterable[str], chunk_lines: int = CHUNK_LINES) -> None:
+        """Count the affixes of a stream of passwords."""
+        passwords = iter(passwords)
+        sketch_add = self.sketch.add
+        while chunk := list(islice(passwords, chunk_lines)):
+            self.passwords += len(chunk)
+            counts: Counter[tuple[str, str]] = Counter()
+            for pw in chunk:
+                counts.update(split_affixes(pw, self.max_length))
+            # Most frequent first, so the candidates that make it into the
+            # heavy hitters before a prune are the ones likely to stay
+            for (table, entry), count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                self.hitters[table].offer(entry, sketch_add(f'{table}\0{entry}', count))
+
+    def tables(self) -> AffixTables:
+        """The ranked tables mined so far."""
+        tables: dict[str, list[str]] = {}
+        counts: dict[str, list[int]] = {}
+        for table, hitters in self.hitters.items():
+            # Re-read the estimates: an entry's may have grown since it
+            # was last offered
+            ranked = sorted(
+                ((entry, self.sketch.estimate(f'{table}\0{entry}')) for entry, _ in hitters.top(len(hitters))),
+                key=lambda item: (-item[1], item[0]),
+            )[:self.top]
+            tables[table] = [entry for entry, _ in ranked]
+            counts[table] = [count for _, count in ranked]
+        return AffixTables(passwords=self.passwords, counts=counts, **tables)
+
+
+def mine_affixes(
+    passwords: Iterable[str],
+    *,
+    top: int = DEFAULT_TOP,
+    memory: int = DEFAULT_SKETCH_MEMORY,
+    max_length: int = MAX_AFFIX_LENGTH,
+) -> AffixTables:
+    """Mine ranked affix tables from a stream of passwords in one pass.
+
+    Pass :func:`~ccupp.benchmark.datasets.iter_password_list` to mine a
+    list file of any size; memory is the sketch plus a few hundred
+    candidates per table.
+
+    >>> tables = mine_affixes(['liwei123', 'wang123', 'li_1990', 'abc!'], top=2)
+    >>> tables.suffixes, tables.delimiters
+    (['123', '!'], ['', '_'])
+    """
+    miner = AffixMiner(top, memory, max_length)
+    miner.add(passwords)
+    return miner.tables()
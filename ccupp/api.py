@@ -1,19 +1,53 @@
 """High-level SDK entry points for using CCUPP as a library."""
 from __future__ import annotations
 
+import tracemalloc
 from collections.abc import Iterable
 from collections.abc import Iterator
+from collections.abc import Mapping
+from itertools import batched
+from itertools import chain
+from itertools import islice
+from pathlib import Path
+from typing import Any
+from typing import Literal
+from typing import overload
 
-from ccupp.extractors.components import extract_components
+from ccupp.affixes import AffixTables
+from ccupp.checkpoint import Checkpoint
+from ccupp.dedup import Deduplicator
+from ccupp.dedup import ExactDedup
+from ccupp.dedup import ExternalDedup
+from ccupp.extractors.components import LazyComponents
+from ccupp.generator import GenerationEstimate
 from ccupp.generator import PasswordGenerator
+from ccupp.generator import validate_shard
+from ccupp.hybrid import build_hybrid
+from ccupp.hybrid import DEFAULT_YEARS
+from ccupp.hybrid import HybridAttack
 from ccupp.models import Profile
+from ccupp.ngram import NgramModel
+from ccupp.output import DEFAULT_BATCH_SIZE
+from ccupp.output import encode_batches
+from ccupp.parallel import parallel_profile_blocks
+from ccupp.parallel import profile_blocks
+from ccupp.policy import PasswordPolicy
+from ccupp.rules import build_rules
+from ccupp.rules import RuleSet
+from ccupp.scoring import resolve_family_weights
+from ccupp.stats import clock
+from ccupp.stats import GenerationStats
+from ccupp.transforms.pinyin import pinyin_cache
+from ccupp.weights import OrderWeights
 
 
+@overload
 def generate_passwords(
     profile: Profile | Iterable[Profile],
     *,
     min_length: int = 0,
     max_length: int = 0,
+    policy: PasswordPolicy | None = None,
     enable_leetspeak: bool = True,
     enable_case_variants: bool = True,
     enable_cultural_numbers: bool = True,
@@ -21,11 +55,97 @@ def generate_passwords(
     suffixes: list[str] | None = None,
     prefixes: list[str] | None = None,
     delimiters: list[str] | None = None,
+    scored: bool = False,
+    family_weights: Mapping[str, float] | None = None,
+    budget: int = 0,
+    weights: OrderWeights | str | Path | None = None,
+    ngram: NgramModel | str | Path | None = None,
+    affixes: AffixTables | str | Path | None = None,
+    limit: int = 0,
+    dedup: Deduplicator | ExternalDedup | None = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    workers: int = 1,
+    start: int = 0,
+    checkpoint: Checkpoint | None = None,
+    stats: GenerationStats | None = None,
+    pinyin_cache: str | Path | None = None,
+    as_bytes: Literal[False] = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
 ) -> Iterator[str]:
+    ...
+
+
+@overload
+def generate_passwords(
+    profile: Profile | Iterable[Profile],
+    *,
+    min_length: int = 0,
+    max_length: int = 0,
+    policy: PasswordPolicy | None = None,
+    enable_leetspeak: bool = True,
+    enable_case_variants: bool = True,
+    enable_cultural_numbers: bool = True,
+    enable_keyboard_patterns: bool = True,
+    suffixes: list[str] | None = None,
+    prefixes: list[str] | None = None,
+    delimiters: list[str] | None = None,
+    scored: bool = False,
+    family_weights: Mapping[str, float] | None = None,
+    budget: int = 0,
+    weights: OrderWeights | str | Path | None = None,
+    ngram: NgramModel | str | Path | None = None,
+    affixes: AffixTables | str | Path | None = None,
+    limit: int = 0,
+    dedup: Deduplicator | ExternalDedup | None = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    workers: int = 1,
+    start: int = 0,
+    checkpoint: Checkpoint | None = None,
+    stats: GenerationStats | None = None,
+    pinyin_cache: str | Path | None = None,
+    as_bytes: Literal[True],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    ...
+
+
+def generate_passwords(
+    profile: Profile | Iterable[Profile],
+    *,
+    min_length: int = 0,
+    max_length: int = 0,
+    policy: PasswordPolicy | None = None,
+    enable_leetspeak: bool = True,
+    enable_case_variants: bool = True,
+    enable_cultural_numbers: bool = True,
+    enable_keyboard_patterns: bool = True,
+    suffixes: list[str] | None = None,
+    prefixes: list[str] | None = None,
+    delimiters: list[str] | None = None,
+    scored: bool = False,
+    family_weights: Mapping[str, float] | None = None,
+    budget: int = 0,
+    weights: OrderWeights | str | Path | None = None,
+    ngram: NgramModel | str | Path | None = None,
+    affixes: AffixTables | str | Path | None = None,
+    limit: int = 0,
+    dedup: Deduplicator | ExternalDedup | None = None,
+    shard_index: int = 0,
+    num_shards: int = 1,
+    workers: int = 1,
+    start: int = 0,
+    checkpoint: Checkpoint | None = None,
+    stats: GenerationStats | None = None,
+    pinyin_cache: str | Path | None = None,
+    as_bytes: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[str] | Iterator[bytes]:
     """Generate candidate passwords for one or more profiles.
 
     This is the one-call convenience wrapper around
-    :func:`~ccupp.extractors.components.extract_components` and
+    :class:`~ccupp.extractors.components.LazyComponents` and
     :class:`~ccupp.generator.PasswordGenerator`. Passwords are yielded
     lazily, ordered by likelihood, deduplicated across all given profiles.
 
@@ -34,6 +154,11 @@ def generate_passwords(
             profiles (e.g. the result of :func:`~ccupp.config.load_profiles`).
         min_length: Drop passwords shorter than this (0 = no minimum).
         max_length: Drop passwords longer than this (0 = no maximum).
+        policy: A :class:`~ccupp.policy.PasswordPolicy` every password must
+            satisfy (length, required character classes, forbidden
+            characters, regex). It is pushed down into rule expansion, so
+            sub-products that cannot satisfy it are never built.
+            ``min_length``/``max_length`` further tighten its length bounds.
         enable_leetspeak: Enable leetspeak transforms (a→@, e→3, ...).
         enable_case_variants: Enable upper/lower/title-case variants.
         enable_cultural_numbers: Enable Chinese lucky-number combinations.
@@ -41,9 +166,89 @@ def generate_passwords(
         suffixes: Override the default common suffixes.
         prefixes: Override the default common prefixes.
         delimiters: Override the default component delimiters.
+        scored: Emit each profile's candidates in descending order of
+            estimated probability, merged across rule families, instead of
+            family by family (see :mod:`ccupp.scoring`).
+        family_weights: Override the built-in rule family weights
+            (:data:`~ccupp.scoring.FAMILY_WEIGHTS`) used by ``scored``
+            and ``budget``.
+        budget: At most this many guesses per profile (0 = no budget),
+            split between the rule families by expected yield; each family
+            stops at its quota (see
+            :meth:`~ccupp.generator.PasswordGenerator.budget_quotas`).
+            Gives a predictable cost per profile, unlike ``limit``, which
+            caps the whole run.
+        weights: Learned rule ordering, as an
+            :class:`~ccupp.weights.OrderWeights` or the path of a file
+            written by ``ccupp train-order``. It reorders the rule families,
+            tables and category pairs and supplies the family weights
+            (``family_weights`` still override them).
+        ngram: Character n-gram model, as an
+            :class:`~ccupp.ngram.NgramModel` or the path of a file written
+            by ``ccupp train-ngram``. Each rule family's candidates are
+            then emitted most human-like first (not with ``scored``).
+        affixes: Mined affix tables, as an
+            :class:`~ccupp.affixes.AffixTables` or the path of a file
+            written by ``ccupp mine-affixes``. They replace the built-in
+            suffix, prefix and delimiter tables (not ones passed
+            explicitly) and the lucky numbers.
+        limit: Stop after this many passwords in total (0 = no limit).
+            Profiles are consumed lazily and components are extracted on
+            demand, so nothing past the limit is extracted or generated.
+        dedup: Cross-profile deduplication backend (default: an exact
+            set). Use :class:`~ccupp.dedup.BloomFilter` or
+            :class:`~ccupp.dedup.CuckooFilter` to bound memory on very
+            large runs, accepting that a few new passwords are dropped as
+            false positives. With :class:`~ccupp.dedup.ExternalDedup`,
+            dedup is exact and spills to disk; nothing is yielded until every
+            profile has been generated, and ``limit`` is applied to the
+            deduplicated output.
+        shard_index: Which shard to produce, from 0 to ``num_shards - 1``.
+        num_shards: Split the deduplicated output into this many disjoint,
+            deterministic shards (see :func:`~ccupp.generator.shard_of`).
+            Running every shard, e.g. on separate machines, and
+            concatenating the results gives the same set of passwords as an
+            unsharded run; each shard is in the unsharded order. ``limit``
+            applies per shard.
+        workers: Generate profiles in this many worker processes. Output is
+            identical to ``workers=1``: profile order is preserved and
+            cross-profile dedup still happens here, in the calling process.
+        start: Resume at this raw plan position, counted across the plans
+            of all profiles in order (see
+            :meth:`~ccupp.generator.PasswordGenerator.candidate_at`).
+            Profiles and plan nodes before it are skipped without being
+            generated. Passwords first seen before ``start`` are not known
+            to dedup and may be yielded again. With ``scored`` or a
+            ``budget``, a position inside a profile counts that profile's
+            emitted passwords, and the ones before it are replayed, so the
+            budget and the candidate set match the run being resumed.
+        checkpoint: Progress to keep up to date while iterating: its
+            ``position`` is always a ``start`` from which a rerun misses
+            none of the passwords not yet yielded. It advances between
+            profiles (between chunks of profiles with ``workers``), and
+            with :class:`~ccupp.dedup.ExternalDedup` only once everything
+            has been yielded.
+        stats: Fill in this :class:`~ccupp.stats.GenerationStats` while
+            iterating: per-family counters and timings, extraction and
+            pinyin time, cross-profile duplicates, total time and, if
+            :mod:`tracemalloc` is tracing, peak memory. Costs next to
+            nothing when omitted.
+        pinyin_cache: Persistent pinyin cache file (see
+            :func:`~ccupp.transforms.pinyin.pinyin_cache`): conversions it
+            holds skip pypinyin, and the words converted while iterating
+            are saved to it when iteration ends. With ``workers``, only
+            conversions done in this process are added to it.
+        as_bytes: Yield pre-encoded batches instead of single passwords:
+            ``batch_size`` passwords per ``bytes`` object, as UTF-8 with
+            one password per line and a trailing newline. Dedup works on
+            whole plan blocks in this mode, so the per-password cost is a
+            fraction of the ``str`` path; write the batches straight to a
+            file or a cracker's stdin.
+        batch_size: Passwords per batch with ``as_bytes``.
 
     Yields:
-        Candidate password strings, most likely first, without duplicates.
+        Candidate password strings, most likely first, without duplicates,
+        or with ``as_bytes`` newline-joined batches of them.
 
     Example:
         >>> from ccupp import Profile, generate_passwords
@@ -52,12 +257,228 @@ def generate_passwords(
         >>> for pw in generate_passwords(profile, min_length=6, max_length=16):
         ...     ...
     """
-    profiles = [profile] if isinstance(profile, Profile) else list(profile)
+    validate_shard(shard_index, num_shards)
+    if start < 0:
+        raise ValueError(f'Start position must be non-negative, got {start}')
+    resolve_family_weights(family_weights)
+    if budget < 0:
+        raise ValueError(f'Budget must be non-negative, got {budget}')
+    if ngram is not None and scored:
+        raise ValueError('An n-gram model reorders families, which scored mode merges; use one or the other')
+    if min_length or max_length:
+        policy = (policy if policy is not None else PasswordPolicy()).with_length(min_length, max_length)
+    profiles = [profile] if isinstance(profile, Profile) else profile
+    options = dict(
+        enable_leetspeak=enable_leetspeak,
+        enable_case_variants=enable_case_variants,
+        enable_cultural_numbers=enable_cultural_numbers,
+        enable_keyboard_patterns=enable_keyboard_patterns,
+        suffixes=suffixes,
+        prefixes=prefixes,
+        delimiters=delimiters,
+        scored=scored,
+        family_weights=family_weights,
+        budget=budget,
+        weights=OrderWeights.load(weights) if isinstance(weights, (str, Path)) else weights,
+        ngram=NgramModel.load(ngram) if isinstance(ngram, (str, Path)) else ngram,
+        affixes=AffixTables.load(affixes) if isinstance(affixes, (str, Path)) else affixes,
+    )
+    blocks = _unique_blocks(
+        profiles, policy, options, limit, dedup,
+        shard_index, num_shards, workers, start, checkpoint, stats,
+    )
+    if stats is not None:
+        blocks = _profiled(blocks, stats)
+    if pinyin_cache is not None:
+        blocks = _with_pinyin_cache(blocks, pinyin_cache)
+    if as_bytes:
+        return encode_batches(blocks, batch_size)
+    return chain.from_iterable(blocks)
+
+
+def _unique_blocks(
+    profiles: Iterable[Profile],
+    policy: PasswordPolicy | None,
+    options: dict[str, Any],
+    limit: int,
+    dedup: Deduplicator | ExternalDedup | None,
+    shard_index: int,
+    num_shards: int,
+    workers: int,
+    start: int,
+    checkpoint: Checkpoint | None,
+    stats: GenerationStats | None = None,
+) -> Iterator[list[str]]:
+    """Yield blocks of passwords deduplicated across profiles, up to ``limit``."""
+    external = isinstance(dedup, ExternalDedup)
+    # External dedup yields nothing until the whole plan has been read, so
+    # the caller's checkpoint must not move while it is being read
+    progress = Checkpoint(start) if external and checkpoint is not None else checkpoint
+
+    if workers > 1:
+        candidates = parallel_profile_blocks(
+            profiles, policy, options, shard_index, num_shards,
+            start, progress, stats, workers=workers,
+        )
+    else:
+        candidates = profile_blocks(
+            profiles, policy, options, shard_index, num_shards,
+            start, progress, stats,
+        )
+
+    try:
+        if isinstance(dedup, ExternalDedup):
+            added = emitted = 0
+            with dedup:
+                for block in candidates:
+                    added += len(block)
+                    for pw in block:
+                        dedup.add(pw)
+                for batch in batched(islice(dedup, limit or None), DEFAULT_BATCH_SIZE):
+                    emitted += len(batch)
+                    yield list(batch)
+            # Only a full read tells how many were duplicates
+            if stats is not None and not limit:
+                stats.cross_profile_duplicates += added - emitted
+            # With a limit the output may have been cut short
+            if checkpoint is not None and progress is not None and not limit:
+                checkpoint.position = progress.position
+            return
+
+        filter_new = (dedup if dedup is not None else ExactDedup()).filter_new
+        remaining = limit
+        for block in candidates:
+            fresh = filter_new(block)
+            if stats is not None:
+                stats.cross_profile_duplicates += len(block) - len(fresh)
+            if limit:
+                if len(fresh) >= remaining:
+                    yield fresh[:remaining]
+                    return
+                remaining -= len(fresh)
+            yield fresh
+    finally:
+        # Stops worker processes as soon as the caller is done
+        candidates.close()
+
 
-    seen: set[str] = set()
+def _with_pinyin_cache(blocks: Iterator[list[str]], path: str | Path) -> Iterator[list[str]]:
+    """Pass blocks through with the persistent pinyin cache at ``path`` in use."""
+    with pinyin_cache(path):
+        yield from blocks
+
+
+def _profiled(blocks: Iterator[list[str]], stats: GenerationStats) -> Iterator[list[str]]:
+    """Pass blocks through, recording run totals in ``stats``."""
+    started = clock()
+    try:
+        for block in blocks:
+            stats.emitted += len(block)
+            yield block
+    finally:
+        now = clock()
+        stats.wall_time += now[0] - started[0]
+        stats.cpu_time += now[1] - started[1]
+        if tracemalloc.is_tracing():
+            stats.peak_memory = max(stats.peak_memory, tracemalloc.get_traced_memory()[1])
+
+
+def estimate_passwords(
+    profile: Profile | Iterable[Profile],
+    *,
+    min_length: int = 0,
+    max_length: int = 0,
+    policy: PasswordPolicy | None = None,
+    enable_leetspeak: bool = True,
+    enable_case_variants: bool = True,
+    enable_cultural_numbers: bool = True,
+    enable_keyboard_patterns: bool = True,
+    suffixes: list[str] | None = None,
+    prefixes: list[str] | None = None,
+    delimiters: list[str] | None = None,
+    scored: bool = False,
+    family_weights: Mapping[str, float] | None = None,
+    budget: int = 0,
+    weights: OrderWeights | str | Path | None = None,
+    affixes: AffixTables | str | Path | None = None,
+) -> GenerationEstimate:
+    """Estimate how many passwords :func:`generate_passwords` would produce.
+
+    Nothing is enumerated: counts come from the compiled plan of each
+    profile (see :meth:`~ccupp.generator.PasswordGenerator.estimate`).
+    Counts before dedup are exact; the unique count is an upper bound,
+    since dedup within and across profiles can only lower it.
+
+    Takes the plan-shaping arguments of :func:`generate_passwords`. Of a
+    ``policy``, only the length bounds are counted; its character classes,
+    forbidden characters and regex can only lower the real count, as can
+    the quotas of a ``budget``, which the estimate treats as caps. An
+    n-gram model only reorders candidates, so it is not taken.
+    """
+    if budget < 0:
+        raise ValueError(f'Budget must be non-negative, got {budget}')
+    if min_length or max_length:
+        policy = (policy if policy is not None else PasswordPolicy()).with_length(min_length, max_length)
+    if policy is not None:
+        min_length, max_length = policy.min_length, policy.max_length
+    if isinstance(weights, (str, Path)):
+        weights = OrderWeights.load(weights)
+    if isinstance(affixes, (str, Path)):
+        affixes = AffixTables.load(affixes)
+    profiles = [profile] if isinstance(profile, Profile) else profile
+
+    total = GenerationEstimate()
     for prof in profiles:
         generator = PasswordGenerator(
-            components=extract_components(prof),
+            components=LazyComponents(prof),
+            enable_leetspeak=enable_leetspeak,
+            enable_case_variants=enable_case_variants,
+            enable_cultural_numbers=enable_cultural_numbers,
+            enable_keyboard_patterns=enable_keyboard_patterns,
+            suffixes=suffixes,
+            prefixes=prefixes,
+            delimiters=delimiters,
+            scored=scored,
+            family_weights=family_weights,
+            budget=budget,
+            weights=weights,
+            affixes=affixes,
+        )
+        total.merge(generator.estimate(min_length=min_length, max_length=max_length))
+    return total
+
+
+def generate_rules(
+    profile: Profile | Iterable[Profile],
+    *,
+    enable_leetspeak: bool = True,
+    enable_case_variants: bool = True,
+    enable_cultural_numbers: bool = True,
+    enable_keyboard_patterns: bool = True,
+    suffixes: list[str] | None = None,
+    prefixes: list[str] | None = None,
+    delimiters: list[str] | None = None,
+) -> RuleSet:
+    """Export the generation strategy as base words plus hashcat/JtR rules.
+
+    Rather than expanding candidates, this returns each profile's component
+    values and the rules that rebuild (a superset of) the
+    :func:`generate_passwords` output from them on the cracking node; see
+    :mod:`ccupp.rules`. Only the rules built from the shared tables apply
+    to every profile's words; each profile's own component joins are
+    returned as joined words, so nothing crosses between profiles.
+
+    Takes the generation arguments of :func:`generate_passwords`.
+
+    Example:
+        >>> from ccupp import Profile, generate_rules
+        >>> rule_set = generate_rules(Profile(surname='李', first_name='二狗'))
+        >>> rule_set.write('words.txt', 'words.rule', 'words.joined.txt')  # doctest: +SKIP
+    """
+    profiles = [profile] if isinstance(profile, Profile) else profile
+    return build_rules(
+        PasswordGenerator(
+            components=LazyComponents(prof),
             enable_leetspeak=enable_leetspeak,
             enable_case_variants=enable_case_variants,
             enable_cultural_numbers=enable_cultural_numbers,
@@ -66,12 +487,54 @@ def generate_passwords(
             prefixes=prefixes,
             delimiters=delimiters,
         )
-        for pw in generator.generate():
-            if min_length and len(pw) < min_length:
-                continue
-            if max_length and len(pw) > max_length:
-                continue
-            if pw in seen:
-                continue
-            seen.add(pw)
-            yield pw
+        for prof in profiles
+    )
+
+
+def generate_hybrid(
+    profile: Profile | Iterable[Profile],
+    *,
+    years: tuple[int, int] = DEFAULT_YEARS,
+    enable_case_variants: bool = True,
+    enable_cultural_numbers: bool = True,
+    suffixes: list[str] | None = None,
+    delimiters: list[str] | None = None,
+    widen_tails: bool = False,
+) -> HybridAttack:
+    """Export the word + tail families as hashcat hybrid attacks.
+
+    Returns word stems plus the masks to append (``-a 6``) and prepend
+    (``-a 7``) to them, so numeric and symbol tails are enumerated on the
+    cracking node instead of in Python, and each profile's stems joined
+    with its own date, phone and ID tails; see :mod:`ccupp.hybrid`.
+
+    Args:
+        profile: A single Profile or an iterable of Profiles.
+        years: First and last birth year covered by the year masks.
+        enable_case_variants: Include case variants of the stems.
+        enable_cultural_numbers: Include Chinese lucky number tails.
+        suffixes: Custom suffix list (default: built-in common suffixes).
+        delimiters: Custom delimiter list (default: built-in delimiters).
+        widen_tails: Turn suffix and lucky-number tails into masks of
+            their shape (``123`` becomes ``?d?d?d``) instead of literal ones.
+
+    Example:
+        >>> from ccupp import Profile, generate_hybrid
+        >>> attack = generate_hybrid(Profile(surname='李', birthdate=['1990', '1', '1']))
+        >>> attack.write('words.txt', 'append.hcmask', 'prepend.hcmask', 'words.joined.txt')  # doctest: +SKIP
+    """
+    profiles = [profile] if isinstance(profile, Profile) else profile
+    return build_hybrid(
+        (
+            PasswordGenerator(
+                components=LazyComponents(prof),
+                enable_case_variants=enable_case_variants,
+                enable_cultural_numbers=enable_cultural_numbers,
+                suffixes=suffixes,
+                delimiters=delimiters,
+            )
+            for prof in profiles
+        ),
+        years=years,
+        widen_tails=widen_tails,
+    )
@@ -0,0 +1,266 @@
+"""Offline audit: crack a local hash file with each profile's candidates.
+
+Targets are ``user:hash`` or ``user:hash:salt`` lines, where ``hash`` is a
+hex MD5, SHA-1 or SHA-256 digest (told apart by length) of the password,
+or of the password followed by the salt. A user listed in a profile's
+``accounts`` is audited with that profile's candidates only; users no
+profile claims are tried against every profile.
+
+Candidates are hashed in batches, in a process pool if ``workers > 1``.
+Digests are looked up in a :class:`TargetIndex`, one hash table per
+(algorithm, salt) group, so each candidate costs one hash per group and
+one O(1) lookup however many targets there are.
+"""
+from __future__ import annotations
+
+import hashlib
+import time
+from collections import Counter
+from collections import deque
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import batched
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+from ccupp.api import generate_passwords
+from ccupp.models import Profile
+
+# Digest algorithms by hex digest length
+HASH_ALGORITHMS = {32: 'md5', 40: 'sha1', 64: 'sha256'}
+
+# Candidates per hashing task
+DEFAULT_AUDIT_BATCH_SIZE = 4096
+
+# Tasks in flight per worker; keeps early stops cheap
+_TASKS_PER_WORKER = 2
+
+# (algorithm, salt) of a group of targets hashed the same way
+Group = tuple[str, str]
+
+# (position in the batch, group, digest) of a candidate that hit a target
+Hit = tuple[int, Group, bytes]
+
+# Index shared by the pool's worker processes, set by _init_worker
+_worker_index: TargetIndex | None = None
+
+
+@dataclass(frozen=True)
+class HashTarget:
+    """One ``user:hash[:salt]`` entry of a hash file."""
+
+    user: str
+    algorithm: str
+    digest: bytes
+    salt: str = ''
+
+    @property
+    def group(self) -> Group:
+        return self.algorithm, self.salt
+
+    @classmethod
+    def parse(cls, line: str) -> HashTarget:
+        """Parse a ``user:hash[:salt]`` line.
+
+        >>> HashTarget.parse('li:5F4DCC3B5AA765D61D8327DEB882CF99').algorithm
+        'md5'
+
+        Raises:
+            ValueError: If the line is malformed or the hash is not a hex
+                MD5/SHA-1/SHA-256 digest.
+        """
+        user, sep, rest = line.partition(':')
+        hex_digest, _, salt = rest.partition(':')
+        if not (user and sep):
+            raise ValueError(f'Expected user:hash[:salt], got {line!r}')
+        algorithm = HASH_ALGORITHMS.get(len(hex_digest))
+        if algorithm is None:
+            raise ValueError(f'Not an MD5/SHA-1/SHA-256 hex digest: {hex_digest!r}')
+        return cls(user, algorithm, bytes.fromhex(hex_digest), salt)
+
+
+def load_targets(path: str | Path) -> list[HashTarget]:
+    """Read a hash file, skipping blank lines and ``#`` comments.
+
+    Raises:
+        ValueError: On a malformed line, with its line number.
+    """
+    targets = []
+    with open(path, encoding='utf-8') as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if not line.strip() or line.startswith('#'):
+                continue
+            try:
+                targets.append(HashTarget.parse(line))
+            except ValueError as e:
+                raise ValueError(f'{path}:{lineno}: {e}') from None
+    return targets
+
+
+class TargetIndex:
+    """Digests of all targets, hashed for O(1) lookup per (algorithm, salt).
+
+    Targets are also indexed by user, so each profile's own targets are
+    found without scanning the others.
+    """
+
+    def __init__(self, targets: Iterable[HashTarget]) -> None:
+        self.groups: dict[Group, dict[bytes, list[HashTarget]]] = {}
+        self.users: dict[str, list[HashTarget]] = {}
+        for target in targets:
+            self.groups.setdefault(target.group, {}).setdefault(target.digest, []).append(target)
+            self.users.setdefault(target.user, []).append(target)
+
+    def __getstate__(self) -> dict[str, Any]:
+        # Workers only look digests up
+        return {'groups': self.groups, 'users': {}}
+
+    def lookup(self, group: Group, digest: bytes) -> list[HashTarget]:
+        """Targets in ``group`` with this digest."""
+        return self.groups.get(group, {}).get(digest, [])
+
+    def find(self, passwords: list[str], groups: Iterable[Group]) -> list[Hit]:
+        """Hash a batch once per group and return ``(position, group, digest)`` of hits."""
+        encoded = [pw.encode('utf-8') for pw in passwords]
+        hits: list[Hit] = []
+        for group in groups:
+            algorithm, salt = group
+            table = self.groups.get(group)
+            if not table:
+                continue
+            new = getattr(hashlib, algorithm)
+            if salt:
+                suffix = salt.encode('utf-8')
+                digests = [new(pw + suffix).digest() for pw in encoded]
+            else:
+                digests = [new(pw).digest() for pw in encoded]
+            hits.extend((i, group, d) for i, d in enumerate(digests) if d in table)
+        return hits
+
+
+@dataclass
+class AuditMatch:
+    """A cracked target.
+
+    Attributes:
+        user: User name from the hash file.
+        password: The recovered password.
+        rank: 1-based position of the password in the profile's candidates.
+        profile: Index of the profile whose candidates cracked it.
+        seconds: Time from the start of the audit to the crack.
+    """
+
+    user: str
+    password: str
+    rank: int
+    profile: int
+    seconds: float
+
+
+def _init_worker(index: TargetIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def _find(passwords: list[str], groups: list[Group]) -> list[Hit]:
+    """Worker task: hash one batch against the shared index."""
+    assert _worker_index is not None
+    return _worker_index.find(passwords, groups)
+
+
+def audit_profiles(
+    profiles: list[Profile],
+    targets: list[HashTarget],
+    *,
+    workers: int = 1,
+    batch_size: int = DEFAULT_AUDIT_BATCH_SIZE,
+    **options: Any,
+) -> Iterator[AuditMatch]:
+    """Yield matches as each profile's candidates crack its targets.
+
+    Profiles are audited in order; a profile stops as soon as all its
+    targets are cracked, and a cracked target is not tried again. Other
+    keyword arguments are passed to
+    :func:`~ccupp.api.generate_passwords` (lengths, policy, ``limit`` on
+    guesses per profile, ...).
+    """
+    index = TargetIndex(targets)
+    claimed = {account for prof in profiles for account in prof.accounts}
+    # Targets no profile claims are tried against every profile until
+    # cracked; kept once, with their groups counted, rather than per profile
+    unclaimed = {t for user, owned in index.users.items() if user not in claimed for t in owned}
+    unclaimed_groups = Counter(t.group for t in unclaimed)
+    cracked: set[HashTarget] = set()
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(index,),
+    ) if workers > 1 else None
+    try:
+        for number, prof in enumerate(profiles):
+            own = {
+                t for account in set(prof.accounts) for t in index.users.get(account, ())
+                if t not in cracked
+            }
+            if not own and not unclaimed:
+                continue
+            groups = sorted({t.group for t in own} | unclaimed_groups.keys())
+            batches = batched(generate_passwords(prof, **options), batch_size)
+            for first, batch, hits in _hash_batches(batches, groups, index, pool, workers):
+                # Hits come grouped by (algorithm, salt); report them in guess order
+                for i, group, digest in sorted(hits):
+                    for target in index.lookup(group, digest):
+                        if target in own:
+                            own.discard(target)
+                        elif target in unclaimed:
+                            unclaimed.discard(target)
+                            unclaimed_groups[group] -= 1
+                            if not unclaimed_groups[group]:
+                                del unclaimed_groups[group]
+                        else:
+                            continue
+                        cracked.add(target)
+                        yield AuditMatch(
+                            target.user, batch[i], first + i + 1, number,
+                            time.perf_counter() - started,
+                        )
+                if not own and not unclaimed:
+                    break
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def _hash_batches(
+    batches: Iterator[tuple[str, ...]],
+    groups: list[Group],
+    index: TargetIndex,
+    pool: ProcessPoolExecutor | None,
+    workers: int,
+) -> Iterator[tuple[int, list[str], list[Hit]]]:
+    """Yield ``(rank offset, batch, hits)`` for each batch, in order."""
+    offset = 0
+    if pool is None:
+        for batch in batches:
+            passwords = list(batch)
+            yield offset, passwords, index.find(passwords, groups)
+            offset += len(passwords)
+        return
+    pending: deque[tuple[list[str], Future[list[Hit]]]] = deque()
+    try:
+        while True:
+            for batch in islice(batches, workers * _TASKS_PER_WORKER - len(pending)):
+                passwords = list(batch)
+                pending.append((passwords, pool.submit(_find, passwords, groups)))
+            if not pending:
+                return
+            passwords, future = pending.popleft()
+            yield offset, passwords, future.result()
+            offset += len(passwords)
+    finally:
+        for _, future in pending:
+            future.cancel()
@@ -11,6 +11,7 @@ from __future__ import annotations
 import csv
 import gzip
 import json
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
@@ -69,26 +70,36 @@ def load_password_set(path: str | Path) -> set[str]:
     Returns:
         Set of passwords (stripped, non-empty lines).
     """
+    return set(iter_password_list(path))
+
+
+def iter_password_list(path: str | Path) -> Iterator[str]:
+    """Stream the passwords of a password list file, one line at a time.
+
+    Reads the same formats as :func:`load_password_set`, but keeps
+    duplicates and file order and never holds more than a line, so
+    multi-gigabyte lists can be scanned.
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist (raised on the call,
+            not on the first iteration).
+    """
     path = Path(path)
     if not path.exists():
         raise FileNotFoundError(f'Password list not found: {path}')
+    return _read_password_lines(path)
 
-    passwords: set[str] = set()
 
+def _read_password_lines(path: Path) -> Iterator[str]:
     if path.suffix == '.gz':
-        with gzip.open(path, 'rt', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                pw = line.strip()
-                if pw:
-                    passwords.add(pw)
+        f = gzip.open(path, 'rt', encoding='utf-8', errors='ignore')
     else:
-        with open(path, encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                pw = line.strip()
-                if pw:
-                    passwords.add(pw)
-
-    return passwords
+        f = open(path, encoding='utf-8', errors='ignore')
+    with f:
+        for line in f:
+            pw = line.strip()
+            if pw:
+                yield pw
 
 
 def get_builtin_common_passwords() -> set[str]:
@@ -99,6 +110,15 @@ def get_builtin_common_passwords() -> set[str]:
 def load_paired_dataset(path: str | Path) -> list[PairedRecord]:
     """Load a PII-password paired dataset for academic evaluation.
 
+    See :func:`iter_paired_dataset` for the formats; this reads all the
+    records into a list.
+    """
+    return list(iter_paired_dataset(path))
+
+
+def iter_paired_dataset(path: str | Path) -> Iterator[PairedRecord]:
+    """Stream the records of a PII-password paired dataset, one at a time.
+
     Supports two formats:
     - JSONL (.jsonl): One JSON object per line with Profile fields + "target_password"
     - CSV (.csv): Header row with Profile field names + "target_password" column
@@ -109,8 +129,9 @@ def load_paired_dataset(path: str | Path) -> list[PairedRecord]:
     Args:
         path: Path to the paired dataset file.
 
-    Returns:
-        List of PairedRecord objects.
+    Yields:
+        PairedRecord objects, in file order; lines that are not valid
+        records are skipped.
 
     Raises:
         FileNotFoundError: If the file doesn't exist.
@@ -129,9 +150,8 @@ def load_paired_dataset(path: str | Path) -> list[PairedRecord]:
         raise ValueError(f'Unsupported paired dataset format: {suffix} (use .jsonl or .csv)')
 
 
-def _load_paired_jsonl(path: Path) -> list[PairedRecord]:
-    """Load paired data from JSONL file."""
-    records: list[PairedRecord] = []
+def _load_paired_jsonl(path: Path) -> Iterator[PairedRecord]:
+    """Stream paired data from a JSONL file."""
     with open(path, encoding='utf-8') as f:
         for line_num, line in enumerate(f, 1):
             line = line.strip()
@@ -143,15 +163,13 @@ def _load_paired_jsonl(path: Path) -> list[PairedRecord]:
                 if not target:
                     continue
                 profile = Profile(**data)
-                records.append(PairedRecord(profile=profile, target_password=target))
             except (json.JSONDecodeError, Exception):
                 continue
-    return records
+            yield PairedRecord(profile=profile, target_password=target)
 
 
-def _load_paired_csv(path: Path) -> list[PairedRecord]:
-    """Load paired data from CSV file."""
-    records: list[PairedRecord] = []
+def _load_paired_csv(path: Path) -> Iterator[PairedRecord]:
+    """Stream paired data from a CSV file."""
     with open(path, encoding='utf-8') as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -166,7 +184,7 @@ def _load_paired_csv(path: Path) -> list[PairedRecord]:
                 # List fields: split by semicolon
                 if key in ('phone_numbers', 'hometowns', 'social_media', 'accounts', 'passwords'):
                     data[key] = [v.strip() for v in value.split(';') if v.strip()]
-                elif key == 'birthdate':
+                elif key in ('birthdate', 'birth_year_range'):
                     data[key] = [v.strip() for v in value.split(';') if v.strip()]
                 elif key in ('places', 'workplaces', 'educational_institutions'):
                     # Nested: groups separated by | , items within group by ;
@@ -181,10 +199,9 @@ def _load_paired_csv(path: Path) -> list[PairedRecord]:
 
             try:
                 profile = Profile(**data)
-                records.append(PairedRecord(profile=profile, target_password=target))
             except Exception:
                 continue
-    return records
+            yield PairedRecord(profile=profile, target_password=target)
 
 
 def find_password_lists() -> list[Path]:
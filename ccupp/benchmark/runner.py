@@ -24,6 +24,7 @@ from ccupp.benchmark.profiles import BENCHMARK_PROFILES
 from ccupp.benchmark.tools import BaseTool
 from ccupp.benchmark.tools import ToolResult
 from ccupp.models import Profile
+from ccupp.transforms.pinyin import pinyin_cache
 
 
 LENGTH_BUCKETS = ['1-6', '7-8', '9-12', '13-16', '17-24', '25+']
@@ -96,11 +97,13 @@ class BenchmarkRunner:
         datasets: dict[str, set[str]] | None = None,
         paired_datasets: dict[str, list[PairedRecord]] | None = None,
         console: Console | None = None,
+        pinyin_cache: str | Path | None = None,
     ):
         self.tools = tools
         self.datasets = datasets or {'common-passwords': get_builtin_common_passwords()}
         self.paired_datasets = paired_datasets or {}
         self.console = console or Console(stderr=True)
+        self.pinyin_cache = pinyin_cache
 
     def add_dataset(self, name: str, passwords: set[str]) -> None:
         """Add a password dataset for evaluation."""
@@ -122,7 +125,21 @@ class BenchmarkRunner:
         profiles: dict[str, Profile] | None = None,
         max_paired_records: int = 0,
     ) -> BenchmarkReport:
-        """Run the full benchmark."""
+        """Run the full benchmark.
+
+        With a ``pinyin_cache`` file, every tool's pinyin conversions go
+        through it, and the words converted are saved to it at the end.
+        """
+        if self.pinyin_cache is None:
+            return self._run(profiles, max_paired_records)
+        with pinyin_cache(self.pinyin_cache):
+            return self._run(profiles, max_paired_records)
+
+    def _run(
+        self,
+        profiles: dict[str, Profile] | None,
+        max_paired_records: int,
+    ) -> BenchmarkReport:
         if profiles is None:
             profiles = BENCHMARK_PROFILES
 
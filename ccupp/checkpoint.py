@@ -0,0 +1,54 @@
+"""Resume points for long generation runs.
+
+A checkpoint records a raw plan position (see
+:meth:`~ccupp.generator.PasswordGenerator.candidate_at`) counted across the
+plans of all profiles in order. Generation restarted from that position
+loses nothing that was not yet written, but may repeat a few passwords that
+were: the position only advances between profiles, and passwords first
+seen before it are not remembered for dedup.
+"""
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import asdict
+from dataclasses import dataclass
+from pathlib import Path
+
+# Seconds between checkpoint saves during a run
+SAVE_INTERVAL = 5.0
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a generation run.
+
+    Attributes:
+        position: Raw plan position to resume from.
+        emitted: Passwords written so far, across all resumed runs.
+    """
+
+    position: int = 0
+    emitted: int = 0
+
+    @classmethod
+    def load(cls, path: str | Path) -> Checkpoint:
+        """Read a checkpoint written by :meth:`save`.
+
+        Raises:
+            FileNotFoundError: If there is no checkpoint at ``path``.
+            ValueError: If the file is not a valid checkpoint.
+        """
+        with open(path, encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+                return cls(position=int(data['position']), emitted=int(data['emitted']))
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f'Invalid checkpoint file {path}: {e}') from None
+
+    def save(self, path: str | Path) -> None:
+        """Write the checkpoint atomically, so a kill never leaves it torn."""
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp, path)
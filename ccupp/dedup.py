@@ -0,0 +1,434 @@
+"""Deduplication backends for password generation.
+
+:class:`ExactDedup` is an ordinary ``set`` and never drops a new password.
+:class:`BloomFilter` and :class:`CuckooFilter` use a fixed amount of memory
+however many passwords pass through them, at the price of a configurable
+false-positive rate: a small fraction of *new* passwords is mistaken for a
+duplicate and skipped. The cuckoo filter additionally stops remembering
+passwords once it is full (see :attr:`CuckooFilter.overflowed`), which lets
+some duplicates through instead.
+
+Filters hash with BLAKE2b rather than :func:`hash`, so which passwords get
+dropped is the same from run to run.
+
+:class:`ExternalDedup` is exact *and* memory-bounded: it spills sorted runs
+to disk and merges them, but can only emit once all input has been seen.
+"""
+from __future__ import annotations
+
+import heapq
+import math
+import random
+import struct
+import tempfile
+from abc import ABC
+from abc import abstractmethod
+from array import array
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from hashlib import blake2b
+from pathlib import Path
+from types import TracebackType
+
+DEDUP_BACKENDS = ('exact', 'bloom', 'cuckoo', 'external')
+
+# Default memory budget for the probabilistic backends (64 MiB)
+DEFAULT_FILTER_MEMORY = 64 << 20
+
+# Default target false-positive rate for the probabilistic backends
+DEFAULT_FP_RATE = 1e-6
+
+_SIZE_UNITS = {'': 1, 'B': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(text: str) -> int:
+    """Parse a memory size such as ``'256M'``, ``'1.5G'`` or ``'4096'``.
+
+    Units are binary (``K`` = 1024 bytes); a trailing ``B``/``iB`` is
+    accepted, e.g. ``'256MiB'``.
+
+    >>> parse_size('256M')
+    268435456
+    >>> parse_size('1.5K')
+    1536
+
+    Raises:
+        ValueError: If the text is not a size.
+    """
+    value = text.strip().upper().removesuffix('IB').removesuffix('B')
+    unit = value[-1:] if value[-1:] in _SIZE_UNITS and not value[-1:].isdigit() else ''
+    number = value[:len(value) - len(unit)]
+    try:
+        amount = float(number)
+        if not math.isfinite(amount):
+            raise ValueError('not finite')
+        size = int(amount * _SIZE_UNITS[unit])
+    except (ValueError, OverflowError):
+        raise ValueError(f'Invalid size: {text!r} (e.g. 256M, 1G)') from None
+    if size <= 0:
+        raise ValueError(f'Size must be positive: {text!r}')
+    return size
+
+
+def _digest(item: str) -> bytes:
+    return blake2b(item.encode('utf-8'), digest_size=16).digest()
+
+
+class Deduplicator(ABC):
+    """Remembers passwords and reports whether each one is new."""
+
+    def __init__(self) -> None:
+        # Number of items accepted as new
+        self.count = 0
+
+    @abstractmethod
+    def add(self, item: str) -> bool:
+        """Record an item; return True if it had not been seen before."""
+
+    def filter_new(self, items: Iterable[str]) -> list[str]:
+        """Record a batch of items and return the new ones, in order."""
+        add = self.add
+        return [item for item in items if add(item)]
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class ExactDedup(Deduplicator):
+    """Exact deduplication with a ``set`` — unbounded memory, no false positives."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._seen: set[str] = set()
+
+    def add(self, item: str) -> bool:
+        if item in self._seen:
+            return False
+        self._seen.add(item)
+        self.count += 1
+        return True
+
+    def filter_new(self, items: Iterable[str]) -> list[str]:
+        seen = self._seen
+        seen_add = seen.add
+        # `not seen_add(x)` is always true; it records x so later copies
+        # inside the same batch are dropped too.
+        fresh = [item for item in items if item not in seen and not seen_add(item)]
+        self.count += len(fresh)
+        return fresh
+
+    def __contains__(self, item: str) -> bool:
+        return item in self._seen
+
+
+class BloomFilter(Deduplicator):
+    """Fixed-memory Bloom filter.
+
+    The number of hash functions is chosen from ``fp_rate``; the rate is
+    actually met while at most :attr:`capacity` passwords have been added,
+    and degrades gracefully beyond that.
+
+    Args:
+        memory: Size of the bit array in bytes.
+        fp_rate: Target false-positive rate.
+
+    Raises:
+        ValueError: If ``memory`` is not positive or ``fp_rate`` is not
+            between 0 and 1.
+    """
+
+    def __init__(self, memory: int = DEFAULT_FILTER_MEMORY, fp_rate: float = DEFAULT_FP_RATE) -> None:
+        super().__init__()
+        if not 0 < fp_rate < 1:
+            raise ValueError(f'fp_rate must be between 0 and 1, got {fp_rate}')
+        if memory <= 0:
+            raise ValueError(f'memory must be positive, got {memory}')
+        self.fp_rate = fp_rate
+        self.num_bits = memory * 8
+        self.num_hashes = max(1, round(-math.log2(fp_rate)))
+        self._bits = bytearray(memory)
+
+    @property
+    def capacity(self) -> int:
+        """Passwords the filter holds before exceeding ``fp_rate``."""
+        return int(self.num_bits * math.log(2) ** 2 / -math.log(self.fp_rate))
+
+    def _positions(self, item: str) -> list[int]:
+        digest = _digest(item)
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        num_bits = self.num_bits
+        # Double hashing: the k positions are h1 + i*h2 (mod m)
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def add(self, item: str) -> bool:
+        bits = self._bits
+        new = False
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class CuckooFilter(Deduplicator):
+    """Fixed-memory cuckoo filter with 4-slot buckets.
+
+    Fingerprints are 8, 16 or 32 bits wide, whichever is the smallest that
+    meets ``fp_rate``. When an insert cannot find room after
+    :attr:`MAX_KICKS` relocations the last displaced fingerprint is
+    dropped and :attr:`overflowed` is incremented.
+
+    Args:
+        memory: Size of the fingerprint table in bytes.
+        fp_rate: Target false-positive rate.
+
+    Raises:
+        ValueError: If ``memory`` is smaller than one bucket (4 to 16
+            bytes, depending on the fingerprint width) or ``fp_rate`` is
+            not between 0 and 1.
+    """
+
+    BUCKET_SIZE = 4
+    MAX_KICKS = 500
+
+    def __init__(self, memory: int = DEFAULT_FILTER_MEMORY, fp_rate: float = DEFAULT_FP_RATE) -> None:
+        super().__init__()
+        if not 0 < fp_rate < 1:
+            raise ValueError(f'fp_rate must be between 0 and 1, got {fp_rate}')
+        # A lookup compares against 2 buckets x 4 slots: eps ≈ 8 / 2^f
+        bits_needed = math.ceil(math.log2(2 * self.BUCKET_SIZE / fp_rate))
+        typecode = 'B' if bits_needed <= 8 else 'H' if bits_needed <= 16 else 'I'
+        self._slots = array(typecode)
+        self.fingerprint_bits = self._slots.itemsize * 8
+        bucket_bytes = self.BUCKET_SIZE * self._slots.itemsize
+        if memory < bucket_bytes:
+            raise ValueError(f'memory must hold at least one {bucket_bytes}-byte bucket, got {memory}')
+        # Power-of-two bucket count so the alternate index is an XOR
+        self.num_buckets = 1 << max(0, (memory // bucket_bytes).bit_length() - 1)
+        self._slots.frombytes(bytes(self.num_buckets * bucket_bytes))
+        self._rng = random.Random(0)
+        self.overflowed = 0
+
+    def _alt_index(self, index: int, fp: int) -> int:
+        return (index ^ ((fp * 0x5BD1E995) & 0xFFFFFFFF)) & (self.num_buckets - 1)
+
+    def add(self, item: str) -> bool:
+        digest = _digest(item)
+        # Fingerprint 0 marks an empty slot, so it is never used
+        fp = (int.from_bytes(digest[8:12], 'little') & ((1 << self.fingerprint_bits) - 1)) or 1
+        i1 = int.from_bytes(digest[:8], 'little') & (self.num_buckets - 1)
+        i2 = self._alt_index(i1, fp)
+        size = self.BUCKET_SIZE
+        slots = self._slots
+        b1, b2 = i1 * size, i2 * size
+        if fp in slots[b1:b1 + size] or fp in slots[b2:b2 + size]:
+            return False
+
+        self.count += 1
+        for base in (b1, b2):
+            for slot in range(base, base + size):
+                if not slots[slot]:
+                    slots[slot] = fp
+                    return True
+
+        # Both buckets full: evict fingerprints along the cuckoo path
+        index = self._rng.choice((i1, i2))
+        for _ in range(self.MAX_KICKS):
+            slot = index * size + self._rng.randrange(size)
+            fp, slots[slot] = slots[slot], fp
+            index = self._alt_index(index, fp)
+            base = index * size
+            for slot in range(base, base + size):
+                if not slots[slot]:
+                    slots[slot] = fp
+                    return True
+        self.overflowed += 1
+        return True
+
+
+# Run record header: first-seen position (u64) and key length (u32)
+_RECORD = struct.Struct('<QI')
+
+# Rough in-memory cost of one buffered entry beyond its key bytes: the
+# bytes object header, the int and the dict slot.
+_ENTRY_OVERHEAD = 120
+
+# Maximum number of runs merged at once (bounds open file handles)
+MAX_MERGE_FANIN = 128
+
+_RUN_BUFFER_SIZE = 1 << 16
+
+_Record = tuple[bytes, int]
+
+
+def _write_run(path: Path, records: Iterable[_Record]) -> None:
+    with open(path, 'wb', buffering=_RUN_BUFFER_SIZE) as f:
+        pack = _RECORD.pack
+        for key, pos in records:
+            f.write(pack(pos, len(key)))
+            f.write(key)
+
+
+def _read_run(path: Path) -> Iterator[_Record]:
+    with open(path, 'rb', buffering=_RUN_BUFFER_SIZE) as f:
+        read = f.read
+        unpack = _RECORD.unpack
+        size = _RECORD.size
+        while header := read(size):
+            pos, length = unpack(header)
+            yield read(length), pos
+
+
+def _by_position(record: _Record) -> int:
+    return record[1]
+
+
+class ExternalDedup:
+    """Exact, memory-bounded dedup that spills sorted runs to disk.
+
+    Passwords are buffered with their first-seen position until the buffer
+    reaches ``memory`` bytes, then written out as a run sorted by password.
+    When iterated, the runs are k-way merged to keep only the first
+    occurrence of each password, re-sorted by position (again in bounded
+    runs) and merged once more, so the output is exactly what an in-memory
+    ``set`` would have produced, in the same order.
+
+    If nothing was ever spilled, iteration is served straight from memory.
+
+    Args:
+        memory: Approximate buffer budget in bytes.
+        temp_dir: Directory for run files (default: the system temp dir).
+    """
+
+    def __init__(self, memory: int = DEFAULT_FILTER_MEMORY, temp_dir: str | Path | None = None) -> None:
+        self.memory = memory
+        self._temp_dir = temp_dir
+        self._tmp: tempfile.TemporaryDirectory[str] | None = None
+        self._buffer: dict[bytes, int] = {}
+        self._buffer_bytes = 0
+        self._position = 0
+        self._runs: list[Path] = []
+        self.spilled_runs = 0
+
+    def add(self, item: str) -> None:
+        """Record a password (duplicates are resolved when iterating)."""
+        key = item.encode('utf-8')
+        if key not in self._buffer:
+            self._buffer[key] = self._position
+            self._buffer_bytes += len(key) + _ENTRY_OVERHEAD
+            if self._buffer_bytes >= self.memory:
+                self._spill()
+        self._position += 1
+
+    def _new_run_path(self) -> Path:
+        if self._tmp is None:
+            self._tmp = tempfile.TemporaryDirectory(prefix='ccupp-dedup-', dir=self._temp_dir)
+        self.spilled_runs += 1
+        return Path(self._tmp.name) / f'run-{self.spilled_runs:06d}'
+
+    def _spill(self) -> None:
+        path = self._new_run_path()
+        _write_run(path, sorted(self._buffer.items()))
+        self._runs.append(path)
+        self._buffer = {}
+        self._buffer_bytes = 0
+
+    def _merge(self, runs: list[Path], key: Callable[[_Record], int] | None) -> Iterator[_Record]:
+        """Merge sorted runs, in several passes if there are too many."""
+        while len(runs) > MAX_MERGE_FANIN:
+            batch, runs = runs[:MAX_MERGE_FANIN], runs[MAX_MERGE_FANIN:]
+            path = self._new_run_path()
+            _write_run(path, heapq.merge(*map(_read_run, batch), key=key))
+            for done in batch:
+                done.unlink()
+            runs.append(path)
+        return heapq.merge(*map(_read_run, runs), key=key)
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield each unique password once, in first-seen order."""
+        if not self._runs:
+            # Dicts keep insertion order, which is first-seen order
+            for key in self._buffer:
+                yield key.decode('utf-8')
+            return
+
+        if self._buffer:
+            self._spill()
+        by_key, self._runs = self._runs, []
+
+        # Pass 1: merge by password, keeping the first occurrence. Records
+        # tie-break on position, so the first of each group is the earliest.
+        sorted_by_position: list[Path] = []
+        chunk: list[_Record] = []
+        chunk_bytes = 0
+        previous: bytes | None = None
+        for record in self._merge(by_key, key=None):
+            if record[0] == previous:
+                continue
+            previous = record[0]
+            chunk.append(record)
+            chunk_bytes += len(record[0]) + _ENTRY_OVERHEAD
+            if chunk_bytes >= self.memory:
+                path = self._new_run_path()
+                _write_run(path, sorted(chunk, key=_by_position))
+                sorted_by_position.append(path)
+                chunk, chunk_bytes = [], 0
+        chunk.sort(key=_by_position)
+
+        # Pass 2: merge the position-sorted runs back into original order
+        runs = [_read_run(path) for path in sorted_by_position]
+        for key, _ in heapq.merge(iter(chunk), *runs, key=_by_position):
+            yield key.decode('utf-8')
+        self.close()
+
+    def close(self) -> None:
+        """Delete any run files."""
+        if self._tmp is not None:
+            self._tmp.cleanup()
+            self._tmp = None
+
+    def __enter__(self) -> ExternalDedup:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def make_deduplicator(
+    backend: str = 'exact',
+    memory: int = DEFAULT_FILTER_MEMORY,
+    fp_rate: float = DEFAULT_FP_RATE,
+) -> Deduplicator | ExternalDedup:
+    """Create a deduplication backend by name.
+
+    Args:
+        backend: One of :data:`DEDUP_BACKENDS`.
+        memory: Memory cap in bytes (all backends but ``exact``).
+        fp_rate: Target false-positive rate (``bloom`` and ``cuckoo`` only).
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == 'exact':
+        return ExactDedup()
+    if backend == 'bloom':
+        return BloomFilter(memory=memory, fp_rate=fp_rate)
+    if backend == 'cuckoo':
+        return CuckooFilter(memory=memory, fp_rate=fp_rate)
+    if backend == 'external':
+        return ExternalDedup(memory=memory)
+    raise ValueError(f'Unknown dedup backend: {backend} (use {", ".join(DEDUP_BACKENDS)})')
@@ -1,16 +1,29 @@
 """Extract password components from a user Profile."""
 from __future__ import annotations
 
+from collections.abc import Callable
 from collections.abc import Iterable
 from collections.abc import Iterator
+from collections.abc import Mapping
+from itertools import islice
 from typing import TYPE_CHECKING
 
-from ccupp.transforms.date import date_variants
+from ccupp.stats import extracting
+from ccupp.stats import GenerationStats
+from ccupp.transforms.date import birth_years
+from ccupp.transforms.date import cached_date_variants
+from ccupp.transforms.date import partial_date_variants
 from ccupp.transforms.pinyin import pinyin_variants
 
 if TYPE_CHECKING:
     from ccupp.models import Profile
 
+# Birthdate components kept when only the year, a year range or the age is
+# known: the year (and month) forms, then the first candidate dates. Each
+# is multiplied by every name form, so this stays small; use
+# partial_date_variants() directly to go deeper.
+PARTIAL_BIRTHDATE_PARTS = 32
+
 
 def _text_variants(word: str, use_pinyin: bool = True) -> Iterator[str]:
     """Generate variants of a single text value.
@@ -43,16 +56,8 @@ def _extract_nested(groups: list[list[str]], use_pinyin: bool = True) -> Iterato
             yield from _text_variants(item, use_pinyin)
 
 
-def extract_components(profile: Profile) -> dict[str, list[str]]:
-    """Extract all password components from a Profile.
-
-    Returns a dict mapping component categories to lists of unique values.
-    Each category represents a type of personal information that might
-    appear in passwords.
-    """
-    components: dict[str, list[str]] = {}
-
-    # Name components (pinyin)
+def _name_parts(profile: Profile) -> list[str]:
+    """Name components (pinyin)."""
     name_parts: list[str] = []
     if profile.surname:
         name_parts.extend(pinyin_variants(profile.surname))
@@ -62,10 +67,11 @@ def extract_components(profile: Profile) -> dict[str, list[str]]:
     if profile.surname and profile.first_name:
         full = profile.surname + profile.first_name
         name_parts.extend(pinyin_variants(full))
-    if name_parts:
-        components['name'] = _dedup(name_parts)
+    return _dedup(name_parts)
+
 
-    # Phone numbers (no pinyin)
+def _phone_parts(profile: Profile) -> list[str]:
+    """Phone numbers (no pinyin)."""
     phone_parts = list(_extract_flat(profile.phone_numbers, use_pinyin=False))
     # Also extract last 4/6 digits
     for phone in profile.phone_numbers:
@@ -73,63 +79,157 @@ def extract_components(profile: Profile) -> dict[str, list[str]]:
             phone_parts.append(phone[-4:])
         if len(phone) >= 6:
             phone_parts.append(phone[-6:])
-    if phone_parts:
-        components['phone'] = _dedup(phone_parts)
-
-    # Identity number (no pinyin)
-    if profile.identity:
-        id_parts = [profile.identity]
-        if len(profile.identity) >= 4:
-            id_parts.append(profile.identity[-4:])
-        if len(profile.identity) >= 6:
-            id_parts.append(profile.identity[-6:])
-        components['identity'] = _dedup(id_parts)
-
-    # Birthdate (date variants)
-    if profile.birthdate and len(profile.birthdate) >= 3:
-        year, month, day = profile.birthdate[0], profile.birthdate[1], profile.birthdate[2]
-        components['birthdate'] = _dedup(date_variants(year, month, day))
-    elif profile.birthdate:
-        # Partial date — just use raw values
-        components['birthdate'] = _dedup(profile.birthdate)
-
-    # Hometowns (pinyin)
-    hometown_parts = list(_extract_flat(profile.hometowns, use_pinyin=True))
-    if hometown_parts:
-        components['hometowns'] = _dedup(hometown_parts)
-
-    # Places (nested, pinyin)
-    place_parts = list(_extract_nested(profile.places, use_pinyin=True))
-    if place_parts:
-        components['places'] = _dedup(place_parts)
-
-    # Social media (no pinyin)
-    social_parts = list(_extract_flat(profile.social_media, use_pinyin=False))
-    if social_parts:
-        components['social_media'] = _dedup(social_parts)
-
-    # Workplaces (nested, pinyin)
-    work_parts = list(_extract_nested(profile.workplaces, use_pinyin=True))
-    if work_parts:
-        components['workplaces'] = _dedup(work_parts)
-
-    # Educational institutions (nested, pinyin)
-    edu_parts = list(_extract_nested(profile.educational_institutions, use_pinyin=True))
-    if edu_parts:
-        components['education'] = _dedup(edu_parts)
-
-    # Accounts (no pinyin)
-    account_parts = list(_extract_flat(profile.accounts, use_pinyin=False))
-    if account_parts:
-        components['accounts'] = _dedup(account_parts)
-
-    # Old passwords (as-is)
-    if profile.passwords:
-        components['passwords'] = _dedup(profile.passwords)
+    return _dedup(phone_parts)
+
+
+def _identity_parts(profile: Profile) -> list[str]:
+    """Identity number (no pinyin)."""
+    if not profile.identity:
+        return []
+    id_parts = [profile.identity]
+    if len(profile.identity) >= 4:
+        id_parts.append(profile.identity[-4:])
+    if len(profile.identity) >= 6:
+        id_parts.append(profile.identity[-6:])
+    return _dedup(id_parts)
+
+
+def _birthdate_parts(profile: Profile) -> list[str]:
+    """Birthdate (date variants, or the likeliest candidates if only partly known)."""
+    birthdate = profile.birthdate
+    if len(birthdate) >= 3:
+        return list(cached_date_variants(birthdate[0], birthdate[1], birthdate[2]))
+    years = birth_years(birthdate[0] if birthdate else '', profile.birth_year_range, profile.age)
+    if not years:
+        # Unrecognised partial date — just use raw values
+        return _dedup(birthdate)
+    month = int(birthdate[1]) if len(birthdate) > 1 and birthdate[1].isdigit() else 0
+    return list(islice(partial_date_variants(years, month if 1 <= month <= 12 else 0), PARTIAL_BIRTHDATE_PARTS))
+
+
+def _hometown_parts(profile: Profile) -> list[str]:
+    """Hometowns (pinyin)."""
+    return _dedup(_extract_flat(profile.hometowns, use_pinyin=True))
+
+
+def _place_parts(profile: Profile) -> list[str]:
+    """Places (nested, pinyin)."""
+    return _dedup(_extract_nested(profile.places, use_pinyin=True))
+
+
+def _social_parts(profile: Profile) -> list[str]:
+    """Social media (no pinyin)."""
+    return _dedup(_extract_flat(profile.social_media, use_pinyin=False))
+
+
+def _work_parts(profile: Profile) -> list[str]:
+    """Workplaces (nested, pinyin)."""
+    return _dedup(_extract_nested(profile.workplaces, use_pinyin=True))
+
 
+def _education_parts(profile: Profile) -> list[str]:
+    """Educational institutions (nested, pinyin)."""
+    return _dedup(_extract_nested(profile.educational_institutions, use_pinyin=True))
+
+
+def _account_parts(profile: Profile) -> list[str]:
+    """Accounts (no pinyin)."""
+    return _dedup(_extract_flat(profile.accounts, use_pinyin=False))
+
+
+def _password_parts(profile: Profile) -> list[str]:
+    """Old passwords (as-is)."""
+    return _dedup(profile.passwords)
+
+
+def _any_text(groups: Iterable[Iterable[str]]) -> bool:
+    """Whether any non-empty string appears in a nested list."""
+    return any(item for group in groups for item in group)
+
+
+# Component categories in output order: category -> (extractor, presence
+# check). The presence check answers "would the extractor return anything?"
+# from the raw profile fields alone, without running pinyin conversion.
+_CATEGORIES: dict[str, tuple[Callable[[Profile], list[str]], Callable[[Profile], bool]]] = {
+    'name': (_name_parts, lambda p: bool(p.surname or p.first_name)),
+    'phone': (_phone_parts, lambda p: any(p.phone_numbers)),
+    'identity': (_identity_parts, lambda p: bool(p.identity)),
+    'birthdate': (
+        _birthdate_parts,
+        lambda p: bool(p.birthdate) or p.birth_year_range is not None or p.age is not None,
+    ),
+    'hometowns': (_hometown_parts, lambda p: any(p.hometowns)),
+    'places': (_place_parts, lambda p: _any_text(p.places)),
+    'social_media': (_social_parts, lambda p: any(p.social_media)),
+    'workplaces': (_work_parts, lambda p: _any_text(p.workplaces)),
+    'education': (_education_parts, lambda p: _any_text(p.educational_institutions)),
+    'accounts': (_account_parts, lambda p: any(p.accounts)),
+    'passwords': (_password_parts, lambda p: bool(p.passwords)),
+}
+
+
+def extract_components(profile: Profile, stats: GenerationStats | None = None) -> dict[str, list[str]]:
+    """Extract all password components from a Profile.
+
+    Returns a dict mapping component categories to lists of unique values.
+    Each category represents a type of personal information that might
+    appear in passwords. If ``stats`` is given, extraction and pinyin
+    time are recorded in it.
+    """
+    components: dict[str, list[str]] = {}
+    for category, (extractor, _) in _CATEGORIES.items():
+        if stats is None:
+            values = extractor(profile)
+        else:
+            with extracting(stats):
+                values = extractor(profile)
+        if values:
+            components[category] = values
     return components
 
 
+class LazyComponents(Mapping[str, list[str]]):
+    """Read-only view of :func:`extract_components` that extracts on demand.
+
+    Keys are known up front, but each category's values (and so any pinyin
+    conversion they need) are only computed the first time they are looked
+    up. A generator that stops early never pays for categories it did not
+    reach. If ``stats`` is given, extraction and pinyin time are recorded
+    in it.
+    """
+
+    def __init__(self, profile: Profile, stats: GenerationStats | None = None) -> None:
+        self._profile = profile
+        self._stats = stats
+        self._keys = [
+            category for category, (_, present) in _CATEGORIES.items()
+            if present(profile)
+        ]
+        self._values: dict[str, list[str]] = {}
+
+    def __getitem__(self, category: str) -> list[str]:
+        if category not in self._values:
+            if category not in self._keys:
+                raise KeyError(category)
+            extractor, _ = _CATEGORIES[category]
+            if self._stats is None:
+                self._values[category] = extractor(self._profile)
+            else:
+                with extracting(self._stats):
+                    self._values[category] = extractor(self._profile)
+        return self._values[category]
+
+    def __contains__(self, category: object) -> bool:
+        # Membership must not trigger extraction (Mapping's default does).
+        return category in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
 def _dedup(items: Iterable[str]) -> list[str]:
     """Deduplicate while preserving order."""
     seen: set[str] = set()
@@ -1,11 +1,33 @@
 """Rule-based password generation engine."""
 from __future__ import annotations
 
+import sys
+from collections import Counter
 from collections.abc import Iterator
+from collections.abc import Mapping
+from dataclasses import dataclass
+from dataclasses import field
+from itertools import islice
 from itertools import product
+from math import prod
+from operator import itemgetter
+from zlib import crc32
 
+from ccupp.affixes import AffixTables
+from ccupp.dedup import Deduplicator
+from ccupp.dedup import ExactDedup
+from ccupp.ngram import NgramModel
+from ccupp.output import DEFAULT_BATCH_SIZE
+from ccupp.output import encode_batches
+from ccupp.policy import PasswordPolicy
+from ccupp.scoring import allocate_budget
+from ccupp.scoring import ranked_candidates
+from ccupp.scoring import resolve_family_weights
+from ccupp.stats import clock
+from ccupp.stats import GenerationStats
 from ccupp.transforms.case import case_variants
 from ccupp.transforms.leetspeak import leetspeak_variants
+from ccupp.weights import OrderWeights
 
 # Chinese culturally significant numbers commonly used in passwords
 CHINESE_LUCKY_NUMBERS = [
@@ -52,17 +74,372 @@ COMMON_PREFIXES = ['', 'a', 'i', 'my', 'wo', 'the']
 # Delimiters between components
 DELIMITERS = ['', '.', '-', '_', '@', '#']
 
+# Rule families in priority order (see PasswordGenerator.generate)
+FAMILIES = (
+    'old_password_variants',
+    'single_component_suffixed',
+    'name_date',
+    'name_id',
+    'two_component',
+    'cultural_numbers',
+    'keyboard_patterns',
+)
+
+# Candidates per block in scored and budget modes
+SCORED_BLOCK_SIZE = 4096
+
+# Join orders for two-part combos: ``a + b`` then ``b + a``
+_BOTH_WAYS = ((0, 1), (1, 0))
+# Join orders for delimited combos: ``a + delim + b`` then ``b + delim + a``
+_BOTH_WAYS_DELIMITED = ((0, 2, 1), (1, 2, 0))
+
+
+@dataclass(frozen=True, slots=True)
+class PlanNode:
+    """One product node of a compiled generation plan.
+
+    A node expands to the cartesian product of its ``slots`` (first slot
+    outermost). Each product tuple is joined once per entry in ``orders``,
+    a permutation of slot indices; an empty ``orders`` joins the slots in
+    their natural order. ``weight`` is the node's rule weight relative to
+    the other nodes of its family, used by scored generation (see
+    :mod:`ccupp.scoring`). ``sources`` names, per slot, the component
+    category or rule table (``suffixes``, ``prefixes``, ``delimiters``) its
+    values come from, or ``''``; training uses it to credit the entries that
+    made a hit (see :mod:`ccupp.training`).
+
+    >>> PlanNode('name_date', (('li',), ('83',), ('', '_')), ((0, 2, 1), (1, 2, 0))).expand()
+    ['li83', '83li', 'li_83', '83_li']
+    """
+
+    family: str
+    slots: tuple[tuple[str, ...], ...]
+    orders: tuple[tuple[int, ...], ...] = ()
+    weight: float = 1.0
+    sources: tuple[str, ...] = ()
+
+    def __len__(self) -> int:
+        """Number of candidates the node expands to (before dedup)."""
+        return prod(len(slot) for slot in self.slots) * max(1, len(self.orders))
+
+    def expand(self) -> list[str]:
+        """Build every candidate of this node as one block, in plan order."""
+        slots, orders = self.slots, self.orders
+        # Fast paths for the shapes the built-in rules compile to; string
+        # concatenation beats str.join on tuples for two or three parts.
+        if not orders:
+            if len(slots) == 1:
+                return list(slots[0])
+            if len(slots) == 2:
+                return [a + b for a in slots[0] for b in slots[1]]
+        elif orders == _BOTH_WAYS:
+            out: list[str] = []
+            append = out.append
+            for a, b in product(*slots):
+                append(a + b)
+                append(b + a)
+            return out
+        elif orders == _BOTH_WAYS_DELIMITED:
+            out = []
+            append = out.append
+            for a, b, delim in product(*slots):
+                append(a + delim + b)
+                append(b + delim + a)
+            return out
+
+        join = ''.join
+        if not orders:
+            return list(map(join, product(*slots)))
+        getters = [itemgetter(*order) for order in orders]
+        return [join(get(combo)) for combo in product(*slots) for get in getters]
+
+    def expand_within(self, policy: PasswordPolicy) -> list[str]:
+        """Build only the candidates ``policy`` accepts, in :meth:`expand` order.
+
+        Lengths add up and character classes carry over when slot values are
+        joined, so each value is looked at as its policy signature: values
+        with forbidden characters are dropped up front, and a value is only
+        extended if the slots after it can still reach the length bounds and
+        supply the missing classes. Sub-products that cannot pass are never
+        built. The last slot's admissible values depend only on the length
+        and classes of the prefix, so they are computed once per distinct
+        pair. Only the regex, if any, is checked on finished candidates.
+
+        >>> from ccupp.policy import PasswordPolicy
+        >>> node = PlanNode('single_component_suffixed', (('li', 'Li'), ('', '1', '123')))
+        >>> node.expand_within(PasswordPolicy(min_length=4, required={'upper'}))
+        ['Li123']
+        """
+        slots = [policy.slot_signatures(slot) for slot in self.slots]
+        if not all(slots):
+            return []
+        lower = policy.min_length
+        upper = policy.max_length or sys.maxsize
+        need = policy.required_mask
+
+        # Fast paths for the small shapes most nodes compile to
+        if len(slots) == 1:
+            out = [v for v, vl, vm in slots[0] if lower <= vl <= upper and vm & need == need]
+        elif len(slots) == 2 and not self.orders:
+            first, last = slots
+            tails: dict[tuple[int, int], list[str]] = {}
+            out = []
+            for a, al, am in first:
+                tail = tails.get((al, am))
+                if tail is None:
+                    tail = tails[al, am] = [
+                        b for b, bl, bm in last
+                        if lower <= al + bl <= upper and (am | bm) & need == need
+                    ]
+                out += [a + b for b in tail]
+        elif self.orders == _BOTH_WAYS_DELIMITED:
+            first, second, delims = slots
+            tails = {}
+            out = []
+            append = out.append
+            for a, al, am in first:
+                for b, bl, bm in second:
+                    length, mask = al + bl, am | bm
+                    tail = tails.get((length, mask))
+                    if tail is None:
+                        tail = tails[length, mask] = [
+                            d for d, dl, dm in delims
+                            if lower <= length + dl <= upper and (mask | dm) & need == need
+                        ]
+                    for delim in tail:
+                        append(a + delim + b)
+                        append(b + delim + a)
+        else:
+            out = self._expand_pruned(slots, lower, upper, need)
+
+        if policy.pattern:
+            matches = policy.matches
+            out = [pw for pw in out if matches(pw)]
+        return out
+
+    def _expand_pruned(
+        self,
+        slots: list[list[tuple[str, int, int]]],
+        lower: int,
+        upper: int,
+        need: int,
+    ) -> list[str]:
+        """General case of :meth:`expand_within` for any number of slots."""
+        # Shortest, longest and class union of what the slots after each
+        # position can still add
+        rest_min, rest_max, rest_mask = [0], [0], [0]
+        for values in reversed(slots[1:]):
+            rest_min.append(rest_min[-1] + min(length for _, length, _ in values))
+            rest_max.append(rest_max[-1] + max(length for _, length, _ in values))
+            mask = 0
+            for _, _, m in values:
+                mask |= m
+            rest_mask.append(rest_mask[-1] | mask)
+        rest_min.reverse()
+        rest_max.reverse()
+        rest_mask.reverse()
+
+        prefixes: list[tuple[tuple[str, ...], int, int]] = [((), 0, 0)]
+        for depth, values in enumerate(slots[:-1]):
+            lo = lower - rest_max[depth]
+            hi = upper - rest_min[depth]
+            extra = rest_mask[depth]
+            prefixes = [
+                ((*parts, v), length + vl, mask | vm)
+                for parts, length, mask in prefixes
+                for v, vl, vm in values
+                if lo <= length + vl <= hi and (mask | vm | extra) & need == need
+            ]
+            if not prefixes:
+                return []
+
+        last = slots[-1]
+        orders = self.orders
+        getters = [itemgetter(*order) for order in orders]
+        join = ''.join
+        tails: dict[tuple[int, int], list[str]] = {}
+        out: list[str] = []
+        append = out.append
+        for parts, length, mask in prefixes:
+            key = (length, mask)
+            tail = tails.get(key)
+            if tail is None:
+                tail = tails[key] = [
+                    v for v, vl, vm in last
+                    if lower <= length + vl <= upper and (mask | vm) & need == need
+                ]
+            # Same kernels as expand(), applied to the surviving tails
+            if not orders:
+                head = join(parts)
+                out += [head + v for v in tail]
+            elif orders == _BOTH_WAYS:
+                (a,) = parts
+                for b in tail:
+                    append(a + b)
+                    append(b + a)
+            elif orders == _BOTH_WAYS_DELIMITED:
+                a, b = parts
+                for delim in tail:
+                    append(a + delim + b)
+                    append(b + delim + a)
+            else:
+                for v in tail:
+                    combo = (*parts, v)
+                    out += [join(get(combo)) for get in getters]
+        return out
+
+    def candidate_at(self, index: int) -> str:
+        """Build only the candidate at ``index`` in :meth:`expand` order.
+
+        The index is decoded in mixed radix: the join order varies fastest,
+        then the slots from last to first.
+
+        >>> PlanNode('name_date', (('li', 'wang'), ('83', '1983')), ((0, 1), (1, 0))).candidate_at(5)
+        '83wang'
+
+        Raises:
+            IndexError: If the index is outside the node.
+        """
+        digits, which = self.locate(index)
+        parts = [slot[digit] for slot, digit in zip(self.slots, digits)]
+        if self.orders:
+            parts = [parts[i] for i in self.orders[which]]
+        return ''.join(parts)
+
+    def locate(self, index: int) -> tuple[list[int], int]:
+        """Slot value indices and join order index of the candidate at ``index``.
+
+        >>> PlanNode('name_date', (('li', 'wang'), ('83', '1983')), ((0, 1), (1, 0))).locate(5)
+        ([1, 0], 1)
+
+        Raises:
+            IndexError: If the index is outside the node.
+        """
+        if not 0 <= index < len(self):
+            raise IndexError(f'Plan index out of range: {index}')
+        which = 0
+        if self.orders:
+            index, which = divmod(index, len(self.orders))
+        digits = []
+        for slot in reversed(self.slots):
+            index, digit = divmod(index, len(slot))
+            digits.append(digit)
+        digits.reverse()
+        return digits, which
+
+
+def shard_of(password: str, num_shards: int) -> int:
+    """Return the shard a password belongs to.
+
+    A stable hash of the UTF-8 bytes, so every process and machine agrees
+    on the split regardless of ``PYTHONHASHSEED``.
+
+    >>> shard_of('li1983', 4)
+    0
+    """
+    return crc32(password.encode('utf-8')) % num_shards
+
+
+def validate_shard(shard_index: int, num_shards: int) -> None:
+    """Raise ValueError unless ``0 <= shard_index < num_shards``."""
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f'Invalid shard {shard_index} of {num_shards} (need 0 <= index < num_shards)')
+
+
+@dataclass
+class FamilyEstimate:
+    """Candidate counts for one rule family, computed without enumeration."""
+    family: str
+    # Exact number of candidates the family's plan nodes expand to
+    candidates: int = 0
+    # Exact number of those within the length bounds (empty strings excluded)
+    in_length: int = 0
+    # Most the family may emit under a budget (None without one)
+    cap: int | None = None
+
+    @property
+    def max_unique(self) -> int:
+        """Upper bound on unique candidates after length filters, budget and dedup."""
+        return self.in_length if self.cap is None else min(self.in_length, self.cap)
+
+
+@dataclass
+class GenerationEstimate:
+    """Per-family size estimate of a generation run.
+
+    ``candidates`` and ``in_length`` are exact counts before dedup.
+    Deduplication can only remove candidates, so ``max_unique`` is an upper
+    bound on what :meth:`PasswordGenerator.generate` will actually emit.
+    """
+    families: dict[str, FamilyEstimate] = field(
+        default_factory=lambda: {name: FamilyEstimate(name) for name in FAMILIES},
+    )
+    # Most the whole run may emit under a budget (None without one)
+    cap: int | None = None
+
+    @property
+    def candidates(self) -> int:
+        return sum(f.candidates for f in self.families.values())
+
+    @property
+    def in_length(self) -> int:
+        return sum(f.in_length for f in self.families.values())
+
+    @property
+    def max_unique(self) -> int:
+        total = sum(f.max_unique for f in self.families.values())
+        return total if self.cap is None else min(total, self.cap)
+
+    def merge(self, other: GenerationEstimate) -> None:
+        """Add another estimate (e.g. of the next profile) into this one."""
+        for name, fam in other.families.items():
+            mine = self.families.setdefault(name, FamilyEstimate(name))
+            mine.candidates += fam.candidates
+            mine.in_length += fam.in_length
+            if fam.cap is not None:
+                mine.cap = (mine.cap or 0) + fam.cap
+        if other.cap is not None:
+            self.cap = (self.cap or 0) + other.cap
+
+
+def _length_histogram(node: PlanNode) -> Counter[int]:
+    """Exact {length: count} of a node's candidates, by convolving its slots."""
+    hist: Counter[int] = Counter({0: max(1, len(node.orders))})
+    for slot in node.slots:
+        slot_hist = Counter(len(value) for value in slot)
+        combined: Counter[int] = Counter()
+        for length, count in hist.items():
+            for slot_length, slot_count in slot_hist.items():
+                combined[length + slot_length] += count * slot_count
+        hist = combined
+    return hist
+
 
 class PasswordGenerator:
     """Rule-based password generator.
 
     Generates passwords by applying rules to extracted components,
     ordered by priority (most likely passwords first).
+
+    Generation runs in two steps: :meth:`compile` turns the components and
+    the suffix/prefix/delimiter tables into a flat plan of
+    :class:`PlanNode` products, and :meth:`generate` expands that plan
+    block by block. With ``scored``, the plan is expanded in descending
+    order of estimated probability instead (see :mod:`ccupp.scoring`).
+    A ``budget`` caps the guesses per profile and splits them between the
+    rule families by expected yield (see :meth:`budget_quotas`).
+    Learned ``weights`` (see :mod:`ccupp.weights`) reorder the families,
+    the suffix/prefix/delimiter tables and the two-component category
+    pairs, and supply the family weights. Mined ``affixes`` (see
+    :mod:`ccupp.affixes`) replace the built-in suffix, prefix and
+    delimiter tables and lucky numbers. An ``ngram`` model (see
+    :mod:`ccupp.ngram`) reorders each family's candidates by how
+    human-like they are.
     """
 
     def __init__(
         self,
-        components: dict[str, list[str]],
+        components: Mapping[str, list[str]],
         *,
         enable_leetspeak: bool = True,
         enable_case_variants: bool = True,
@@ -71,6 +448,12 @@ class PasswordGenerator:
         suffixes: list[str] | None = None,
         prefixes: list[str] | None = None,
         delimiters: list[str] | None = None,
+        scored: bool = False,
+        family_weights: Mapping[str, float] | None = None,
+        budget: int = 0,
+        weights: OrderWeights | None = None,
+        ngram: NgramModel | None = None,
+        affixes: AffixTables | None = None,
     ) -> None:
         self.components = components
         self.enable_leetspeak = enable_leetspeak
@@ -80,8 +463,43 @@ class PasswordGenerator:
         self.suffixes = suffixes if suffixes is not None else COMMON_SUFFIXES
         self.prefixes = prefixes if prefixes is not None else COMMON_PREFIXES
         self.delimiters = delimiters if delimiters is not None else DELIMITERS
+        self.lucky_numbers = CHINESE_LUCKY_NUMBERS
+        self.affixes = affixes
+        if affixes is not None:
+            # Mined tables stand in for the built-in ones, not for explicit ones
+            if suffixes is None and affixes.suffixes:
+                self.suffixes = affixes.suffixes
+            if prefixes is None and affixes.prefixes:
+                self.prefixes = affixes.prefixes
+            if delimiters is None and affixes.delimiters:
+                self.delimiters = affixes.delimiters
+            if affixes.digit_tails:
+                self.lucky_numbers = affixes.digit_tails
+        self.weights = weights
+        if weights is not None:
+            self.suffixes = weights.rank_table('suffixes', self.suffixes)
+            self.prefixes = weights.rank_table('prefixes', self.prefixes)
+            self.delimiters = weights.rank_table('delimiters', self.delimiters)
+            family_weights = {**weights.family_weights, **(family_weights or {})}
+        self.scored = scored
+        self.family_weights = resolve_family_weights(family_weights)
+        if budget < 0:
+            raise ValueError(f'Budget must be non-negative, got {budget}')
+        self.budget = budget
+        if ngram is not None and scored:
+            raise ValueError('An n-gram model reorders families, which scored mode merges; use one or the other')
+        self.ngram = ngram
 
-    def generate(self) -> Iterator[str]:
+    def generate(
+        self,
+        limit: int = 0,
+        dedup: Deduplicator | None = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        start: int = 0,
+        policy: PasswordPolicy | None = None,
+        stats: GenerationStats | None = None,
+    ) -> Iterator[str]:
         """Generate passwords ordered by priority.
 
         Priority order:
@@ -93,139 +511,566 @@ class PasswordGenerator:
         6. Components + cultural numbers
         7. Keyboard patterns + components
         8. Leetspeak variants of top passwords
+
+        In scored mode, candidates of all families are instead merged into
+        one stream in descending order of estimated probability, each
+        family weighted by ``family_weights`` (see
+        :func:`~ccupp.scoring.ranked_candidates`). The whole plan is
+        compiled up front to seed the merge, but no node is expanded
+        beyond what is emitted.
+
+        Learned ``weights`` reorder the families above, and the tables and
+        category pairs within them.
+
+        With a ``budget``, each family stops at its quota (see
+        :meth:`budget_quotas`), and the fixed top-N cuts on suffixes,
+        delimiters and values in the two-component, keyboard and
+        old-password rules are lifted, since the quota bounds them
+        instead. Families still come in the order above, but each one is
+        expanded best first (its nodes merged as in scored mode), so a
+        quota buys the family's likeliest candidates. ``start`` then counts
+        positions in that order.
+
+        With an ``ngram`` model, each family's new passwords are held back
+        until the family is done and emitted best scored first (after its
+        quota, in budget mode), so ``limit`` and each profile's budget
+        take the most human-like ones. Families still come in order.
+
+        Args:
+            limit: Stop after this many unique passwords (0 = no limit).
+                The plan is compiled lazily, so rule families past the
+                limit are never built and components they alone need are
+                never looked up.
+            dedup: Deduplication backend (default: a fresh exact set).
+                Passing a shared backend also suppresses passwords it has
+                already seen elsewhere.
+            shard_index: Which slice of the output to produce, from 0 to
+                ``num_shards - 1``.
+            num_shards: Split the output into this many disjoint slices by
+                :func:`shard_of`. Each slice keeps the overall order, and
+                together the slices are exactly the unsharded output. Only a
+                slice's own candidates reach the dedup backend. ``limit``
+                counts per slice.
+            start: Resume at this raw plan position (see
+                :meth:`candidate_at`). Nodes wholly before it are skipped
+                without being expanded. Dedup only covers what this call
+                yields, so a password first seen before ``start`` can be
+                yielded again. In scored and budget modes, positions count
+                the passwords emitted instead, and the first ``start`` are
+                replayed rather than skipped: they go through the policy,
+                dedup and the quotas and count toward the budget and
+                ``limit``, just without being yielded, so the output is
+                exactly that of a run without ``start`` minus its first
+                ``start`` passwords.
+            policy: Only emit passwords this
+                :class:`~ccupp.policy.PasswordPolicy` accepts. It is pushed
+                down into expansion (see :meth:`PlanNode.expand_within`), so
+                candidates it rules out are mostly never built (in scored
+                and budget modes, each candidate is checked once built).
+            stats: Record per-family counters and timings in this
+                :class:`~ccupp.stats.GenerationStats`.
+
+        Raises:
+            ValueError: If the shard index is out of range or ``start`` is
+                negative.
         """
-        # Track yielded passwords for dedup
-        seen: set[str] = set()
+        for block in self.generate_blocks(limit, dedup, shard_index, num_shards, start, policy, stats):
+            yield from block
 
-        def _yield_new(password: str) -> Iterator[str]:
-            if password and password not in seen:
-                seen.add(password)
-                yield password
+    def generate_blocks(
+        self,
+        limit: int = 0,
+        dedup: Deduplicator | None = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        start: int = 0,
+        policy: PasswordPolicy | None = None,
+        stats: GenerationStats | None = None,
+    ) -> Iterator[list[str]]:
+        """Like :meth:`generate`, yielding each plan node's new passwords as one list.
 
-        # Priority 1: Old passwords and variants
-        for pw in self._old_password_variants():
-            yield from _yield_new(pw)
+        With an n-gram model, each block is a whole family's instead.
+        """
+        validate_shard(shard_index, num_shards)
+        if start < 0:
+            raise ValueError(f'Start position must be non-negative, got {start}')
 
-        # Priority 2: Single components with suffixes
-        for pw in self._single_component_suffixed():
-            yield from _yield_new(pw)
+        # Track yielded passwords for dedup; recording the empty string up
+        # front means empty candidates are never emitted
+        if dedup is None:
+            dedup = ExactDedup()
+        dedup.add('')
+        if self.scored:
+            yield from self._scored_blocks(limit, dedup, shard_index, num_shards, start, policy, stats)
+            return
+        if self.budget:
+            blocks = self._budgeted_blocks(limit, dedup, shard_index, num_shards, start, policy, stats)
+        else:
+            blocks = self._plan_blocks(limit, dedup, shard_index, num_shards, start, policy, stats)
+        if self.ngram is None:
+            for _, block in blocks:
+                if block:
+                    yield block
+            return
+        yield from self._reranked_blocks(blocks, limit, stats)
 
-        # Priority 3: Name + birthdate
-        for pw in self._name_date_combos():
-            yield from _yield_new(pw)
+    def _plan_blocks(
+        self,
+        limit: int,
+        dedup: Deduplicator,
+        shard_index: int,
+        num_shards: int,
+        start: int,
+        policy: PasswordPolicy | None,
+        stats: GenerationStats | None,
+    ) -> Iterator[tuple[str, list[str]]]:
+        """Plan mode of :meth:`generate_blocks`: each node's new passwords, with its family.
 
-        # Priority 4: Name + phone/identity tail
-        for pw in self._name_id_combos():
-            yield from _yield_new(pw)
+        An empty block ends each family. With an n-gram model, ``limit``
+        is left to :meth:`_reranked_blocks`.
+        """
+        if self.ngram is not None:
+            limit = 0
+        filter_new = dedup.filter_new
+        remaining = limit
+        if stats is not None:
+            since = clock()
 
-        # Priority 5: Two-component combinations
-        for pw in self._two_component_combos():
-            yield from _yield_new(pw)
+        for family, nodes in self._iter_families():
+            for node in nodes:
+                skipped = 0
+                if start:
+                    size = len(node)
+                    if start >= size:
+                        start -= size
+                        continue
+                    block = node.expand()[start:]
+                    skipped, start = start, 0
+                    if policy is not None:
+                        block = policy.filter(block)
+                elif policy is not None:
+                    block = node.expand_within(policy)
+                else:
+                    block = node.expand()
+                kept = len(block)
+                if num_shards > 1:
+                    block = [
+                        pw for pw in block
+                        if crc32(pw.encode('utf-8')) % num_shards == shard_index
+                    ]
+                fresh = filter_new(block)
+                done = bool(limit) and len(fresh) >= remaining
+                if stats is not None:
+                    since = stats.record_node(
+                        node.family, since, len(node) - skipped, kept, len(block), len(fresh),
+                        remaining if done else len(fresh),
+                    )
+                if not fresh:
+                    continue
+                if done:
+                    yield family, fresh[:remaining]
+                    return
+                remaining -= len(fresh)
+                yield family, fresh
+                if stats is not None:
+                    since = clock()
+            # An empty block ends the family
+            yield family, []
 
-        # Priority 6: Components + cultural numbers
-        if self.enable_cultural_numbers:
-            for pw in self._cultural_number_combos():
-                yield from _yield_new(pw)
+    def _reranked_blocks(
+        self,
+        blocks: Iterator[tuple[str, list[str]]],
+        limit: int,
+        stats: GenerationStats | None,
+    ) -> Iterator[list[str]]:
+        """Each family's new passwords from ``blocks`` as one block, reordered by the n-gram model."""
+        assert self.ngram is not None
+        remaining = limit
+        held: list[str] = []
+        for family, fresh in blocks:
+            if fresh:
+                held.extend(fresh)
+                continue
+            if not held:
+                continue
+            block = self.ngram.rank(held)
+            held = []
+            if limit and len(block) >= remaining:
+                if stats is not None:
+                    stats.family(family).emitted -= len(block) - remaining
+                yield block[:remaining]
+                return
+            remaining -= len(block)
+            yield block
+
+    def _scored_blocks(
+        self,
+        limit: int,
+        dedup: Deduplicator,
+        shard_index: int,
+        num_shards: int,
+        start: int,
+        policy: PasswordPolicy | None,
+        stats: GenerationStats | None,
+    ) -> Iterator[list[str]]:
+        """Scored mode of :meth:`generate_blocks`: one merge across all families."""
+        plan = self.compile()
+        quotas = self._quotas(plan, self.budget) if self.budget else None
+        # Families whose quota is used up; the merge drops their nodes
+        closed: set[str] = set()
+        ranked = ranked_candidates(plan, self.family_weights, closed=closed)
+        yield from self._ranked_blocks(
+            ranked, quotas, closed, limit, dedup, shard_index, num_shards, policy, stats, replay=start,
+        )
+
+    def _budgeted_blocks(
+        self,
+        limit: int,
+        dedup: Deduplicator,
+        shard_index: int,
+        num_shards: int,
+        start: int,
+        policy: PasswordPolicy | None,
+        stats: GenerationStats | None,
+    ) -> Iterator[tuple[str, list[str]]]:
+        """Budget mode of :meth:`generate_blocks`: family by family, each cut at its quota.
+
+        As in :meth:`_plan_blocks`, blocks come with their family, an
+        empty one ends each family, and with an n-gram model ``limit`` is
+        left to :meth:`_reranked_blocks`.
+        """
+        if self.ngram is not None:
+            limit = 0
+        groups: dict[str, list[PlanNode]] = {}
+        for node in self._iter_plan():
+            groups.setdefault(node.family, []).append(node)
+        sizes = [(family, sum(map(len, nodes))) for family, nodes in groups.items()]
+        budget = self.budget
+        remaining = limit
+        for i, family in enumerate(groups):
+            # Split what is left between this family and the ones after it,
+            # so budget an earlier family could not use rolls over
+            quotas = {family: allocate_budget(budget, dict(sizes[i:]), self.family_weights)[family]}
+            ranked = ranked_candidates(groups[family], self.family_weights)
+            quota = quotas[family]
+            for block in self._ranked_blocks(
+                ranked, quotas, set(), remaining, dedup, shard_index, num_shards, policy, stats, start,
+            ):
+                yield family, block
+            # What the family emitted, replayed passwords included
+            used = quota - quotas[family]
+            start -= min(start, used)
+            budget -= used
+            if limit:
+                remaining -= used
+            yield family, []
+            if budget <= 0 or (limit and remaining <= 0):
+                return
+
+    def _ranked_blocks(
+        self,
+        ranked: Iterator[tuple[float, str, str]],
+        quotas: dict[str, int] | None,
+        closed: set[str],
+        limit: int,
+        dedup: Deduplicator,
+        shard_index: int,
+        num_shards: int,
+        policy: PasswordPolicy | None,
+        stats: GenerationStats | None,
+        replay: int = 0,
+    ) -> Iterator[list[str]]:
+        """Filter, dedup and emit ranked candidates in blocks of :data:`SCORED_BLOCK_SIZE`.
+
+        With ``quotas``, each family stops once it has emitted its quota
+        (it is then added to ``closed``), and families without one emit
+        nothing. The first ``replay`` passwords that would be emitted are
+        left out of the blocks, but still charged to the quotas and
+        ``limit``.
+        """
+        add = dedup.add
+        remaining = limit
+        # Quota not used up yet, over all families
+        open_quota = sum(quotas.values()) if quotas is not None else 0
+        if quotas is not None:
+            if open_quota <= 0:
+                return
+            closed.update(family for family, quota in quotas.items() if quota <= 0)
+        if stats is not None:
+            since = clock()
+        while True:
+            chunk = list(islice(ranked, SCORED_BLOCK_SIZE))
+            if not chunk:
+                return
+            # Per-family counts at each stage, for stats: all, kept by the
+            # policy, in this shard, new, emitted (new ones past a limit are
+            # never looked at)
+            counts: dict[str, list[int]] = {}
+            block = []
+            # Emitted, replayed passwords included
+            taken = 0
+            done = False
+            for _, pw, family in chunk:
+                if quotas is not None and quotas.get(family, 0) <= 0:
+                    continue
+                count = counts.get(family)
+                if count is None:
+                    count = counts[family] = [0, 0, 0, 0, 0]
+                count[0] += 1
+                if policy is not None and not policy.accepts(pw):
+                    continue
+                count[1] += 1
+                if num_shards > 1 and crc32(pw.encode('utf-8')) % num_shards != shard_index:
+                    continue
+                count[2] += 1
+                if not add(pw):
+                    continue
+                count[3] += 1
+                taken += 1
+                if replay:
+                    replay -= 1
+                else:
+                    count[4] += 1
+                    block.append(pw)
+                if quotas is not None:
+                    quotas[family] -= 1
+                    open_quota -= 1
+                    if not quotas[family]:
+                        closed.add(family)
+                done = (bool(limit) and taken >= remaining) or (quotas is not None and open_quota <= 0)
+                if done:
+                    break
+            if stats is not None:
+                # The block's time is charged to its first family
+                for family, (candidates, kept, in_shard, fresh, emitted) in counts.items():
+                    since = stats.record_node(family, since, candidates, kept, in_shard, fresh, emitted)
+            if block:
+                yield block
+            if done:
+                return
+            remaining -= taken
+            if stats is not None:
+                since = clock()
+
+    def budget_quotas(self) -> dict[str, int]:
+        """How :attr:`budget` is split between the rule families up front.
+
+        Each family's quota is proportional to its expected yield, its
+        weight in :attr:`family_weights`, but never more than the
+        candidates it has; what a capped family cannot use goes to the
+        others (see :func:`~ccupp.scoring.allocate_budget`). Outside scored
+        mode, budget a family leaves unused (to dedup or the policy) is
+        re-split between the families after it as generation goes; in
+        scored mode the split is fixed, so it is left unused.
+        """
+        return self._quotas(self.compile(), self.budget)
 
-        # Priority 7: Keyboard patterns
+    def _quotas(self, plan: list[PlanNode], budget: int) -> dict[str, int]:
+        sizes: dict[str, int] = {}
+        for node in plan:
+            sizes[node.family] = sizes.get(node.family, 0) + len(node)
+        return allocate_budget(budget, sizes, self.family_weights)
+
+    def generate_batches(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        limit: int = 0,
+        dedup: Deduplicator | None = None,
+        shard_index: int = 0,
+        num_shards: int = 1,
+        start: int = 0,
+        policy: PasswordPolicy | None = None,
+    ) -> Iterator[bytes]:
+        """Like :meth:`generate`, yielding pre-encoded output batches.
+
+        Each batch is ``batch_size`` passwords as UTF-8, one per line with a
+        trailing newline (the last batch may be shorter), ready to be
+        written straight to a wordlist file or a cracker's stdin.
+        """
+        yield from encode_batches(
+            self.generate_blocks(limit, dedup, shard_index, num_shards, start, policy), batch_size,
+        )
+
+    def compile(self) -> list[PlanNode]:
+        """Compile the components and rule tables into a generation plan.
+
+        Expanding the returned nodes in order and dropping duplicates yields
+        exactly the sequence produced by :meth:`generate` (without
+        ``scored`` or ``budget``).
+        """
+        return list(self._iter_plan())
+
+    def plan_size(self) -> int:
+        """Number of raw plan positions, i.e. candidates before dedup."""
+        return sum(map(len, self._iter_plan()))
+
+    def candidate_at(self, index: int) -> str:
+        """Build only the candidate at raw plan position ``index``.
+
+        Positions number every candidate of the compiled plan before dedup,
+        in :meth:`generate` order, so the same password can sit at several
+        positions. The position is mapped to a node by walking node sizes,
+        then decoded with :meth:`PlanNode.candidate_at`; nothing is
+        expanded.
+
+        Raises:
+            IndexError: If the position is past the end of the plan.
+        """
+        if index >= 0:
+            offset = index
+            for node in self._iter_plan():
+                size = len(node)
+                if offset < size:
+                    return node.candidate_at(offset)
+                offset -= size
+        raise IndexError(f'Plan index out of range: {index}')
+
+    def estimate(self, min_length: int = 0, max_length: int = 0) -> GenerationEstimate:
+        """Count what each rule family would emit, without generating it.
+
+        Works from the compiled plan: node sizes are products of slot sizes,
+        and length-filtered counts come from convolving the slots' length
+        histograms. With a ``budget``, each family is capped at what it may
+        emit: its quota in scored mode, the whole budget otherwise (unused
+        budget rolls over to later families), and the profile at the budget.
+
+        Args:
+            min_length: Count only candidates at least this long (0 = no minimum).
+            max_length: Count only candidates at most this long (0 = no maximum).
+        """
+        estimate = GenerationEstimate()
+        if self.budget:
+            quotas = self._quotas(self.compile(), self.budget) if self.scored else {}
+            for name, fam in estimate.families.items():
+                fam.cap = quotas.get(name, 0) if self.scored else self.budget
+            estimate.cap = self.budget
+        for node in self._iter_plan():
+            fam = estimate.families[node.family]
+            fam.candidates += len(node)
+            for length, count in _length_histogram(node).items():
+                if length == 0:
+                    continue
+                if min_length and length < min_length:
+                    continue
+                if max_length and length > max_length:
+                    continue
+                fam.in_length += count
+        return estimate
+
+    def _iter_plan(self) -> Iterator[PlanNode]:
+        """Yield plan nodes in priority order, skipping empty products."""
+        for _, nodes in self._iter_families():
+            yield from nodes
+
+    def _iter_families(self) -> Iterator[tuple[str, Iterator[PlanNode]]]:
+        """Yield each rule family in priority order, with its plan nodes (built lazily)."""
+        builders = {
+            'old_password_variants': self._old_password_nodes,
+            'single_component_suffixed': self._single_component_nodes,
+            'name_date': self._name_date_nodes,
+            'name_id': self._name_id_nodes,
+            'two_component': self._two_component_nodes,
+        }
+        if self.enable_cultural_numbers:
+            builders['cultural_numbers'] = self._cultural_number_nodes
         if self.enable_keyboard_patterns:
-            for pw in self._keyboard_pattern_combos():
-                yield from _yield_new(pw)
+            builders['keyboard_patterns'] = self._keyboard_pattern_nodes
+        families = list(builders)
+        if self.weights is not None:
+            families = self.weights.rank_families(families)
+
+        for family in families:
+            yield family, (node for node in builders[family]() if all(node.slots))
+
+    def _top(self, n: int) -> int | None:
+        """Slice bound for a rule's top-``n`` cut; none when a budget bounds the rules."""
+        return None if self.budget else n
 
     def _all_single_values(self) -> Iterator[str]:
         """Yield all individual component values."""
         for values in self.components.values():
             yield from values
 
-    def _old_password_variants(self) -> Iterator[str]:
-        """Generate variants of old/known passwords."""
-        passwords = self.components.get('passwords', [])
-        for pw in passwords:
-            yield pw
+    def _old_password_nodes(self) -> Iterator[PlanNode]:
+        """Variants of old/known passwords."""
+        family = 'old_password_variants'
+        # Top 10 suffixes only, unless a budget bounds the family
+        suffixes = tuple(s for s in self.suffixes[:self._top(10)] if s)
+        for pw in self.components.get('passwords', []):
+            yield PlanNode(family, ((pw,),), weight=4.0)
             if self.enable_case_variants:
-                yield from case_variants(pw)
+                yield PlanNode(family, (tuple(case_variants(pw)),), weight=2.0)
             # Old password + common suffixes
-            for suffix in self.suffixes[:10]:  # Top 10 suffixes only
-                if suffix:
-                    yield pw + suffix
+            yield PlanNode(family, ((pw,), suffixes), weight=2.0, sources=('passwords', 'suffixes'))
             if self.enable_leetspeak:
-                yield from leetspeak_variants(pw)
+                yield PlanNode(family, (tuple(leetspeak_variants(pw)),))
 
-    def _single_component_suffixed(self) -> Iterator[str]:
+    def _single_component_nodes(self) -> Iterator[PlanNode]:
         """Single component + prefix/suffix — most common weak password pattern."""
+        family = 'single_component_suffixed'
+        suffixes = tuple(s for s in self.suffixes if s)
+        prefixes = tuple(p for p in self.prefixes if p)
         for value in self._all_single_values():
             # Value alone
-            yield value
-            # With case variants
+            yield PlanNode(family, ((value,),), weight=2.0)
             if self.enable_case_variants:
-                for cv in case_variants(value):
-                    yield cv
-                    # Case variant + suffix
-                    for suffix in self.suffixes:
-                        if suffix:
-                            yield cv + suffix
+                # Each case variant alone, then followed by every suffix
+                yield PlanNode(
+                    family, (tuple(case_variants(value)), ('',) + suffixes), weight=2.0, sources=('', 'suffixes'),
+                )
             else:
-                for suffix in self.suffixes:
-                    if suffix:
-                        yield value + suffix
+                yield PlanNode(family, ((value,), suffixes), weight=2.0, sources=('', 'suffixes'))
             # prefix + value
-            for prefix in self.prefixes:
-                if prefix:
-                    yield prefix + value
+            yield PlanNode(family, (prefixes, (value,)), weight=0.5, sources=('prefixes', ''))
 
-    def _name_date_combos(self) -> Iterator[str]:
+    def _name_date_nodes(self) -> Iterator[PlanNode]:
         """Name + birthdate — the most common Chinese weak password pattern."""
-        names = self.components.get('name', [])
-        dates = self.components.get('birthdate', [])
-        if not names or not dates:
-            return
-
-        for name, date in product(names, dates):
-            for delim in self.delimiters:
-                yield name + delim + date
-                yield date + delim + name
+        names = tuple(self.components.get('name', []))
+        dates = tuple(self.components.get('birthdate', []))
+        yield PlanNode(
+            'name_date', (names, dates, tuple(self.delimiters)), _BOTH_WAYS_DELIMITED,
+            sources=('name', 'birthdate', 'delimiters'),
+        )
 
-    def _name_id_combos(self) -> Iterator[str]:
+    def _name_id_nodes(self) -> Iterator[PlanNode]:
         """Name + phone tail / identity tail."""
-        names = self.components.get('name', [])
-
+        names = tuple(self.components.get('name', []))
         for id_category in ('phone', 'identity'):
-            id_values = self.components.get(id_category, [])
-            if not id_values:
-                continue
-            for name, id_val in product(names, id_values):
-                for delim in self.delimiters:
-                    yield name + delim + id_val
-                    yield id_val + delim + name
+            id_values = tuple(self.components.get(id_category, []))
+            yield PlanNode(
+                'name_id', (names, id_values, tuple(self.delimiters)), _BOTH_WAYS_DELIMITED,
+                sources=('name', id_category, 'delimiters'),
+            )
 
-    def _two_component_combos(self) -> Iterator[str]:
+    def _two_component_nodes(self) -> Iterator[PlanNode]:
         """Combinations of any two component categories."""
         categories = list(self.components.keys())
-        for i, cat_a in enumerate(categories):
-            for cat_b in categories[i + 1:]:
-                vals_a = self.components[cat_a]
-                vals_b = self.components[cat_b]
-                # Limit to avoid explosion: top 5 values from each
-                for va, vb in product(vals_a[:5], vals_b[:5]):
-                    for delim in self.delimiters[:3]:  # Top 3 delimiters
-                        yield va + delim + vb
-                        yield vb + delim + va
-
-    def _cultural_number_combos(self) -> Iterator[str]:
+        pairs = [(cat_a, cat_b) for i, cat_a in enumerate(categories) for cat_b in categories[i + 1:]]
+        if self.weights is not None:
+            pairs = self.weights.rank_pairs(pairs)
+        # Top 3 delimiters
+        delimiters = tuple(self.delimiters[:self._top(3)])
+        for cat_a, cat_b in pairs:
+            # Limit to avoid explosion: top 5 values from each
+            vals_a = tuple(self.components[cat_a][:self._top(5)])
+            vals_b = tuple(self.components[cat_b][:self._top(5)])
+            yield PlanNode(
+                'two_component', (vals_a, vals_b, delimiters), _BOTH_WAYS_DELIMITED,
+                sources=(cat_a, cat_b, 'delimiters'),
+            )
+
+    def _cultural_number_nodes(self) -> Iterator[PlanNode]:
         """Components combined with culturally significant numbers."""
-        for value in self._all_single_values():
-            for num in CHINESE_LUCKY_NUMBERS:
-                yield value + num
-                yield num + value
+        values = tuple(self._all_single_values())
+        yield PlanNode('cultural_numbers', (values, tuple(self.lucky_numbers)), _BOTH_WAYS)
 
-    def _keyboard_pattern_combos(self) -> Iterator[str]:
+    def _keyboard_pattern_nodes(self) -> Iterator[PlanNode]:
         """Keyboard patterns combined with components."""
+        family = 'keyboard_patterns'
+        suffixes = ('',) + tuple(s for s in self.suffixes[:self._top(5)] if s)
+        # Pattern + top component values
+        values = tuple(self._all_single_values())[:self._top(10)]
         for pattern in KEYBOARD_PATTERNS:
-            yield pattern
-            for suffix in self.suffixes[:5]:
-                if suffix:
-                    yield pattern + suffix
-            # Pattern + top component values
-            for value in list(self._all_single_values())[:10]:
-                yield pattern + value
-                yield value + pattern
+            # Pattern alone, then with each suffix
+            yield PlanNode(family, ((pattern,), suffixes), weight=2.0, sources=('', 'suffixes'))
+            yield PlanNode(family, ((pattern,), values), _BOTH_WAYS)
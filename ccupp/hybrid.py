@@ -0,0 +1,270 @@
+"""Export word + tail candidates as hashcat hybrid attacks.
+
+Many families are a word stem with a digit or symbol tail: a value plus a
+common suffix, a name plus a date, phone or ID tail, a value plus a lucky
+number. Rather than enumerating every tail in Python, :func:`build_hybrid`
+groups them by stem: it emits the stems as a word list and the tails as
+``.hcmask`` lines, appended (``hashcat -a 6 words.txt tails.hcmask``) or
+prepended (``hashcat -a 7 tails.hcmask words.txt``) on the cracking node.
+
+Every mask is applied to every stem, so the masks hold only the tails all
+profiles share: the suffix table and lucky numbers, as literal masks (or,
+with ``widen_tails``, as masks of their shape: ``123`` and ``520`` both
+become ``?d?d?d``), and years, as masks covering a whole range. The
+profile's own dates, phone and ID tails are joined onto that profile's
+stems only, as a list of joined words run straight
+(``hashcat -a 0 words.joined.txt``). Families without a tail (leetspeak,
+prefixes, keyboard patterns, pairs of words) are left to
+:meth:`~ccupp.generator.PasswordGenerator.generate` or :mod:`ccupp.rules`.
+"""
+from __future__ import annotations
+
+import string
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from math import prod
+from pathlib import Path
+
+from ccupp.generator import PasswordGenerator
+from ccupp.transforms.case import case_variants
+
+HYBRID_FORMAT = 'hashcat-hybrid'
+
+# Birth years covered by the year-range masks
+DEFAULT_YEARS = (1940, 2030)
+
+# Categories joined onto names as tails (see PasswordGenerator._name_*_nodes)
+TAIL_CATEGORIES = ('birthdate', 'phone', 'identity')
+
+# A mask as the set of characters allowed at each position
+Mask = tuple[str, ...]
+
+# hashcat's built-in charsets, in the order classes are assigned
+CHARSETS = {
+    '?d': string.digits,
+    '?l': string.ascii_lowercase,
+    '?u': string.ascii_uppercase,
+    '?s': ' ' + string.punctuation,
+}
+
+
+def _maskable(text: str) -> bool:
+    """Whether ``text`` can be written in a mask (printable ASCII)."""
+    return text.isascii() and text.isprintable()
+
+
+def shape_mask(text: str) -> Mask | None:
+    """Mask of the character classes of ``text``, or ``None`` if not ASCII.
+
+    >>> mask_line(shape_mask('abc!12'))
+    '?l?l?l?s?d?d'
+    """
+    if not _maskable(text):
+        return None
+    return tuple(next(cs for cs in CHARSETS.values() if ch in cs) for ch in text)
+
+
+def literal_mask(text: str) -> Mask | None:
+    """Mask matching exactly ``text``, or ``None`` if not printable ASCII."""
+    return tuple(text) if _maskable(text) else None
+
+
+def range_masks(low: int, high: int, width: int = 0) -> list[Mask]:
+    """Masks covering exactly the integers ``low`` to ``high``.
+
+    Numbers are written without leading zeros, or zero-padded to ``width``
+    if given.
+
+    >>> [mask_line(m) for m in range_masks(1940, 2030)]
+    ['456789,19?1?d', '012,20?1?d', '2030']
+    >>> [mask_line(m) for m in range_masks(0, 30, width=2)]
+    ['012,?1?d', '30']
+    """
+    if width:
+        spans = [(str(low).zfill(width), str(high).zfill(width))]
+    else:
+        spans = []
+        for digits in range(len(str(low)), len(str(high)) + 1):
+            first = 10 ** (digits - 1) if digits > 1 else 0
+            spans.append((str(max(low, first)), str(min(high, 10 ** digits - 1))))
+    return [mask for lo, hi in spans for mask in _digit_ranges(lo, hi)]
+
+
+def _digit_ranges(low: str, high: str) -> list[Mask]:
+    """Split a range of same-width numbers into products of digit sets."""
+    digits = string.digits
+    if low == high:
+        return [tuple(low)]
+    rest = len(low) - 1
+    if low[0] == high[0]:
+        return [(low[0],) + tail for tail in _digit_ranges(low[1:], high[1:])]
+    first, last = digits.index(low[0]), digits.index(high[0])
+    # Partial ranges at either end, full leading digits in between
+    head: list[Mask] = []
+    tail: list[Mask] = []
+    if low[1:] != '0' * rest:
+        head = _digit_ranges(low, low[0] + '9' * rest)
+        first += 1
+    if high[1:] != '9' * rest:
+        tail = _digit_ranges(high[0] + '0' * rest, high)
+        last -= 1
+    middle = [(digits[first:last + 1],) + (digits,) * rest] if first <= last else []
+    return head + middle + tail
+
+
+def mask_line(mask: Mask) -> str:
+    """Render a mask as an ``.hcmask`` line.
+
+    Built-in charsets become ``?d``/``?l``/``?u``/``?s`` and other sets
+    custom charsets ``?1``-``?4``, listed in front of the mask. Literal
+    ``?`` and ``,`` are escaped, as is a leading ``#`` (a comment line).
+
+    >>> mask_line(('#', '12', '?'))
+    '12,\\\\#?1??'
+    """
+    builtin = {cs: name for name, cs in CHARSETS.items()}
+    custom: list[str] = []
+    parts = []
+    for chars in mask:
+        if len(chars) == 1:
+            parts.append({'?': '??', ',': '\\,'}.get(chars, chars))
+        elif chars in builtin:
+            parts.append(builtin[chars])
+        else:
+            if chars not in custom:
+                if len(custom) == 4:
+                    raise ValueError(f'Mask needs more than 4 custom charsets: {mask}')
+                custom.append(chars)
+            parts.append(f'?{custom.index(chars) + 1}')
+    if parts and parts[0] == '#':
+        parts[0] = '\\#'
+    return ','.join([*(cs.replace(',', '\\,') for cs in custom), ''.join(parts)])
+
+
+def keyspace(mask: Mask) -> int:
+    """Number of strings a mask expands to."""
+    return prod(len(chars) for chars in mask)
+
+
+def covers(mask: Mask, text: str) -> bool:
+    """Whether ``mask`` expands to ``text``."""
+    return len(mask) == len(text) and all(ch in chars for ch, chars in zip(text, mask))
+
+
+@dataclass
+class HybridAttack:
+    """Word stems plus the tail masks to append and prepend to them.
+
+    ``joined`` holds each profile's stems joined with its own tails, tried
+    as they are.
+    """
+
+    words: list[str] = field(default_factory=list)
+    append_masks: list[Mask] = field(default_factory=list)
+    prepend_masks: list[Mask] = field(default_factory=list)
+    joined: list[str] = field(default_factory=list)
+
+    def write(
+        self,
+        words_path: str | Path,
+        append_path: str | Path,
+        prepend_path: str | Path,
+        joined_path: str | Path,
+    ) -> None:
+        """Write the word list, the ``-a 6``/``-a 7`` ``.hcmask`` files and the joined words."""
+        for path, lines in (
+            (words_path, self.words),
+            (append_path, [mask_line(m) for m in self.append_masks]),
+            (prepend_path, [mask_line(m) for m in self.prepend_masks]),
+            (joined_path, self.joined),
+        ):
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                f.writelines(f'{line}\n' for line in lines)
+
+
+def build_hybrid(
+    generators: Iterable[PasswordGenerator],
+    years: tuple[int, int] = DEFAULT_YEARS,
+    widen_tails: bool = False,
+) -> HybridAttack:
+    """Collect stems, tail masks and joined words for one or more configured generators.
+
+    Stems are the component values outside :data:`TAIL_CATEGORIES`, with
+    their case variants if enabled. Masks are the suffix table (appended),
+    the lucky numbers (both ways) and the years in ``years`` (both ways,
+    with every delimiter); suffixes and lucky numbers are literal unless
+    ``widen_tails`` turns them into masks of their shape. Each profile's
+    dates, phone and ID tails are joined onto its own stems (both ways,
+    with every delimiter), except those a year mask already covers.
+    """
+    tail_mask = shape_mask if widen_tails else literal_mask
+    words: dict[str, None] = {}
+    append: dict[Mask, None] = {}
+    prepend: dict[Mask, None] = {}
+    joined: dict[str, None] = {}
+    low, high = years
+    year_tails = range_masks(low, high)
+    # Two-digit years, wrapping at the century
+    if high // 100 > low // 100:
+        year_tails += range_masks(low % 100, 99, width=2) + range_masks(0, high % 100, width=2)
+    else:
+        year_tails += range_masks(low % 100, high % 100, width=2)
+
+    for generator in generators:
+        components = generator.components
+        stems: dict[str, None] = {}
+        for category, values in components.items():
+            if category in TAIL_CATEGORIES:
+                continue
+            for value in values:
+                stems.update(
+                    dict.fromkeys(
+                        case_variants(value) if generator.enable_case_variants else [value],
+                    ),
+                )
+        stems.pop('', None)
+        words.update(stems)
+
+        for suffix in generator.suffixes:
+            if suffix and (mask := tail_mask(suffix)):
+                append[mask] = None
+        if generator.enable_cultural_numbers:
+            for number in generator.lucky_numbers:
+                if mask := tail_mask(number):
+                    append[mask] = prepend[mask] = None
+
+        tails = [value for cat in TAIL_CATEGORIES for value in components.get(cat, []) if value]
+        for delim in generator.delimiters:
+            sep = literal_mask(delim)
+            if sep is not None:
+                for year in year_tails:
+                    append[sep + year] = None
+                    prepend[year + sep] = None
+            for tail in tails:
+                if sep is not None and any(covers(year, tail) for year in year_tails):
+                    continue
+                for stem in stems:
+                    joined.update(dict.fromkeys((stem + delim + tail, tail + delim + stem)))
+
+    words.pop('', None)
+    return HybridAttack(
+        words=list(words),
+        append_masks=_prune(append),
+        prepend_masks=_prune(prepend),
+        joined=list(joined),
+    )
+
+
+def _prune(masks: Iterable[Mask]) -> list[Mask]:
+    """Drop literal masks another mask covers, then order by keyspace.
+
+    hashcat runs masks in file order, so the cheapest tails come first.
+    """
+    masks = list(masks)
+    wider = [m for m in masks if keyspace(m) > 1]
+    kept = [
+        m for m in masks
+        if keyspace(m) > 1 or not any(covers(w, ''.join(m)) for w in wider)
+    ]
+    return sorted(kept, key=keyspace)
@@ -0,0 +1,155 @@
+"""Operational metrics for long generation runs.
+
+A :class:`ProgressTracker` is told when each profile starts and how many
+passwords have been written. At most once per interval it logs a
+structured ``generation.progress`` event (profiles/s, candidates/s, dedup
+size, RSS, ETA) and rewrites an optional metrics file: a Prometheus
+textfile (``.prom``, for node-exporter's textfile collector) or JSON
+(any other name). Calls between reports only read the clock, so tracking
+costs nothing noticeable even per profile on 100k-profile runs.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import time
+from collections.abc import Callable
+from collections.abc import Sized
+from pathlib import Path
+from typing import Any
+
+# Seconds between progress events by default
+DEFAULT_PROGRESS_INTERVAL = 10.0
+
+# Prometheus metric name, type and help for each snapshot field
+_PROMETHEUS_METRICS = {
+    'profiles_done': ('ccupp_profiles_done', 'gauge', 'Profiles generation has reached.'),
+    'profiles_total': ('ccupp_profiles_total', 'gauge', 'Profiles in the run.'),
+    'profiles_per_second': ('ccupp_profiles_per_second', 'gauge', 'Average profiles per second.'),
+    'candidates': ('ccupp_candidates_written_total', 'counter', 'Passwords written so far.'),
+    'candidates_per_second': ('ccupp_candidates_per_second', 'gauge', 'Average passwords written per second.'),
+    'dedup_size': ('ccupp_dedup_entries', 'gauge', 'Entries in the cross-profile dedup backend.'),
+    'rss_bytes': ('ccupp_rss_bytes', 'gauge', 'Resident set size of the generating process.'),
+    'elapsed_seconds': ('ccupp_elapsed_seconds', 'gauge', 'Seconds since the run started.'),
+    'eta_seconds': ('ccupp_eta_seconds', 'gauge', 'Estimated seconds until all profiles are done.'),
+}
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where only that is known (0 if neither)."""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def prometheus_text(snapshot: dict[str, Any]) -> str:
+    """Render a snapshot in the Prometheus text exposition format.
+
+    >>> print(prometheus_text({'candidates': 42}), end='')
+    # HELP ccupp_candidates_written_total Passwords written so far.
+    # TYPE ccupp_candidates_written_total counter
+    ccupp_candidates_written_total 42
+    """
+    lines = []
+    for key, value in snapshot.items():
+        if key not in _PROMETHEUS_METRICS or value is None:
+            continue
+        name, kind, help_text = _PROMETHEUS_METRICS[key]
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(path: str | Path, snapshot: dict[str, Any]) -> None:
+    """Write a snapshot atomically, as Prometheus text for ``.prom`` files, else JSON.
+
+    The file is replaced in one step, so a scraper never reads it torn.
+    """
+    if Path(path).suffix == '.prom':
+        text = prometheus_text(snapshot)
+    else:
+        text = json.dumps(snapshot) + '\n'
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ProgressTracker:
+    """Rate-limited progress reporting for a generation run.
+
+    Args:
+        profiles_total: Number of profiles in the run.
+        log: Called as ``log(event, **snapshot)`` for each report, e.g. a
+            structlog logger's ``info``.
+        interval: Seconds between reports (0 = only the final one).
+        metrics_file: Rewrite this file with each report.
+        dedup: Cross-profile dedup backend, to report its size.
+    """
+
+    def __init__(
+        self,
+        profiles_total: int,
+        log: Callable[..., Any] | None = None,
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+        metrics_file: str | Path | None = None,
+        dedup: Sized | None = None,
+    ) -> None:
+        self.profiles_total = profiles_total
+        self.profiles_done = 0
+        self.candidates = 0
+        self._log = log
+        self._interval = interval
+        self._metrics_file = metrics_file
+        self._dedup = dedup
+        self._started = time.monotonic()
+        self._next_report = self._started + interval if interval else float('inf')
+
+    def profile_started(self) -> None:
+        """Count a profile and report if the interval has passed."""
+        self.profiles_done += 1
+        if time.monotonic() >= self._next_report:
+            self.report()
+
+    def written(self, candidates: int) -> None:
+        """Update the passwords written so far and report if the interval has passed."""
+        self.candidates = candidates
+        if time.monotonic() >= self._next_report:
+            self.report()
+
+    def snapshot(self) -> dict[str, Any]:
+        """Current progress as plain data."""
+        elapsed = time.monotonic() - self._started
+        profiles_rate = self.profiles_done / elapsed if elapsed else 0.0
+        remaining = self.profiles_total - self.profiles_done
+        return {
+            'profiles_done': self.profiles_done,
+            'profiles_total': self.profiles_total,
+            'profiles_per_second': round(profiles_rate, 3),
+            'candidates': self.candidates,
+            'candidates_per_second': round(self.candidates / elapsed if elapsed else 0.0, 1),
+            'dedup_size': len(self._dedup) if self._dedup is not None else None,
+            'rss_bytes': rss_bytes(),
+            'elapsed_seconds': round(elapsed, 3),
+            'eta_seconds': round(remaining / profiles_rate, 1) if profiles_rate else None,
+        }
+
+    def report(self, event: str = 'generation.progress') -> dict[str, Any]:
+        """Log and write a snapshot now, and restart the interval."""
+        snapshot = self.snapshot()
+        if self._log is not None:
+            self._log(event, **snapshot)
+        if self._metrics_file is not None:
+            write_metrics(self._metrics_file, snapshot)
+        if self._interval:
+            self._next_report = time.monotonic() + self._interval
+        return snapshot
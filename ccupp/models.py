@@ -4,6 +4,7 @@ from typing import Any
 from pydantic import BaseModel
 from pydantic import ConfigDict
 from pydantic import Field
+from pydantic import field_validator
 from pydantic import model_validator
 
 
@@ -19,6 +20,9 @@ class Profile(BaseModel):
     phone_numbers: list[str] = Field(default_factory=list)
     identity: str = ''
     birthdate: tuple[str, ...] = ()
+    # Partial knowledge when the birthdate (or its year) is unknown
+    birth_year_range: tuple[int, int] | None = None
+    age: int | None = Field(default=None, ge=0, le=150)
     hometowns: list[str] = Field(default_factory=list)
     places: list[list[str]] = Field(default_factory=list)
     social_media: list[str] = Field(default_factory=list)
@@ -49,3 +53,11 @@ class Profile(BaseModel):
                 ]
 
         return data
+
+    @field_validator('birth_year_range')
+    @classmethod
+    def check_birth_year_range(cls, value: tuple[int, int] | None) -> tuple[int, int] | None:
+        """Require ``1 <= low <= high <= 9999`` so every year has four digits at most."""
+        if value is not None and not 1 <= value[0] <= value[1] <= 9999:
+            raise ValueError('birth_year_range must satisfy 1 <= low <= high <= 9999')
+        return value
@@ -0,0 +1,263 @@
+"""Character n-gram model for reordering candidates within a rule family.
+
+The rule plan decides which candidates a family tries, and in what order
+its tables are walked, but every node of a family is expanded slot by
+slot: ``liwei!`` and ``liwei123`` come out in table order whether or not
+real people pick them in that order. A character n-gram model trained on
+a leaked password list scores how human-like each string is, and
+reordering a family's candidates by that score moves the likeliest ones to
+the front of each profile's budget (see
+:class:`~ccupp.generator.PasswordGenerator`'s ``ngram``). Reordering
+never adds or drops candidates.
+
+Characters map to :data:`SYMBOLS` ids: printable ASCII, one id for
+everything else, and a boundary id that pads the start of a password and
+ends it. The model is ``P(c | previous order - 1 chars)`` with
+Witten-Bell interpolation down to a uniform distribution, so contexts and
+continuations the list never had still get sensible scores. Log
+probabilities are quantised to one byte each and stored as one flat
+``order``-dimensional array indexed by the n-gram's ids (about 0.9 MB for
+the default trigrams), which scoring reads with one lookup per character.
+
+The model file (``ccupp train-ngram``) is memory-mapped, so workers share
+its pages. Layout, little-endian::
+
+    header  magic b'CCNG', version (u16), order (u8), symbols (u8),
+            log-probability step (f32), passwords trained on (u64)
+    costs   one u8 per n-gram, ``-log P / step`` rounded and capped at 255,
+            indexed by the ids of its characters in base ``symbols``
+"""
+from __future__ import annotations
+
+import functools
+import math
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Iterable
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
+
+NGRAM_MAGIC = b'CCNG'
+NGRAM_VERSION = 1
+
+# Boundary id (start padding and end of password), printable ASCII, other
+SYMBOLS = 97
+_OTHER = SYMBOLS - 1
+
+DEFAULT_ORDER = 3
+# A model is SYMBOLS ** order bytes (0.9 MB for trigrams). Training holds
+# 4-byte counts, wider lower-order sums and an 8-byte probability per n-gram
+# and walks every one in pure Python: about 13 bytes and one inner loop
+# step per n-gram, which for 4-grams (88M of them) is over 1 GB and minutes
+MAX_ORDER = 3
+
+# Log-probability (nats) per quantisation step
+LOGPROB_STEP = 0.1
+
+_HEADER = struct.Struct('<4sHBBfQ')
+
+
+class _SymbolIds(dict[int, int]):
+    """``str.translate`` table from characters to symbol ids (as characters)."""
+
+    def __missing__(self, key: int) -> int:
+        return _OTHER
+
+
+_IDS = _SymbolIds({code: code - 0x1F if 0x20 <= code < 0x7F else _OTHER for code in range(0x80)})
+
+
+def encode(password: str) -> bytes:
+    """Symbol ids of ``password``'s characters.
+
+    >>> list(encode('a1 é'))
+    [66, 18, 1, 96]
+    """
+    return password.translate(_IDS).encode('latin-1')
+
+
+class NgramModel:
+    """A trained character n-gram model.
+
+    Args:
+        costs: ``SYMBOLS ** order`` quantised costs (see the module docs).
+        order: n-gram length, from 2 to :data:`MAX_ORDER`.
+        passwords: Passwords it was trained on, for reference.
+        path: File it was loaded from, if any; workers reopen it instead
+            of receiving a copy.
+
+    Raises:
+        ValueError: If ``order`` is out of range or ``costs`` has the wrong size.
+    """
+
+    def __init__(
+        self,
+        costs: bytes | bytearray | memoryview | array[int],
+        order: int = DEFAULT_ORDER,
+        passwords: int = 0,
+        path: str | Path | None = None,
+    ) -> None:
+        if not 2 <= order <= MAX_ORDER:
+            raise ValueError(f'n-gram order must be between 2 and {MAX_ORDER}, got {order}')
+        if len(costs) != SYMBOLS ** order:
+            raise ValueError(f'Expected {SYMBOLS ** order} costs for order {order}, got {len(costs)}')
+        self.costs = costs
+        self.order = order
+        self.passwords = passwords
+        self.path = path
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        if self.path is not None:
+            return _shared_model, (str(self.path),)
+        return NgramModel, (bytes(self.costs), self.order, self.passwords)
+
+    @classmethod
+    def train(cls, passwords: Iterable[str], order: int = DEFAULT_ORDER) -> NgramModel:
+        """Train on a stream of passwords, one pass, holding only the counts.
+
+        Duplicates count again, so frequent passwords weigh more, as they
+        should; pass :func:`~ccupp.benchmark.datasets.iter_password_list`
+        to train on a list file of any size.
+        """
+        if not 2 <= order <= MAX_ORDER:
+            raise ValueError(f'n-gram order must be between 2 and {MAX_ORDER}, got {order}')
+        size = SYMBOLS ** order
+        counts = array('I', bytes(4 * size))
+        total = 0
+        for pw in passwords:
+            total += 1
+            # Index of the n-gram ending at each character; 0 is the
+            # all-boundary start context
+            index = 0
+            for symbol in encode(pw) + b'\0':
+                index = (index * SYMBOLS + symbol) % size
+                counts[index] += 1
+        return cls(_costs(counts, order), order, total)
+
+    @classmethod
+    def load(cls, path: str | Path) -> NgramModel:
+        """Open a model file written by :meth:`save`.
+
+        Raises:
+            FileNotFoundError: If there is no file at ``path``.
+            ValueError: If the file is not a model of this version.
+        """
+        with open(path, 'rb') as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, order, symbols, step, passwords = _HEADER.unpack_from(view)
+        except struct.error:
+            magic = b''
+        if (
+            magic != NGRAM_MAGIC or version != NGRAM_VERSION or symbols != SYMBOLS or
+            not math.isclose(step, LOGPROB_STEP, rel_tol=1e-6)
+        ):
+            raise ValueError(f'Not a version {NGRAM_VERSION} n-gram model: {path}')
+        costs = memoryview(view)[_HEADER.size:]
+        try:
+            return cls(costs, order, passwords, path)
+        except ValueError as e:
+            raise ValueError(f'Invalid n-gram model {path}: {e}') from None
+
+    def save(self, path: str | Path) -> None:
+        """Write the model file atomically."""
+        tmp = f'{path}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(_HEADER.pack(NGRAM_MAGIC, NGRAM_VERSION, self.order, SYMBOLS, LOGPROB_STEP, self.passwords))
+            f.write(self.costs)
+        os.replace(tmp, path)
+
+    def score(self, passwords: Sequence[str]) -> list[float]:
+        """Log probability (nats) of each password, end of password included.
+
+        The batch is scored as a whole rather than password by password:
+        the passwords are laid end to end with boundary padding between
+        them, the n-gram index at every position is built with one list
+        pass per character of context, the costs are looked up in one more,
+        and each password's costs are summed from its slice of the result.
+
+        >>> model = NgramModel.train(['password', 'password1', 'iloveyou'])
+        >>> a, b = model.score(['password', 'pxsqword'])
+        >>> a > b
+        True
+        """
+        if not passwords:
+            return []
+        order = self.order
+        pad = b'\0' * (order - 1)
+        encoded = [encode(pw) for pw in passwords]
+        # The first boundary after a password ends it and, with the rest,
+        # forms the next one's start context; n-grams ending on the other
+        # order - 2 boundaries belong to neither and are skipped below
+        stream = pad + pad.join(encoded) + b'\0'
+        indexes = list(stream[:len(stream) - order + 1])
+        for shift in range(1, order):
+            indexes = [index * SYMBOLS + symbol for index, symbol in zip(indexes, stream[shift:])]
+        costs = bytes(map(self.costs.__getitem__, indexes))
+        scores = []
+        start = 0
+        for ids in encoded:
+            end = start + len(ids) + 1
+            scores.append(-LOGPROB_STEP * sum(costs[start:end]))
+            start = end + order - 2
+        return scores
+
+    def rank(self, passwords: Sequence[str]) -> list[str]:
+        """``passwords`` by descending score; equal scores keep their order.
+
+        >>> NgramModel.train(['abc123'] * 5).rank(['zq!x', 'abc123'])
+        ['abc123', 'zq!x']
+        """
+        scores = self.score(passwords)
+        order = sorted(range(len(passwords)), key=lambda i: -scores[i])
+        return [passwords[i] for i in order]
+
+
+def _costs(counts: array[int], order: int) -> bytearray:
+    """Quantised Witten-Bell costs of the n-grams counted in ``counts``.
+
+    Lower-order counts are the full ones summed over the first symbol: the
+    boundary padding gives every position a full-length context, so this
+    is exactly what counting them separately would give.
+    """
+    # Probabilities by increasing order, from the uniform one (order 0)
+    probabilities: list[Sequence[float]] = [[1.0 / SYMBOLS]]
+    level: Sequence[int] = counts
+    levels = [level]
+    for _ in range(order - 1):
+        width = len(level) // SYMBOLS
+        lower = array('Q', bytes(8 * width))
+        for first in range(SYMBOLS):
+            offset = first * width
+            for i in range(width):
+                lower[i] += level[offset + i]
+        level = lower
+        levels.append(level)
+    for level in reversed(levels):
+        contexts = len(level) // SYMBOLS
+        previous = probabilities[-1]
+        below = len(previous) // SYMBOLS or 1
+        current = array('d', bytes(8 * len(level)))
+        for context in range(contexts):
+            base = context * SYMBOLS
+            back = (context % below) * SYMBOLS if len(previous) > 1 else 0
+            row = level[base:base + SYMBOLS]
+            seen = sum(row)
+            types = sum(1 for n in row if n)
+            for symbol in range(SYMBOLS):
+                fallback = previous[back + symbol] if len(previous) > 1 else previous[0]
+                if seen:
+                    current[base + symbol] = (row[symbol] + types * fallback) / (seen + types)
+                else:
+                    current[base + symbol] = fallback
+        probabilities.append(current)
+    return bytearray(min(255, round(-math.log(p) / LOGPROB_STEP)) for p in probabilities[-1])
+
+
+@functools.lru_cache(maxsize=4)
+def _shared_model(path: str) -> NgramModel:
+    """A model file opened once per process (how workers receive loaded models)."""
+    return NgramModel.load(path)
@@ -0,0 +1,159 @@
+"""Streaming password writers for CLI and file output.
+
+Writers buffer candidates in memory only until a batch is full, then encode
+the whole batch with a single ``join`` and hand it to the underlying binary
+stream in one ``write`` call. Nothing is kept once a batch is written, so
+output memory stays constant however many passwords are produced.
+"""
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from collections.abc import Iterator
+from types import TracebackType
+from typing import BinaryIO
+
+# Number of passwords encoded and written per write() call on the stream
+DEFAULT_BATCH_SIZE = 8192
+
+# Buffer size for output files opened by the CLI (1 MiB)
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+OUTPUT_FORMATS = ('txt', 'jsonl', 'json')
+
+
+class PasswordWriter:
+    """Base class for streaming writers: one password per :meth:`write`."""
+
+    def __init__(self, stream: BinaryIO, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        self.stream = stream
+        self.batch_size = batch_size
+        self.count = 0
+        self._batch: list[str] = []
+
+    def write(self, password: str) -> None:
+        """Queue a password, writing the batch out once it is full."""
+        self._batch.append(password)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Encode and write any queued passwords."""
+        if self._batch:
+            self.stream.write(self._encode(self._batch))
+            self.count += len(self._batch)
+            self._batch = []
+
+    def close(self) -> None:
+        """Write queued passwords and any trailer, then flush the stream.
+
+        The stream itself is left open; it belongs to the caller.
+        """
+        self.flush()
+        self.stream.write(self._trailer())
+        self.stream.flush()
+
+    def _encode(self, batch: list[str]) -> bytes:
+        raise NotImplementedError
+
+    def _trailer(self) -> bytes:
+        return b''
+
+    def __enter__(self) -> PasswordWriter:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+class TextWriter(PasswordWriter):
+    """Plain wordlist: one password per line."""
+
+    def _encode(self, batch: list[str]) -> bytes:
+        return ('\n'.join(batch) + '\n').encode('utf-8')
+
+
+class JsonLinesWriter(PasswordWriter):
+    """JSON lines: one JSON string per line."""
+
+    def _encode(self, batch: list[str]) -> bytes:
+        dumps = json.dumps
+        return ('\n'.join([dumps(pw, ensure_ascii=False) for pw in batch]) + '\n').encode('utf-8')
+
+
+class JsonArrayWriter(PasswordWriter):
+    """A single JSON array, written incrementally.
+
+    The bytes are identical to ``json.dump(passwords, indent=2)`` followed
+    by a newline, without ever holding the full list.
+    """
+
+    def _encode(self, batch: list[str]) -> bytes:
+        dumps = json.dumps
+        # First item opens the array, later ones continue it
+        opener = '[\n  ' if self.count == 0 else ',\n  '
+        body = ',\n  '.join([dumps(pw, ensure_ascii=False) for pw in batch])
+        return (opener + body).encode('utf-8')
+
+    def _trailer(self) -> bytes:
+        return b'\n]\n' if self.count else b'[]\n'
+
+
+def encode_batches(
+    blocks: Iterable[list[str]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[bytes]:
+    """Regroup blocks of passwords into newline-terminated UTF-8 batches.
+
+    Every batch holds exactly ``batch_size`` passwords except possibly the
+    last, whatever the sizes of the incoming blocks.
+
+    >>> list(encode_batches([['a', 'b', 'c'], ['d']], batch_size=2))
+    [b'a\\nb\\n', b'c\\nd\\n']
+    """
+    pending: list[str] = []
+    for block in blocks:
+        pending += block
+        if len(pending) >= batch_size:
+            cut = len(pending) - len(pending) % batch_size
+            for i in range(0, cut, batch_size):
+                yield ('\n'.join(pending[i:i + batch_size]) + '\n').encode('utf-8')
+            pending = pending[cut:]
+    if pending:
+        yield ('\n'.join(pending) + '\n').encode('utf-8')
+
+
+_WRITERS: dict[str, type[PasswordWriter]] = {
+    'txt': TextWriter,
+    'jsonl': JsonLinesWriter,
+    'json': JsonArrayWriter,
+}
+
+
+def open_writer(
+    format: str,
+    stream: BinaryIO,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> PasswordWriter:
+    """Create the streaming writer for an output format.
+
+    Args:
+        format: One of :data:`OUTPUT_FORMATS`.
+        stream: Binary stream to write to, e.g. ``sys.stdout.buffer``.
+        batch_size: Passwords per write call.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    try:
+        writer_cls = _WRITERS[format]
+    except KeyError:
+        raise ValueError(
+            f'Unknown output format: {format} (use {", ".join(OUTPUT_FORMATS)})',
+        ) from None
+    return writer_cls(stream, batch_size=batch_size)
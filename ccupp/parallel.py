@@ -0,0 +1,240 @@
+"""Per-profile candidate streams, serial or fanned out to a process pool.
+
+Both functions yield every profile's passwords — deduplicated within the
+profile, length-filtered and sharded — in profile order, as blocks (lists)
+of passwords. Cross-profile
+dedup is left to the caller, so the parallel path gives exactly the same
+stream as the serial one.
+
+Workers hand results back through :mod:`multiprocessing.shared_memory`:
+each task writes its passwords into a shared segment, as their lengths
+followed by their UTF-8 text, and returns only the segment's name,
+instead of pickling a list of strings through the result pipe. Lengths
+rather than a separator, since a profile can hold any character.
+"""
+from __future__ import annotations
+
+from array import array
+from collections import deque
+from collections.abc import Generator
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from itertools import chain
+from itertools import islice
+from itertools import pairwise
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+from ccupp.checkpoint import Checkpoint
+from ccupp.extractors.components import LazyComponents
+from ccupp.generator import PasswordGenerator
+from ccupp.models import Profile
+from ccupp.policy import PasswordPolicy
+from ccupp.stats import GenerationStats
+
+# Profiles per worker task; amortises task overhead for small profiles
+DEFAULT_CHUNK_SIZE = 16
+
+# Tasks in flight per worker; bounds memory held by finished-but-unread blocks
+_TASKS_PER_WORKER = 2
+
+# Type of the password lengths at the head of a shared block
+_LENGTH_TYPE = 'I'
+
+# (shared segment name or None if nothing was generated, passwords, bytes,
+# plan positions, the task's stats if requested)
+_Block = tuple[str | None, int, int, int, GenerationStats | None]
+
+
+def profile_blocks(
+    profiles: Iterable[Profile],
+    policy: PasswordPolicy | None,
+    options: dict[str, Any],
+    shard_index: int = 0,
+    num_shards: int = 1,
+    start: int = 0,
+    checkpoint: Checkpoint | None = None,
+    stats: GenerationStats | None = None,
+) -> Generator[list[str]]:
+    """Yield blocks of each profile's passwords that ``policy`` accepts.
+
+    ``start`` is a raw plan position across all profiles; profiles wholly
+    before it are sized but never generated. If ``checkpoint`` is given,
+    its position is kept at the start of the profile being yielded, and
+    at the end of the plan once the iterator is exhausted. Profiling
+    counters go to ``stats`` if given.
+    """
+    position = 0
+    for prof in profiles:
+        generator = PasswordGenerator(components=LazyComponents(prof, stats), **options)
+        if start:
+            size = generator.plan_size()
+            if start >= size:
+                start -= size
+                position += size
+                continue
+        if checkpoint is not None:
+            checkpoint.position = position + start
+        yield from generator.generate_blocks(
+            shard_index=shard_index, num_shards=num_shards, start=start, policy=policy, stats=stats,
+        )
+        start = 0
+        if checkpoint is not None:
+            position += generator.plan_size()
+            checkpoint.position = position
+    if checkpoint is not None:
+        checkpoint.position = position
+
+
+def _generate_block(
+    profiles: list[Profile],
+    policy: PasswordPolicy | None,
+    options: dict[str, Any],
+    shard_index: int,
+    num_shards: int,
+    start: int,
+    track: bool,
+    profile: bool,
+) -> _Block:
+    """Worker task: generate a chunk of profiles into a shared-memory block."""
+    progress = Checkpoint() if track else None
+    stats = GenerationStats() if profile else None
+    passwords = list(
+        chain.from_iterable(
+            profile_blocks(
+                profiles, policy, options, shard_index, num_shards, start, progress, stats,
+            ),
+        ),
+    )
+    positions = progress.position if progress is not None else 0
+    if not passwords:
+        return None, 0, 0, positions, stats
+    lengths = array(_LENGTH_TYPE, map(len, passwords))
+    data = lengths.tobytes() + ''.join(passwords).encode('utf-8')
+    shm = SharedMemory(create=True, size=len(data))
+    buf = shm.buf
+    assert buf is not None
+    buf[:len(data)] = data
+    del buf
+    name = shm.name
+    # The parent unlinks the segment once it has read it
+    shm.close()
+    return name, len(passwords), len(data), positions, stats
+
+
+def _read_block(block: _Block) -> list[str]:
+    """Copy a worker's block out of shared memory and release it."""
+    name, count, size, _, _ = block
+    if name is None:
+        return []
+    shm = SharedMemory(name=name)
+    try:
+        buf = shm.buf
+        assert buf is not None
+        data = bytes(buf[:size])
+        del buf
+    finally:
+        shm.close()
+        shm.unlink()
+    lengths = array(_LENGTH_TYPE)
+    head = count * lengths.itemsize
+    lengths.frombytes(data[:head])
+    text = data[head:].decode('utf-8')
+    return [text[i:j] for i, j in pairwise(accumulate(lengths, initial=0))]
+
+
+def _skip_profiles(
+    profiles: Iterator[Profile],
+    start: int,
+    options: dict[str, Any],
+) -> tuple[Iterator[Profile], int, int]:
+    """Drop profiles wholly before ``start``.
+
+    Returns the remaining profiles, the plan position where they begin and
+    the offset still to skip inside the first of them.
+    """
+    position = 0
+    if not start:
+        return profiles, position, start
+    for prof in profiles:
+        size = PasswordGenerator(components=LazyComponents(prof), **options).plan_size()
+        if start < size:
+            return chain([prof], profiles), position, start
+        start -= size
+        position += size
+    return profiles, position, 0
+
+
+def _discard(future: Future[_Block]) -> None:
+    """Release the shared memory of a task whose result is not needed."""
+    if not future.cancel() and not future.exception():
+        _read_block(future.result())
+
+
+def parallel_profile_blocks(
+    profiles: Iterable[Profile],
+    policy: PasswordPolicy | None,
+    options: dict[str, Any],
+    shard_index: int = 0,
+    num_shards: int = 1,
+    start: int = 0,
+    checkpoint: Checkpoint | None = None,
+    stats: GenerationStats | None = None,
+    *,
+    workers: int,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Generator[list[str]]:
+    """Like :func:`profile_blocks`, generating chunks of profiles in parallel.
+
+    Chunks are submitted a few at a time per worker and read back in
+    submission order, so output order matches the serial path and the
+    number of unread blocks stays bounded. Closing the iterator early
+    cancels pending tasks and frees their shared memory. A ``checkpoint``
+    advances per chunk rather than per profile. Worker ``stats`` are merged
+    into ``stats`` as their blocks are read.
+    """
+    profile_iter, position, start = _skip_profiles(iter(profiles), start, options)
+    offset = start
+    track = checkpoint is not None
+    pending: deque[Future[_Block]] = deque()
+    # Workers must share the parent's tracker, or each one starts its own
+    # and tries to clean up segments the parent has already unlinked
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                while len(pending) < workers * _TASKS_PER_WORKER:
+                    chunk = list(islice(profile_iter, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(
+                        pool.submit(
+                            _generate_block, chunk, policy, options,
+                            shard_index, num_shards, start, track, stats is not None,
+                        ),
+                    )
+                    # Only the first chunk starts part-way into a profile
+                    start = 0
+                if not pending:
+                    if checkpoint is not None:
+                        checkpoint.position = position
+                    return
+                block = pending.popleft().result()
+                if checkpoint is not None:
+                    checkpoint.position = position + offset
+                passwords = _read_block(block)
+                if stats is not None and block[4] is not None:
+                    stats.merge(block[4])
+                if passwords:
+                    yield passwords
+                offset = 0
+                position += block[3]
+                if checkpoint is not None:
+                    checkpoint.position = position
+        finally:
+            for future in pending:
+                _discard(future)
@@ -0,0 +1,183 @@
+"""Password policies: which candidates are worth emitting at all.
+
+A :class:`PasswordPolicy` bundles length bounds, required character classes,
+forbidden characters and an optional regex. Besides checking finished
+passwords, it describes each slot value by a *signature* — its length and
+the character classes it contains — which is all the generator needs to
+tell, before building anything, whether a product of slot values can pass:
+lengths add up, classes and forbidden characters carry over from the parts.
+"""
+from __future__ import annotations
+
+import functools
+import re
+from collections.abc import Callable
+from collections.abc import Iterable
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+# Character class bits of a signature mask
+DIGIT = 1
+LOWER = 2
+UPPER = 4
+SPECIAL = 8
+
+CHAR_CLASSES = {'digit': DIGIT, 'lower': LOWER, 'upper': UPPER, 'special': SPECIAL}
+
+# Slot values and slot tables whose signatures a policy keeps. One policy
+# serves every profile of a run, so these are bounded: the shared tables
+# (suffixes, delimiters, ...) stay hot while past profiles' values age out
+SIGNATURE_CACHE_SIZE = 1 << 16
+SLOT_CACHE_SIZE = 1 << 10
+
+
+def char_mask(text: str) -> int:
+    """Bit mask of the character classes in ``text``.
+
+    Digits and letters are ASCII only; everything else, including
+    non-ASCII letters, counts as special.
+
+    >>> char_mask('Li1983') == UPPER | LOWER | DIGIT
+    True
+    """
+    mask = 0
+    for ch in text:
+        if '0' <= ch <= '9':
+            mask |= DIGIT
+        elif 'a' <= ch <= 'z':
+            mask |= LOWER
+        elif 'A' <= ch <= 'Z':
+            mask |= UPPER
+        else:
+            mask |= SPECIAL
+    return mask
+
+
+@dataclass(frozen=True)
+class PasswordPolicy:
+    """Constraints every emitted password must satisfy.
+
+    Attributes:
+        min_length: Minimum length (0 = no minimum).
+        max_length: Maximum length (0 = no maximum).
+        required: Character classes that must all appear, from
+            ``digit``, ``lower``, ``upper`` and ``special``.
+        forbidden: Characters that must not appear.
+        pattern: Regex the password must match (``re.search``; anchor it
+            for a full match).
+
+    Raises:
+        ValueError: On an unknown character class or an invalid regex.
+    """
+
+    min_length: int = 0
+    max_length: int = 0
+    required: frozenset[str] = frozenset()
+    forbidden: str = ''
+    pattern: str | None = None
+    required_mask: int = field(init=False, repr=False, compare=False)
+    _regex: re.Pattern[str] | None = field(init=False, repr=False, compare=False)
+    _signature: Callable[[str], tuple[int, int] | None] = field(init=False, repr=False, compare=False)
+    _slot_signatures: Callable[[tuple[str, ...]], list[tuple[str, int, int]]] = field(
+        init=False, repr=False, compare=False,
+    )
+
+    def __post_init__(self) -> None:
+        unknown = set(self.required) - CHAR_CLASSES.keys()
+        if unknown:
+            raise ValueError(
+                f'Unknown character class: {", ".join(sorted(unknown))} '
+                f'(use {", ".join(CHAR_CLASSES)})',
+            )
+        try:
+            regex = re.compile(self.pattern) if self.pattern else None
+        except re.error as e:
+            raise ValueError(f'Invalid pattern {self.pattern!r}: {e}') from None
+        mask = 0
+        for name in self.required:
+            mask |= CHAR_CLASSES[name]
+        object.__setattr__(self, 'required', frozenset(self.required))
+        object.__setattr__(self, 'required_mask', mask)
+        object.__setattr__(self, '_regex', regex)
+        object.__setattr__(
+            self, '_signature', functools.lru_cache(maxsize=SIGNATURE_CACHE_SIZE)(self._compute_signature),
+        )
+        object.__setattr__(
+            self, '_slot_signatures', functools.lru_cache(maxsize=SLOT_CACHE_SIZE)(self._compute_slot_signatures),
+        )
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Workers get the constraints, not this process's caches
+        return PasswordPolicy, (self.min_length, self.max_length, self.required, self.forbidden, self.pattern)
+
+    @classmethod
+    def from_options(
+        cls,
+        min_length: int = 0,
+        max_length: int = 0,
+        required: Iterable[str] = (),
+        forbidden: str = '',
+        pattern: str | None = None,
+    ) -> PasswordPolicy | None:
+        """Build a policy, or return ``None`` when nothing is constrained."""
+        required = frozenset(required)
+        if not (min_length or max_length or required or forbidden or pattern):
+            return None
+        return cls(min_length, max_length, required, forbidden, pattern)
+
+    def with_length(self, min_length: int = 0, max_length: int = 0) -> PasswordPolicy:
+        """Return a copy with the length bounds tightened by the given ones."""
+        if max_length and self.max_length:
+            max_length = min(max_length, self.max_length)
+        return PasswordPolicy(
+            max(min_length, self.min_length),
+            max_length or self.max_length,
+            self.required,
+            self.forbidden,
+            self.pattern,
+        )
+
+    def signature(self, value: str) -> tuple[int, int] | None:
+        """``(length, class mask)`` of a slot value, or ``None`` if forbidden."""
+        return self._signature(value)
+
+    def _compute_signature(self, value: str) -> tuple[int, int] | None:
+        if self.forbidden and any(ch in self.forbidden for ch in value):
+            return None
+        return (len(value), char_mask(value))
+
+    def slot_signatures(self, slot: tuple[str, ...]) -> list[tuple[str, int, int]]:
+        """``(value, length, class mask)`` for a slot's allowed values, in order.
+
+        Masks are zero when no class is required, so values differing only
+        in their classes look the same. Plan nodes share slot tables (the
+        suffix list, the delimiters, ...), so results are cached per slot,
+        least recently used first out (see :data:`SLOT_CACHE_SIZE`).
+        """
+        return self._slot_signatures(slot)
+
+    def _compute_slot_signatures(self, slot: tuple[str, ...]) -> list[tuple[str, int, int]]:
+        signature = self.signature
+        keep_mask = -1 if self.required_mask else 0
+        return [(v, sig[0], sig[1] & keep_mask) for v in slot if (sig := signature(v)) is not None]
+
+    def accepts(self, password: str) -> bool:
+        """Check a finished password against the whole policy."""
+        length = len(password)
+        if length < self.min_length or (self.max_length and length > self.max_length):
+            return False
+        if self.forbidden and any(ch in self.forbidden for ch in password):
+            return False
+        if char_mask(password) & self.required_mask != self.required_mask:
+            return False
+        return self._regex is None or self._regex.search(password) is not None
+
+    def filter(self, passwords: list[str]) -> list[str]:
+        """Keep the passwords the policy accepts, in order."""
+        accepts = self.accepts
+        return [pw for pw in passwords if accepts(pw)]
+
+    def matches(self, password: str) -> bool:
+        """Check only the regex part of the policy."""
+        return self._regex is None or self._regex.search(password) is not None
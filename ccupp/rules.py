@@ -0,0 +1,142 @@
+"""Export the generation rules as a hashcat/John the Ripper rule attack.
+
+Instead of expanding every candidate, :func:`build_rules` emits the base
+words and one rule per transformation the generator would apply to them:
+case variants, leetspeak, suffixes, prefixes, and lucky-number and
+keyboard-pattern joins. The cracker expands them on-device
+(``hashcat -a 0 words.txt -r words.rule``).
+
+The rule file is applied to every profile's words, so it holds only the
+rules built from the generator's tables, which all profiles share. Joins
+of one profile's components with each other (name + birthdate, name +
+phone tail, two-component pairs) are profile-specific: they are written
+out as a separate list of joined words, run straight
+(``hashcat -a 0 words.joined.txt``), so the attack grows linearly with the
+number of profiles rather than with its square.
+
+Rules are applied to every base word, so the attack is a superset of
+:meth:`~ccupp.generator.PasswordGenerator.generate`: it also tries
+leetspeak on every word rather than only on old passwords. Only printable
+ASCII can be spelled in rules; table entries with other characters are
+left out of the rules.
+"""
+from __future__ import annotations
+
+from collections.abc import Iterable
+from collections.abc import Iterator
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+from ccupp.generator import KEYBOARD_PATTERNS
+from ccupp.generator import PasswordGenerator
+from ccupp.transforms.leetspeak import LEET_MAP
+
+RULES_FORMAT = 'hashcat-rules'
+
+# Counterparts of case_variants(). T0 toggles the first character, so it
+# matches the title-casing for words starting with a lower-case letter but
+# lower-cases the first letter of words starting with an upper-case one, an
+# extra candidate the generator does not try: a rule cannot test the case of
+# the character it toggles, and the attack is a superset anyway
+CASE_RULES = ('T0', 'u', 't')
+
+# leetspeak() maps letters case-insensitively, so substitute both cases
+LEET_RULE = ''.join(f's{k}{v}s{k.upper()}{v}' for k, v in LEET_MAP.items())
+
+# Rule families joining a profile's components with each other; their
+# candidates are joined words, not rules
+JOIN_FAMILIES = ('name_date', 'name_id', 'two_component')
+
+
+def append_rule(text: str) -> str:
+    """Rule appending ``text``.
+
+    >>> append_rule('@123')
+    '$@$1$2$3'
+    """
+    return ''.join(f'${ch}' for ch in text)
+
+
+def prepend_rule(text: str) -> str:
+    """Rule prepending ``text`` (hashcat prepends one character at a time).
+
+    >>> prepend_rule('my')
+    '^y^m'
+    """
+    return ''.join(f'^{ch}' for ch in reversed(text))
+
+
+def _spellable(text: str) -> bool:
+    """Whether ``text`` can be written character by character in a rule."""
+    return text.isascii() and text.isprintable()
+
+
+@dataclass
+class RuleSet:
+    """Base words plus the rules to apply to each of them, in priority order.
+
+    ``joined`` holds each profile's own component joins, tried as they are.
+    """
+
+    words: list[str] = field(default_factory=list)
+    rules: list[str] = field(default_factory=list)
+    joined: list[str] = field(default_factory=list)
+
+    def write(self, words_path: str | Path, rules_path: str | Path, joined_path: str | Path) -> None:
+        """Write the word list, the rule file and the joined words, one entry per line."""
+        for path, lines in ((words_path, self.words), (rules_path, self.rules), (joined_path, self.joined)):
+            with open(path, 'w', encoding='utf-8', newline='\n') as f:
+                f.writelines(f'{line}\n' for line in lines)
+
+
+def build_rules(generators: Iterable[PasswordGenerator]) -> RuleSet:
+    """Collect base words and rules for one or more configured generators.
+
+    Each generator contributes its component values as words, the
+    candidates of its :data:`JOIN_FAMILIES` as joined words, and its
+    suffix/prefix tables and enabled transforms as rules; all three lists
+    are deduplicated in first-seen order.
+    """
+    words: dict[str, None] = {}
+    rules: dict[str, None] = {':': None}
+    joined: dict[str, None] = {}
+    for generator in generators:
+        for values in generator.components.values():
+            words.update(dict.fromkeys(values))
+        for node in generator.compile():
+            if node.family in JOIN_FAMILIES:
+                joined.update(dict.fromkeys(node.expand()))
+        if generator.enable_keyboard_patterns:
+            words.update(dict.fromkeys(KEYBOARD_PATTERNS))
+        rules.update(dict.fromkeys(_generator_rules(generator)))
+    words.pop('', None)
+    joined.pop('', None)
+    return RuleSet(words=list(words), rules=list(rules), joined=list(joined))
+
+
+def _generator_rules(generator: PasswordGenerator) -> Iterator[str]:
+    """Yield the rules for one generator's tables, following its family order."""
+    case_rules = (':', *CASE_RULES) if generator.enable_case_variants else (':',)
+    suffixes = [s for s in generator.suffixes if s and _spellable(s)]
+    prefixes = [p for p in generator.prefixes if p and _spellable(p)]
+
+    # Old password and single-component variants
+    yield from case_rules
+    if generator.enable_leetspeak:
+        yield LEET_RULE
+    for case in case_rules:
+        for suffix in suffixes:
+            yield append_rule(suffix) if case == ':' else case + append_rule(suffix)
+    for prefix in prefixes:
+        yield prepend_rule(prefix)
+
+    joined: list[str] = []
+    if generator.enable_cultural_numbers:
+        joined += generator.lucky_numbers
+    if generator.enable_keyboard_patterns:
+        joined += KEYBOARD_PATTERNS
+    for text in joined:
+        if _spellable(text):
+            yield append_rule(text)
+            yield prepend_rule(text)
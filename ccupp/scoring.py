@@ -0,0 +1,225 @@
+"""Probability-ranked generation: a k-best merge across all plan nodes.
+
+The default plan emits families one after the other, so a likely
+``liwei1990`` (``name_date``) waits behind every ``prefix + value`` of the
+family before it. In scored mode every candidate gets an estimated
+probability instead, and candidates are emitted in globally descending
+probability order.
+
+The estimate factorises over the plan::
+
+    P(candidate) = P(family) * P(node | family) * prod(P(value | slot)) * P(join order)
+
+``P(family)`` comes from :data:`FAMILY_WEIGHTS` (overridable),
+``P(node | family)`` from each node's built-in rule weight among the
+family's nodes, and values within a slot, as well as a node's join orders,
+follow a Zipf law over their position: tables and components are already
+listed most likely first.
+
+Since each factor only falls as a slot index grows, a node's best
+candidate is its all-zero index vector, and every other vector can be
+reached from it by single increments that never raise the score.
+:func:`ranked_candidates` keeps one heap across all nodes, seeded with
+each node's best candidate; popping an entry pushes its successors. Only
+the frontier of the enumeration is ever held, not the nodes' products.
+
+The same family weights drive guess budgets: :func:`allocate_budget`
+splits a per-profile budget between families by expected yield.
+"""
+from __future__ import annotations
+
+import functools
+import heapq
+from collections.abc import Iterator
+from collections.abc import Mapping
+from collections.abc import Sequence
+from collections.abc import Set
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ccupp.generator import PlanNode
+
+# Estimated share of cracked passwords each rule family accounts for
+FAMILY_WEIGHTS = {
+    'old_password_variants': 0.30,
+    'name_date': 0.25,
+    'single_component_suffixed': 0.20,
+    'name_id': 0.10,
+    'two_component': 0.06,
+    'cultural_numbers': 0.05,
+    'keyboard_patterns': 0.04,
+}
+
+# Zipf exponent of the value-rank decay within a slot
+RANK_EXPONENT = 1.0
+
+
+@functools.lru_cache(maxsize=256)
+def rank_probabilities(size: int, exponent: float = RANK_EXPONENT) -> tuple[float, ...]:
+    """Zipf probabilities of ``size`` ranked items, most likely first.
+
+    >>> [round(p, 3) for p in rank_probabilities(3)]
+    [0.545, 0.273, 0.182]
+    """
+    weights = [(rank + 1) ** -exponent for rank in range(size)]
+    total = sum(weights)
+    return tuple(w / total for w in weights)
+
+
+def resolve_family_weights(overrides: Mapping[str, float] | None = None) -> dict[str, float]:
+    """:data:`FAMILY_WEIGHTS` with ``overrides`` applied.
+
+    Raises:
+        ValueError: If a weight is negative.
+    """
+    weights = {**FAMILY_WEIGHTS, **(overrides or {})}
+    for family, weight in weights.items():
+        if weight < 0:
+            raise ValueError(f'Family weight must be non-negative, got {family}={weight}')
+    return weights
+
+
+def allocate_budget(budget: int, sizes: Mapping[str, int], weights: Mapping[str, float]) -> dict[str, int]:
+    """Split ``budget`` guesses between families in proportion to their weights.
+
+    A family never gets more than its ``sizes`` entry (the candidates it
+    has); what it cannot use is split between the others, in proportion
+    again, until the budget or every family is used up. Fractional shares
+    are rounded by largest remainder (ties to the earlier family), so the
+    quotas add up to ``min(budget, sum(sizes))``. Families of weight 0 only
+    get budget the others cannot use, and share it equally.
+
+    >>> allocate_budget(100, {'a': 1000, 'b': 10, 'c': 1000}, {'a': 1, 'b': 1, 'c': 2})
+    {'a': 30, 'b': 10, 'c': 60}
+    """
+    quotas = dict.fromkeys(sizes, 0)
+    left = budget
+    for tier in (True, False):
+        active = [f for f in sizes if sizes[f] > 0 and (weights.get(f, 0.0) > 0) == tier]
+        while left > 0 and active:
+            total = sum(weights.get(f, 0.0) for f in active) if tier else len(active)
+            shares = {f: left * (weights.get(f, 0.0) if tier else 1) / total for f in active}
+            full = [f for f in active if shares[f] >= sizes[f] - quotas[f]]
+            if full:
+                # Cap these and split the rest again
+                for f in full:
+                    left -= sizes[f] - quotas[f]
+                    quotas[f] = sizes[f]
+                active = [f for f in active if f not in full]
+                continue
+            floors = {f: int(shares[f]) for f in active}
+            extra = left - sum(floors.values())
+            by_remainder = sorted(active, key=lambda f: floors[f] - shares[f])
+            for i, f in enumerate(by_remainder):
+                quotas[f] += floors[f] + (i < extra)
+            left = 0
+    return quotas
+
+
+def node_probabilities(nodes: Sequence[PlanNode], weights: Mapping[str, float]) -> list[float]:
+    """``P(family) * P(node | family)`` of each node.
+
+    Family weights are normalised over the families that have nodes, so
+    disabled or empty families do not take probability mass; a family
+    missing from ``weights`` gets weight 0.
+    """
+    family_total: dict[str, float] = {}
+    for node in nodes:
+        family_total[node.family] = family_total.get(node.family, 0.0) + node.weight
+    mass = sum(weights.get(family, 0.0) for family in family_total)
+    probabilities = []
+    for node in nodes:
+        share = weights.get(node.family, 0.0) / mass if mass else 0.0
+        total = family_total[node.family]
+        probabilities.append(share * node.weight / total if total else 0.0)
+    return probabilities
+
+
+def ranked_candidates(
+    nodes: Sequence[PlanNode],
+    weights: Mapping[str, float] | None = None,
+    exponent: float = RANK_EXPONENT,
+    closed: Set[str] = frozenset(),
+) -> Iterator[tuple[float, str, str]]:
+    """Lazily yield ``(probability, password, family)`` of every plan candidate, best first.
+
+    Yields each raw plan position exactly once (so, like the plan, the same
+    password can come up more than once). Ties are broken by plan
+    position, which keeps the order deterministic.
+
+    Args:
+        nodes: The compiled plan, in plan order.
+        weights: Family weights (default: :data:`FAMILY_WEIGHTS`).
+        exponent: Zipf exponent of the rank decay within a slot.
+        closed: Families to stop yielding. It may grow while iterating
+            (e.g. as families use up a budget); their nodes are dropped
+            from the merge as they come up.
+
+    >>> from ccupp.generator import PlanNode
+    >>> nodes = [PlanNode('single_component_suffixed', (('li',), ('', '1', '123'))),
+    ...          PlanNode('name_date', (('li',), ('1990',), ('',)), ((0, 2, 1), (1, 2, 0)))]
+    >>> [pw for _, pw, _ in ranked_candidates(nodes)]
+    ['li1990', 'li', '1990li', 'li1', 'li123']
+    """
+    if weights is None:
+        weights = FAMILY_WEIGHTS
+    # Per node: each dimension's values and probabilities (the slots, then
+    # the join order if there is a choice) and the plan-position stride of
+    # each dimension
+    dims: list[list[tuple[float, ...]]] = []
+    strides: list[list[int]] = []
+    probabilities = node_probabilities(nodes, weights)
+    heap: list[tuple[float, int, int, tuple[int, ...], int]] = []
+    offset = 0
+    for node_id, node in enumerate(nodes):
+        sizes = [len(slot) for slot in node.slots]
+        if len(node.orders) > 1:
+            sizes.append(len(node.orders))
+        node_dims = [rank_probabilities(size, exponent) for size in sizes]
+        node_strides = [1] * len(sizes)
+        stride = max(1, len(node.orders))
+        for i in reversed(range(len(node.slots))):
+            node_strides[i] = stride
+            stride *= sizes[i]
+        dims.append(node_dims)
+        strides.append(node_strides)
+        vector = (0,) * len(sizes)
+        heap.append((-_score(probabilities[node_id], node_dims, vector), offset, node_id, vector, 0))
+        offset += len(node)
+    heapq.heapify(heap)
+
+    join = ''.join
+    while heap:
+        score, position, node_id, vector, first = heapq.heappop(heap)
+        node = nodes[node_id]
+        if node.family in closed:
+            continue
+        parts = [slot[i] for slot, i in zip(node.slots, vector)]
+        if node.orders:
+            order = node.orders[vector[-1] if len(node.orders) > 1 else 0]
+            parts = [parts[i] for i in order]
+        yield -score, join(parts), node.family
+
+        # Successors: bump one index at or after the last one bumped, so
+        # every vector is reached along exactly one path
+        node_dims, node_strides = dims[node_id], strides[node_id]
+        for d in range(first, len(vector)):
+            if vector[d] + 1 < len(node_dims[d]):
+                child = (*vector[:d], vector[d] + 1, *vector[d + 1:])
+                heapq.heappush(
+                    heap, (
+                        -_score(probabilities[node_id], node_dims, child),
+                        position + node_strides[d], node_id, child, d,
+                    ),
+                )
+
+
+def _score(probability: float, dims: list[tuple[float, ...]], vector: tuple[int, ...]) -> float:
+    """Probability of the candidate at ``vector`` in a node of the given probability.
+
+    Always multiplied in the same order, so equal probabilities compare
+    equal and ties fall back to plan position.
+    """
+    for probabilities, i in zip(dims, vector):
+        probability *= probabilities[i]
+    return probability
@@ -0,0 +1,166 @@
+"""Opt-in profiling of a generation run.
+
+Pass a :class:`GenerationStats` to
+:func:`~ccupp.api.generate_passwords` (or to
+:meth:`~ccupp.generator.PasswordGenerator.generate` and
+:class:`~ccupp.extractors.components.LazyComponents`) and it is filled in
+as the run goes: per-family candidate counts and where they were dropped,
+wall and CPU time per family, time spent extracting components and
+converting pinyin, and the peak traced memory if :mod:`tracemalloc` is
+tracing. Without one, generation only pays a ``None`` check per plan node
+and per pinyin conversion.
+"""
+from __future__ import annotations
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+
+# (wall, CPU) timestamps, see clock()
+Clock = tuple[float, float]
+
+# Stats of the component extraction in progress, for the transforms to
+# report into; only set inside extracting()
+_extracting: ContextVar[GenerationStats | None] = ContextVar('_extracting', default=None)
+
+
+def clock() -> Clock:
+    """Current wall-clock and process CPU time."""
+    return time.perf_counter(), time.process_time()
+
+
+@dataclass
+class FamilyStats:
+    """Counters and timings for one rule family.
+
+    Attributes:
+        candidates: Raw plan positions the family's nodes cover.
+        filtered: Candidates the policy or length bounds dropped (most are
+            never built, see :meth:`~ccupp.generator.PlanNode.expand_within`).
+        other_shards: Candidates belonging to other shards.
+        duplicates: Candidates dropped as already emitted for the profile.
+        emitted: Candidates passed on (cross-profile dedup and an overall
+            limit may still drop some of them).
+        wall_time: Seconds spent building and expanding the family's nodes,
+            including the component extraction they trigger.
+        cpu_time: Process CPU seconds for the same.
+    """
+
+    family: str
+    candidates: int = 0
+    filtered: int = 0
+    other_shards: int = 0
+    duplicates: int = 0
+    emitted: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+
+
+@dataclass
+class GenerationStats:
+    """Profile of a generation run, filled in while it runs.
+
+    Attributes:
+        families: Per-family counters, in priority order.
+        extract_time: Seconds spent extracting components.
+        pinyin_time: Seconds of that spent converting to pinyin.
+        pinyin_calls: Number of words converted to pinyin.
+        cross_profile_duplicates: Passwords dropped because an earlier
+            profile already emitted them.
+        emitted: Passwords the run produced.
+        wall_time: Seconds from the first to the last block, including
+            time the caller spent between blocks.
+        cpu_time: Process CPU seconds over the same span (the parent
+            process only when generating with workers).
+        peak_memory: Peak traced bytes, if :mod:`tracemalloc` was tracing.
+    """
+
+    families: dict[str, FamilyStats] = field(default_factory=dict)
+    extract_time: float = 0.0
+    pinyin_time: float = 0.0
+    pinyin_calls: int = 0
+    cross_profile_duplicates: int = 0
+    emitted: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_memory: int = 0
+
+    def family(self, name: str) -> FamilyStats:
+        """The counters of one family, created on first use."""
+        fam = self.families.get(name)
+        if fam is None:
+            fam = self.families[name] = FamilyStats(name)
+        return fam
+
+    def record_node(
+        self,
+        family: str,
+        since: Clock,
+        candidates: int,
+        kept: int,
+        in_shard: int,
+        fresh: int,
+        emitted: int,
+    ) -> Clock:
+        """Account for one expanded plan node; returns the clock for the next one.
+
+        The counts are the node's candidates after each stage: all of them,
+        those the policy kept, those in this shard, those not yet seen, and
+        those actually passed on (fewer than ``fresh`` at a limit).
+        """
+        now = clock()
+        fam = self.family(family)
+        fam.candidates += candidates
+        fam.filtered += candidates - kept
+        fam.other_shards += kept - in_shard
+        fam.duplicates += in_shard - fresh
+        fam.emitted += emitted
+        fam.wall_time += now[0] - since[0]
+        fam.cpu_time += now[1] - since[1]
+        return now
+
+    def merge(self, other: GenerationStats) -> None:
+        """Add the counters of another run (e.g. a worker's) into this one.
+
+        Run-level totals (wall/CPU time, emitted, peak memory) are left to
+        whoever times the whole run.
+        """
+        for name, theirs in other.families.items():
+            mine = self.family(name)
+            mine.candidates += theirs.candidates
+            mine.filtered += theirs.filtered
+            mine.other_shards += theirs.other_shards
+            mine.duplicates += theirs.duplicates
+            mine.emitted += theirs.emitted
+            mine.wall_time += theirs.wall_time
+            mine.cpu_time += theirs.cpu_time
+        self.extract_time += other.extract_time
+        self.pinyin_time += other.pinyin_time
+        self.pinyin_calls += other.pinyin_calls
+        self.cross_profile_duplicates += other.cross_profile_duplicates
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data form, e.g. for JSON output."""
+        return asdict(self)
+
+
+@contextmanager
+def extracting(stats: GenerationStats) -> Iterator[None]:
+    """Time a component extraction and let the transforms report into ``stats``."""
+    token = _extracting.set(stats)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.extract_time += time.perf_counter() - started
+        _extracting.reset(token)
+
+
+def current_stats() -> GenerationStats | None:
+    """Stats of the extraction in progress, or ``None`` when not profiling."""
+    return _extracting.get()
@@ -0,0 +1,239 @@
+"""Learn rule ordering from PII/password pairs (``ccupp train-order``).
+
+Each record of a paired dataset (see
+:func:`~ccupp.benchmark.datasets.iter_paired_dataset`) is run through the
+default generator for its profile. If the target password comes up, the
+plan node that produced it first is located and credited: its rule
+family, the suffix/prefix/delimiter table entries its slots took (see
+:attr:`PlanNode.sources <ccupp.generator.PlanNode>`), and for the
+two-component rule, the category pair. Each credit records the target's
+rank in the generation order, and every family's candidates are counted
+so its yield per guess is known.
+
+The counts are plain sums, so records are measured in chunks across a
+process pool and merged in submission order; :meth:`TrainingCounts.to_weights`
+turns them into an :class:`~ccupp.weights.OrderWeights` file with
+deterministic tie-breaking, so the same dataset always gives the same file.
+"""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from dataclasses import field
+from itertools import islice
+from typing import Any
+
+from ccupp.benchmark.datasets import PairedRecord
+from ccupp.extractors.components import extract_components
+from ccupp.generator import COMMON_PREFIXES
+from ccupp.generator import COMMON_SUFFIXES
+from ccupp.generator import DELIMITERS
+from ccupp.generator import FAMILIES
+from ccupp.generator import PasswordGenerator
+from ccupp.scoring import FAMILY_WEIGHTS
+from ccupp.weights import FamilyWeight
+from ccupp.weights import OrderWeights
+from ccupp.weights import TABLES
+
+# Records per worker task
+DEFAULT_CHUNK_SIZE = 256
+
+# Tasks in flight per worker
+_TASKS_PER_WORKER = 2
+
+# Built-in order of each table, for breaking ties between learned entries
+_DEFAULT_TABLES = {'suffixes': COMMON_SUFFIXES, 'prefixes': COMMON_PREFIXES, 'delimiters': DELIMITERS}
+
+
+@dataclass
+class TrainingCounts:
+    """Hit counts gathered from paired records.
+
+    Attributes:
+        records: Records measured.
+        cracked: Records whose target the generator produced.
+        hits: Per family, targets it produced first.
+        rank_sums: Per family, the sum of those targets' 1-based ranks in
+            the profile's deduplicated generation order.
+        candidates: Per family, raw candidates over all records.
+        entries: Per table, per entry, ``[hits, rank sum]`` of the
+            targets whose producing node took that entry.
+        pairs: Per two-component category pair, ``[hits, rank sum]``.
+    """
+
+    records: int = 0
+    cracked: int = 0
+    hits: dict[str, int] = field(default_factory=dict)
+    rank_sums: dict[str, int] = field(default_factory=dict)
+    candidates: dict[str, int] = field(default_factory=dict)
+    entries: dict[str, dict[str, list[int]]] = field(default_factory=lambda: {table: {} for table in TABLES})
+    pairs: dict[tuple[str, str], list[int]] = field(default_factory=dict)
+
+    def add(self, record: PairedRecord, options: dict[str, Any] | None = None) -> int:
+        """Measure one record; returns the target's rank, or 0 if it never came up.
+
+        ``options`` are passed on to :class:`~ccupp.generator.PasswordGenerator`.
+        """
+        self.records += 1
+        target = record.target_password
+        generator = PasswordGenerator(components=extract_components(record.profile), **(options or {}))
+        seen = {''}
+        emitted = 0
+        rank = 0
+        for node in generator.compile():
+            self.candidates[node.family] = self.candidates.get(node.family, 0) + len(node)
+            if rank:
+                continue
+            block = node.expand()
+            fresh = []
+            for pw in block:
+                if pw not in seen:
+                    seen.add(pw)
+                    fresh.append(pw)
+            if target not in seen:
+                emitted += len(fresh)
+                continue
+            rank = emitted + fresh.index(target) + 1
+            self.cracked += 1
+            self.hits[node.family] = self.hits.get(node.family, 0) + 1
+            self.rank_sums[node.family] = self.rank_sums.get(node.family, 0) + rank
+            digits, _ = node.locate(block.index(target))
+            for source, slot, digit in zip(node.sources, node.slots, digits):
+                if source in self.entries:
+                    _credit(self.entries[source], slot[digit], rank)
+            if node.family == 'two_component' and len(node.sources) >= 2:
+                _credit(self.pairs, (node.sources[0], node.sources[1]), rank)
+        return rank
+
+    def merge(self, other: TrainingCounts) -> None:
+        """Add the counts of another batch of records (e.g. a worker's) into these."""
+        self.records += other.records
+        self.cracked += other.cracked
+        for mine, theirs in (
+            (self.hits, other.hits), (self.rank_sums, other.rank_sums),
+            (self.candidates, other.candidates),
+        ):
+            for key, value in theirs.items():
+                mine[key] = mine.get(key, 0) + value
+        for table, entries in other.entries.items():
+            for entry, (hits, rank_sum) in entries.items():
+                _credit(self.entries.setdefault(table, {}), entry, rank_sum, hits)
+        for pair, (hits, rank_sum) in other.pairs.items():
+            _credit(self.pairs, pair, rank_sum, hits)
+
+    def to_weights(self) -> OrderWeights:
+        """The weights file these counts give.
+
+        A family's weight is its share of cracked targets, smoothed with
+        one pseudo-record spread by :data:`~ccupp.scoring.FAMILY_WEIGHTS`
+        so families never seen keep a small prior weight. Families the
+        records exercised are ordered by weight per candidate (yield per
+        guess), the others keep their built-in place; table entries
+        and category pairs by hits, then by lower rank sum; remaining ties
+        go to the built-in order.
+        """
+        prior = sum(FAMILY_WEIGHTS.values())
+        families = {
+            name: FamilyWeight(
+                weight=round((self.hits.get(name, 0) + FAMILY_WEIGHTS.get(name, 0.0)) / (self.cracked + prior), 6),
+                hits=self.hits.get(name, 0),
+                rank_sum=self.rank_sums.get(name, 0),
+                candidates=self.candidates.get(name, 0),
+            )
+            for name in FAMILIES
+        }
+        # Families the data had candidates for are sorted into the places
+        # they take in the built-in order; the others keep theirs
+        records = max(1, self.records)
+        seen = [name for name in FAMILIES if families[name].candidates]
+        ranked = iter(sorted(seen, key=lambda name: -families[name].weight * records / families[name].candidates))
+        family_order = [next(ranked) if families[name].candidates else name for name in FAMILIES]
+        tables = {}
+        for table in TABLES:
+            default = _DEFAULT_TABLES[table]
+            entries = self.entries.get(table, {})
+            tables[table] = sorted(
+                entries,
+                key=lambda entry: (
+                    -entries[entry][0], entries[entry][1],
+                    default.index(entry) if entry in default else len(default), entry,
+                ),
+            )
+        category_pairs = sorted(self.pairs, key=lambda pair: (-self.pairs[pair][0], self.pairs[pair][1], pair))
+        return OrderWeights(
+            records=self.records,
+            cracked=self.cracked,
+            families=families,
+            family_order=family_order,
+            category_pairs=category_pairs,
+            **tables,
+        )
+
+
+def _credit(counts: dict[Any, list[int]], key: Any, rank_sum: int, hits: int = 1) -> None:
+    entry = counts.get(key)
+    if entry is None:
+        counts[key] = [hits, rank_sum]
+    else:
+        entry[0] += hits
+        entry[1] += rank_sum
+
+
+def _measure_chunk(records: list[PairedRecord], options: dict[str, Any] | None) -> TrainingCounts:
+    """Worker task: measure a chunk of records."""
+    counts = TrainingCounts()
+    for record in records:
+        counts.add(record, options)
+    return counts
+
+
+def train_order(
+    records: Iterable[PairedRecord],
+    *,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    options: dict[str, Any] | None = None,
+) -> TrainingCounts:
+    """Measure a stream of paired records.
+
+    With ``workers`` > 1, chunks of ``chunk_size`` records are measured in a
+    process pool, a few in flight per worker, so memory stays bounded
+    however long the stream is. The result does not depend on
+    ``workers`` or ``chunk_size``.
+    """
+    counts = TrainingCounts()
+    for chunk_counts in _measured_chunks(iter(records), workers, chunk_size, options):
+        counts.merge(chunk_counts)
+    return counts
+
+
+def _measured_chunks(
+    records: Iterator[PairedRecord],
+    workers: int,
+    chunk_size: int,
+    options: dict[str, Any] | None,
+) -> Iterator[TrainingCounts]:
+    """Counts of each chunk of records, in order."""
+    if workers <= 1:
+        while chunk := list(islice(records, chunk_size)):
+            yield _measure_chunk(chunk, options)
+        return
+    pending: deque[Future[TrainingCounts]] = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        try:
+            while True:
+                while len(pending) < workers * _TASKS_PER_WORKER:
+                    chunk = list(islice(records, chunk_size))
+                    if not chunk:
+                        break
+                    pending.append(pool.submit(_measure_chunk, chunk, options))
+                if not pending:
+                    return
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -1,5 +1,23 @@
-"""Date format transforms for password generation."""
+"""Date format transforms for password generation.
+
+Exact birthdays repeat a lot across large profile sets (paired datasets
+have a million records but only a few tens of thousands of distinct
+dates), so :class:`DateTable` formats each date once and serves it by
+index afterwards. Partial knowledge (a year, a year range, an age) is
+handled by :func:`partial_date_variants`, which enumerates candidate
+dates lazily, most likely first.
+"""
+from __future__ import annotations
+
+import calendar
+import datetime
+import functools
+from collections.abc import Iterable
 from collections.abc import Iterator
+from collections.abc import Sequence
+
+# Years covered by the default date table
+DATE_TABLE_YEARS = (1940, 2030)
 
 
 def date_variants(year: str, month: str, day: str) -> Iterator[str]:
@@ -47,3 +65,151 @@ def date_variants(year: str, month: str, day: str) -> Iterator[str]:
         if v and v not in seen:
             seen.add(v)
             yield v
+
+
+class DateTable:
+    """Variants of every date in a range of years, with O(1) lookup.
+
+    Dates are laid out in a flat array of 12 x 31 slots per year, so a
+    date's slot is pure arithmetic. A slot holds the tuple
+    :func:`date_variants` yields for the zero-padded date; it is formatted
+    the first time the date is looked up and shared from then on.
+    """
+
+    def __init__(self, first_year: int = DATE_TABLE_YEARS[0], last_year: int = DATE_TABLE_YEARS[1]) -> None:
+        if not 0 < first_year <= last_year <= 9999:
+            raise ValueError(f'Invalid year range: {first_year}-{last_year}')
+        self.first_year = first_year
+        self.last_year = last_year
+        self._slots: list[tuple[str, ...] | None] = [None] * ((last_year - first_year + 1) * 12 * 31)
+
+    def __contains__(self, date: object) -> bool:
+        return isinstance(date, tuple) and len(date) == 3 and self._slot(*date) is not None
+
+    def _slot(self, year: int, month: int, day: int) -> int | None:
+        """Slot of a date, or ``None`` if it is outside the table."""
+        if not (self.first_year <= year <= self.last_year and 1 <= month <= 12 and 1 <= day <= 31):
+            return None
+        return ((year - self.first_year) * 12 + month - 1) * 31 + day - 1
+
+    def variants(self, year: int, month: int, day: int) -> tuple[str, ...]:
+        """Variants of a date, as :func:`date_variants` gives for it zero-padded.
+
+        >>> DateTable().variants(1983, 9, 24)[:4]
+        ('19830924', '198309', '0924', '1983')
+
+        Raises:
+            KeyError: If the date is outside the table.
+        """
+        found = self.get(year, month, day)
+        if found is None:
+            raise KeyError((year, month, day))
+        return found
+
+    def get(self, year: int, month: int, day: int) -> tuple[str, ...] | None:
+        """Like :meth:`variants`, but ``None`` if the date is outside the table."""
+        slot = self._slot(year, month, day)
+        if slot is None:
+            return None
+        cached = self._slots[slot]
+        if cached is None:
+            cached = self._slots[slot] = tuple(date_variants(f'{year:04d}', f'{month:02d}', f'{day:02d}'))
+        return cached
+
+
+@functools.cache
+def default_date_table() -> DateTable:
+    """The process-wide table over :data:`DATE_TABLE_YEARS`."""
+    return DateTable()
+
+
+def cached_date_variants(year: str, month: str, day: str) -> tuple[str, ...]:
+    """:func:`date_variants` of a date, from the default table when it covers it.
+
+    Only ``YYYY``/``MM``/``DD`` strings are served from the table; anything
+    else (unpadded parts, years out of range) is formatted as given.
+    """
+    if len(year) == 4 and len(month) == 2 and len(day) == 2 and (year + month + day).isdigit():
+        found = default_date_table().get(int(year), int(month), int(day))
+        if found is not None:
+            return found
+    return tuple(date_variants(year, month, day))
+
+
+def birth_years(
+    year: str = '',
+    year_range: tuple[int, int] | None = None,
+    age: int | None = None,
+    today: datetime.date | None = None,
+) -> list[int]:
+    """Candidate birth years, most likely first.
+
+    A known ``year`` (``YYYY``) wins. A ``year_range`` is taken as a guess centred on
+    its midpoint, so years are tried from the middle outwards. An ``age``
+    gives two years; the later one is more likely once more than half of
+    ``today``'s year (default: the current date) has passed.
+
+    >>> birth_years(year_range=(1988, 1992))
+    [1990, 1989, 1991, 1988, 1992]
+    >>> birth_years(age=30, today=datetime.date(2024, 3, 1))
+    [1993, 1994]
+    """
+    if len(year) == 4 and year.isdigit():
+        return [int(year)]
+    if year_range is not None:
+        low, high = sorted(year_range)
+        middle = (low + high) // 2
+        return sorted(range(low, high + 1), key=lambda y: (abs(y - middle), y))
+    if age is not None:
+        today = today or datetime.date.today()
+        later = today.year - age
+        past_half = today.timetuple().tm_yday > (366 if calendar.isleap(today.year) else 365) // 2
+        return [later, later - 1] if past_half else [later - 1, later]
+    return []
+
+
+def candidate_dates(years: Iterable[int], month: int = 0) -> Iterator[tuple[int, int, int]]:
+    """Lazily yield the valid ``(year, month, day)`` dates of ``years``.
+
+    Years are taken in the order given (most likely first); days within a
+    year are equally likely, so they come in calendar order. A known
+    ``month`` restricts the dates to it.
+
+    >>> next(candidate_dates([1990], month=2))
+    (1990, 2, 1)
+    """
+    for year in years:
+        for m in (month,) if month else range(1, 13):
+            for day in range(1, calendar.monthrange(year, m)[1] + 1):
+                yield year, m, day
+
+
+def partial_date_variants(years: Sequence[int], month: int = 0) -> Iterator[str]:
+    """Variants for a birthday known only partly, most likely first, lazily.
+
+    First the year forms of every candidate year, then the year-month forms
+    if the month is known, then the variants of each candidate date in
+    :func:`candidate_dates` order. Nothing is formatted before it is
+    asked for.
+
+    >>> from itertools import islice
+    >>> list(islice(partial_date_variants([1990, 1991]), 6))
+    ['1990', '90', '1991', '91', '19900101', '199001']
+    """
+    seen: set[str] = set()
+
+    def fresh(variants: Iterable[str]) -> Iterator[str]:
+        for variant in variants:
+            if variant not in seen:
+                seen.add(variant)
+                yield variant
+
+    for year in years:
+        yield from fresh((f'{year:04d}', f'{year % 100:02d}'))
+    if month:
+        for year in years:
+            yield from fresh((f'{year:04d}{month:02d}', f'{year % 100:02d}{month:02d}'))
+    table = default_date_table()
+    for year, m, day in candidate_dates(years, month):
+        found = table.get(year, m, day)
+        yield from fresh(found if found is not None else date_variants(f'{year:04d}', f'{m:02d}', f'{day:02d}'))
@@ -1,8 +1,32 @@
-"""Pinyin conversion transforms for Chinese characters."""
+"""Pinyin conversion transforms for Chinese characters.
+
+pypinyin loads large phrase dictionaries on import, so it is only imported
+once a non-ASCII word needs converting; ASCII text converts to itself, and
+words of common single-reading characters are read from the compact
+:mod:`~ccupp.transforms.pinyin_table` instead.
+
+The same surnames, cities and employers come up over and over across
+profiles, so conversions are memoized in a bounded LRU. A persistent
+:class:`PinyinCache` can back it with a file shared across runs, see
+:func:`pinyin_cache`.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import time
 from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
 
-from pypinyin import lazy_pinyin
-from pypinyin import Style
+from ccupp.stats import current_stats
+from ccupp.transforms.pinyin_table import default_table
+
+# Words whose conversions are kept in memory
+PINYIN_CACHE_SIZE = 16384
+
+# Persistent cache in use, set by pinyin_cache()
+_disk_cache: PinyinCache | None = None
 
 
 def to_pinyin(word: str) -> str:
@@ -13,7 +37,9 @@ def to_pinyin(word: str) -> str:
     >>> to_pinyin('二狗')
     'ergou'
     """
-    return ''.join(lazy_pinyin(word))
+    if word.isascii():
+        return word
+    return _pinyin(word)[0]
 
 
 def to_pinyin_initials(word: str) -> str:
@@ -24,7 +50,105 @@ def to_pinyin_initials(word: str) -> str:
     >>> to_pinyin_initials('二狗')
     'eg'
     """
-    return ''.join(lazy_pinyin(word, style=Style.FIRST_LETTER))
+    if word.isascii():
+        return word
+    return _pinyin(word)[1]
+
+
+def _pinyin(word: str) -> tuple[str, str]:
+    """Full pinyin and initials of a non-ASCII word, recorded in the persistent cache."""
+    converted = _convert(word)
+    if _disk_cache is not None:
+        _disk_cache.add(word, converted)
+    return converted
+
+
+@functools.lru_cache(maxsize=PINYIN_CACHE_SIZE)
+def _convert(word: str) -> tuple[str, str]:
+    if _disk_cache is not None:
+        known = _disk_cache.get(word)
+        if known is not None:
+            return known
+    table = default_table()
+    if table is not None:
+        known = table.lookup(word)
+        if known is not None:
+            return known
+    from pypinyin import lazy_pinyin
+    from pypinyin import Style
+    return ''.join(lazy_pinyin(word)), ''.join(lazy_pinyin(word, style=Style.FIRST_LETTER))
+
+
+class PinyinCache:
+    """Conversions of non-ASCII words, kept in a file across runs.
+
+    The file holds one ``word<TAB>pinyin<TAB>initials`` line per word, in
+    UTF-8. A missing file is an empty cache. :meth:`save` merges in lines
+    other runs have written meanwhile and replaces the file atomically, so
+    concurrent runs can share one file.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.entries = _read_cache(self.path)
+        self._added = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, word: str) -> tuple[str, str] | None:
+        """The ``(pinyin, initials)`` of a word, if cached."""
+        return self.entries.get(word)
+
+    def add(self, word: str, converted: tuple[str, str]) -> None:
+        """Record a conversion, to be written by the next :meth:`save`."""
+        if word not in self.entries and '\t' not in word and '\n' not in word:
+            self.entries[word] = converted
+            self._added += 1
+
+    def save(self) -> None:
+        """Write the cache back if conversions were added since it was read."""
+        if not self._added:
+            return
+        self.entries = {**_read_cache(self.path), **self.entries}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'{self.path.name}.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(f'{word}\t{full}\t{initials}\n' for word, (full, initials) in self.entries.items())
+        os.replace(tmp, self.path)
+        self._added = 0
+
+
+def _read_cache(path: Path) -> dict[str, tuple[str, str]]:
+    """Entries of a cache file; malformed lines are skipped."""
+    entries = {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 3 and fields[0]:
+                    entries[fields[0]] = fields[1], fields[2]
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+@contextmanager
+def pinyin_cache(path: str | Path) -> Iterator[PinyinCache]:
+    """Back conversions with the persistent cache at ``path`` within the block.
+
+    Conversions the file already holds skip pypinyin; every word
+    converted in the block (even one the in-memory LRU answered) is added
+    to it, and the file is saved on exit.
+    """
+    global _disk_cache
+    previous = _disk_cache
+    cache = _disk_cache = PinyinCache(path)
+    try:
+        yield cache
+    finally:
+        _disk_cache = previous
+        cache.save()
 
 
 def pinyin_variants(word: str) -> Iterator[str]:
@@ -38,8 +162,12 @@ def pinyin_variants(word: str) -> Iterator[str]:
     >>> list(pinyin_variants('二狗'))
     ['ergou', 'eg', 'Ergou']
     """
-    full = to_pinyin(word)
-    initials = to_pinyin_initials(word)
+    stats = current_stats()
+    started = time.perf_counter() if stats is not None else 0.0
+    full, initials = (word, word) if word.isascii() else _pinyin(word)
+    if stats is not None:
+        stats.pinyin_time += time.perf_counter() - started
+        stats.pinyin_calls += 1
     title = full[0].upper() + full[1:] if full else full
 
     seen = set()
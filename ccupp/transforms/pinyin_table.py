@@ -0,0 +1,169 @@
+"""Compact, memory-mapped pinyin table for common characters.
+
+pypinyin keeps its whole character and phrase dictionaries in memory, tens
+of megabytes per process. Most words in profiles (names, places,
+institutions) are made of common characters with a single reading, and
+those convert character by character. This module stores exactly those:
+the GB2312 characters that pypinyin reads the same way on their own and
+inside every phrase of its phrase dictionary.
+
+The table is a small binary file (``ccupp/data/pinyin_table.bin``, about
+45 KB) that is memory-mapped, so forked workers share its pages instead of
+each holding a dictionary. Layout, little-endian::
+
+    header     magic b'CCPY', version (u16), first code point (u32),
+               code points covered (u32), syllable bytes (u32)
+    syllables  ASCII pinyin syllables, '\\n'-separated; id 0 is unused
+    ids        one u16 syllable id per code point from the first one
+               (0 = not in the table), 2-byte aligned
+
+Initials are the first letter of each syllable, as pypinyin's
+``FIRST_LETTER`` style gives for these characters. Rebuild the shipped
+table with ``python -m ccupp.transforms.pinyin_table``.
+"""
+from __future__ import annotations
+
+import functools
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import Iterable
+from importlib import resources
+from pathlib import Path
+
+TABLE_MAGIC = b'CCPY'
+TABLE_VERSION = 1
+
+# Table shipped in ccupp/data
+TABLE_RESOURCE = 'pinyin_table.bin'
+
+_HEADER = struct.Struct('<4sHIII')
+
+
+class PinyinTable:
+    """Read-only view of a pinyin table file.
+
+    Raises:
+        ValueError: If the file is not a pinyin table of this version.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._first, count, size = _HEADER.unpack_from(self._map)
+        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+            raise ValueError(f'Not a version {TABLE_VERSION} pinyin table: {path}')
+        start = _HEADER.size
+        self._syllables = [''] + self._map[start:start + size].decode('ascii').split('\n')
+        start += size + size % 2
+        self._ids = memoryview(self._map)[start:start + 2 * count].cast('H')
+
+    def __len__(self) -> int:
+        """Number of characters in the table."""
+        return sum(1 for i in self._ids if i)
+
+    def lookup(self, word: str) -> tuple[str, str] | None:
+        """Full pinyin and initials of ``word``, or ``None`` unless every character is in the table.
+
+        >>> default_table().lookup('李明')
+        ('liming', 'lm')
+        >>> default_table().lookup('重庆') is None  # 重 has two readings
+        True
+        """
+        ids, first, syllables = self._ids, self._first, self._syllables
+        parts = []
+        for char in word:
+            index = ord(char) - first
+            if not 0 <= index < len(ids) or not ids[index]:
+                return None
+            parts.append(syllables[ids[index]])
+        return ''.join(parts), ''.join(part[0] for part in parts)
+
+
+@functools.cache
+def default_table() -> PinyinTable | None:
+    """The shipped table, opened once per process (``None`` if unavailable)."""
+    # The ids are read in native byte order
+    if sys.byteorder != 'little':
+        return None
+    try:
+        with resources.as_file(resources.files('ccupp.data').joinpath(TABLE_RESOURCE)) as path:
+            return PinyinTable(path)
+    except (OSError, ValueError):
+        return None
+
+
+def gb2312_characters() -> list[str]:
+    """The 6763 hanzi of GB2312 (levels 1 and 2)."""
+    chars = []
+    for high in range(0xB0, 0xF8):
+        for low in range(0xA1, 0xFF):
+            try:
+                chars.append(bytes((high, low)).decode('gb2312'))
+            except UnicodeDecodeError:
+                pass
+    return chars
+
+
+def fixed_readings(chars: Iterable[str]) -> dict[str, str]:
+    """Readings of the characters that pypinyin always converts the same way.
+
+    A character qualifies if its reading is plain letters whose first one
+    is its ``FIRST_LETTER`` initial, and every phrase in pypinyin's
+    dictionary made of qualifying characters reads it that way too. (Rare
+    readings pypinyin never picks without ``heteronym=True``, like 明's
+    "meng", don't matter.) Words made only of these characters then
+    convert exactly as pypinyin converts them.
+    """
+    from pypinyin import lazy_pinyin
+    from pypinyin import Style
+    from pypinyin.constants import PHRASES_DICT
+
+    readings = {}
+    for char in chars:
+        full = lazy_pinyin(char)[0]
+        initial = lazy_pinyin(char, style=Style.FIRST_LETTER)[0]
+        if full.isascii() and full.isalpha() and initial == full[0]:
+            readings[char] = full
+    # Drop characters some phrase reads differently (dropping only ever
+    # takes phrases out of consideration, so one pass is enough)
+    for phrase in PHRASES_DICT:
+        if not all(char in readings for char in phrase):
+            continue
+        converted = lazy_pinyin(phrase)
+        if len(converted) != len(phrase):
+            bad = set(phrase)
+        else:
+            bad = {char for char, full in zip(phrase, converted) if readings[char] != full}
+        for char in bad:
+            del readings[char]
+    return readings
+
+
+def build_table(path: str | Path, chars: Iterable[str] | None = None) -> int:
+    """Write a table of the fixed-reading ones among ``chars`` (default: GB2312).
+
+    Returns the number of characters in the table.
+    """
+    readings = fixed_readings(gb2312_characters() if chars is None else chars)
+    syllables = sorted(set(readings.values()))
+    syllable_ids = {syllable: i for i, syllable in enumerate(syllables, 1)}
+    codes = [ord(char) for char in readings]
+    first = min(codes, default=0)
+    ids = array('H', bytes(2 * (max(codes) - first + 1))) if codes else array('H')
+    for char, full in readings.items():
+        ids[ord(char) - first] = syllable_ids[full]
+    if sys.byteorder != 'little':
+        ids.byteswap()
+    blob = '\n'.join(syllables).encode('ascii')
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(TABLE_MAGIC, TABLE_VERSION, first, len(ids), len(blob)))
+        f.write(blob + b'\0' * (len(blob) % 2))
+        f.write(ids.tobytes())
+    return len(readings)
+
+
+if __name__ == '__main__':
+    target = sys.argv[1] if len(sys.argv) > 1 else str(Path(__file__).parent.parent / 'data' / TABLE_RESOURCE)
+    print(f'{build_table(target)} characters -> {target}')
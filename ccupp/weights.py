@@ -0,0 +1,179 @@
+"""Learned rule ordering, as written by ``ccupp train-order``.
+
+A weights file reorders what the generator tries: the rule families, the
+suffix, prefix and delimiter tables, and the category pairs of the
+two-component rule. It only ever reorders; entries it does not mention
+keep their built-in relative order after the ones it ranks, so a
+weights file learned on one population never drops candidates on
+another. Family weights also feed scored generation and guess budgets
+(see :mod:`ccupp.scoring`).
+
+The file is JSON::
+
+    {"version": 1, "records": 1000000, "cracked": 183211,
+     "families": {"name_date": {"weight": 0.31, "hits": 56000, ...}, ...},
+     "family_order": ["old_password_variants", "name_date", ...],
+     "suffixes": ["123", "", "1", ...], "prefixes": [...], "delimiters": [...],
+     "category_pairs": [["name", "birthdate"], ...]}
+
+Everything derived from it is deterministic: the same file always gives
+the same generation order.
+"""
+from __future__ import annotations
+
+import json
+import os
+from collections.abc import Iterable
+from collections.abc import Sequence
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+from typing import Any
+
+WEIGHTS_VERSION = 1
+
+# Rule tables a weights file can reorder
+TABLES = ('suffixes', 'prefixes', 'delimiters')
+
+
+@dataclass
+class FamilyWeight:
+    """What training measured for one rule family.
+
+    Attributes:
+        weight: Estimated share of cracked passwords the family accounts
+            for (used as its scored-mode and budget weight).
+        hits: Targets the family produced first.
+        rank_sum: Sum of those targets' ranks in the generation order.
+        candidates: Raw candidates the family had, over all records.
+    """
+
+    weight: float
+    hits: int = 0
+    rank_sum: int = 0
+    candidates: int = 0
+
+    @property
+    def mean_rank(self) -> float:
+        return self.rank_sum / self.hits if self.hits else 0.0
+
+
+@dataclass
+class OrderWeights:
+    """A loaded weights file."""
+
+    records: int = 0
+    cracked: int = 0
+    families: dict[str, FamilyWeight] = field(default_factory=dict)
+    family_order: list[str] = field(default_factory=list)
+    suffixes: list[str] = field(default_factory=list)
+    prefixes: list[str] = field(default_factory=list)
+    delimiters: list[str] = field(default_factory=list)
+    category_pairs: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def family_weights(self) -> dict[str, float]:
+        """Learned family weights, for :class:`~ccupp.generator.PasswordGenerator`."""
+        return {name: fam.weight for name, fam in self.families.items()}
+
+    def rank_table(self, table: str, entries: Sequence[str]) -> list[str]:
+        """``entries`` reordered by the learned ranking of ``table``.
+
+        >>> OrderWeights(suffixes=['123', '!']).rank_table('suffixes', ['', '1', '!', '123'])
+        ['123', '!', '', '1']
+        """
+        return rank_by(entries, getattr(self, table))
+
+    def rank_families(self, families: Sequence[str]) -> list[str]:
+        """``families`` reordered by the learned family order."""
+        return rank_by(families, self.family_order)
+
+    def rank_pairs(self, pairs: Sequence[tuple[str, str]]) -> list[tuple[str, str]]:
+        """Category pairs reordered by the learned pair ranking.
+
+        A learned pair matches either way round.
+        """
+        ranking: dict[frozenset[str], int] = {}
+        for i, pair in enumerate(self.category_pairs):
+            ranking.setdefault(frozenset(pair), i)
+        # sorted() is stable: unranked pairs keep their order at the end
+        return sorted(pairs, key=lambda pair: ranking.get(frozenset(pair), len(ranking)))
+
+    @classmethod
+    def load(cls, path: str | Path) -> OrderWeights:
+        """Read a weights file written by :meth:`save`.
+
+        Raises:
+            FileNotFoundError: If there is no file at ``path``.
+            ValueError: If the file is not a valid weights file of this version.
+        """
+        with open(path, encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+                if data.get('version') != WEIGHTS_VERSION:
+                    raise ValueError(f'unsupported version {data.get("version")!r}')
+                return cls.from_dict(data)
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                raise ValueError(f'Invalid weights file {path}: {e}') from None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> OrderWeights:
+        families = {
+            name: FamilyWeight(
+                weight=float(fam['weight']),
+                hits=int(fam.get('hits', 0)),
+                rank_sum=int(fam.get('rank_sum', 0)),
+                candidates=int(fam.get('candidates', 0)),
+            )
+            for name, fam in data.get('families', {}).items()
+        }
+        for name, fam in families.items():
+            if fam.weight < 0:
+                raise ValueError(f'negative weight for {name}')
+        return cls(
+            records=int(data.get('records', 0)),
+            cracked=int(data.get('cracked', 0)),
+            families=families,
+            family_order=[str(name) for name in data.get('family_order', [])],
+            category_pairs=[(str(a), str(b)) for a, b in data.get('category_pairs', [])],
+            **{table: [str(entry) for entry in data.get(table, [])] for table in TABLES},
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Plain-data form, as saved."""
+        return {
+            'version': WEIGHTS_VERSION,
+            'records': self.records,
+            'cracked': self.cracked,
+            'families': {
+                name: {
+                    'weight': fam.weight,
+                    'hits': fam.hits,
+                    'rank_sum': fam.rank_sum,
+                    'mean_rank': round(fam.mean_rank, 2),
+                    'candidates': fam.candidates,
+                }
+                for name, fam in self.families.items()
+            },
+            'family_order': self.family_order,
+            **{table: getattr(self, table) for table in TABLES},
+            'category_pairs': [list(pair) for pair in self.category_pairs],
+        }
+
+    def save(self, path: str | Path) -> None:
+        """Write the weights file atomically."""
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        os.replace(tmp, path)
+
+
+def rank_by(entries: Iterable[str], ranking: Sequence[str]) -> list[str]:
+    """``entries`` with those in ``ranking`` first, in its order, then the rest in theirs.
+
+    >>> rank_by(['a', 'b', 'c', 'd'], ['c', 'x', 'a'])
+    ['c', 'a', 'b', 'd']
+    """
+    position = {entry: i for i, entry in reversed(list(enumerate(ranking)))}
+    return sorted(entries, key=lambda entry: position.get(entry, len(position)))
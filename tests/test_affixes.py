@@ -0,0 +1,117 @@
+"""Tests for affix mining (count-min sketch, heavy hitters, affix files)."""
+import random
+from collections import Counter
+
+import pytest
+
+from ccupp.affixes import AffixMiner
+from ccupp.affixes import AffixTables
+from ccupp.affixes import CountMinSketch
+from ccupp.affixes import HeavyHitters
+from ccupp.affixes import mine_affixes
+from ccupp.affixes import split_affixes
+from ccupp.extractors.components import extract_components
+from ccupp.generator import PasswordGenerator
+
+
+def _passwords(n=20000, seed=0):
+    """Names with Zipf-distributed numeric tails and a few separators."""
+    rng = random.Random(seed)
+    tails = [str(rng.randrange(10 ** rng.randint(1, 6))) for _ in range(5000)]
+    names = ['liwei', 'wang', 'zhang', 'password', 'iloveyou']
+    return [
+        rng.choice(names) + rng.choice(['', '', '_', '.', '@']) + tails[min(int(rng.paretovariate(0.8)), len(tails)) - 1]
+        for _ in range(n)
+    ]
+
+
+class TestSplitAffixes:
+    def test_tables(self):
+        assert split_affixes('wang.1990') == [
+            ('suffixes', '.1990'), ('prefixes', ''), ('digit_tails', '1990'), ('delimiters', '.'),
+        ]
+        assert split_affixes('#1abc') == [('suffixes', ''), ('prefixes', '#1'), ('delimiters', '')]
+
+    def test_digits_only(self):
+        # No letters: no suffix or prefix, and the digits are no tail
+        assert split_affixes('19900115') == []
+        assert split_affixes('1990-01-15') == [('digit_tails', '15'), ('delimiters', '-')]
+
+    def test_max_length(self):
+        assert ('suffixes', '123456789') not in split_affixes('li123456789')
+        assert ('suffixes', '123456789') in split_affixes('li123456789', max_length=9)
+
+
+class TestSketch:
+    def test_never_underestimates(self):
+        sketch = CountMinSketch(memory=4096)
+        counts = Counter(str(i % 997) for i in range(20000))
+        for item, count in counts.items():
+            sketch.add(item, count)
+        assert all(sketch.estimate(item) >= count for item, count in counts.items())
+        assert sketch.total == 20000
+
+    def test_exact_when_roomy(self):
+        sketch = CountMinSketch(memory=1 << 20)
+        assert sketch.add('123', 5) == 5
+        assert sketch.add('123') == 6
+        assert sketch.estimate('520') == 0
+
+    def test_heavy_hitters_bounded(self):
+        hitters = HeavyHitters(capacity=10)
+        for i in range(1000):
+            hitters.offer(str(i), i)
+            assert len(hitters) <= 20
+        assert [item for item, _ in hitters.top(3)] == ['999', '998', '997']
+
+
+class TestMining:
+    def test_matches_exact_counts(self):
+        passwords = _passwords()
+        exact = {}
+        for pw in passwords:
+            for table, entry in split_affixes(pw):
+                exact.setdefault(table, Counter())[entry] += 1
+        # A sketch far smaller than the distinct affixes need exactly
+        tables = mine_affixes(passwords, top=10, memory=64 * 1024)
+        for table in ('suffixes', 'digit_tails'):
+            expected = sorted(exact[table].items(), key=lambda item: (-item[1], item[0]))[:10]
+            assert getattr(tables, table) == [entry for entry, _ in expected]
+            assert all(mined >= count for mined, (_, count) in zip(tables.counts[table], expected))
+        assert tables.delimiters[0] == ''
+        assert tables.passwords == len(passwords)
+
+    def test_chunking_does_not_matter(self):
+        passwords = _passwords(5000)
+        whole = mine_affixes(passwords, top=10)
+        miner = AffixMiner(top=10)
+        miner.add(passwords, chunk_lines=7)
+        assert miner.tables() == whole
+
+    def test_round_trip(self, tmp_path):
+        tables = mine_affixes(_passwords(2000), top=5)
+        path = tmp_path / 'affixes.json'
+        tables.save(path)
+        assert AffixTables.load(path) == tables
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'affixes.json'
+        path.write_text('{"version": 99}')
+        with pytest.raises(ValueError, match='Invalid affix file'):
+            AffixTables.load(path)
+
+
+class TestGeneratorTables:
+    def test_replace_built_in_tables(self, sample_profile):
+        affixes = AffixTables(suffixes=['', '99'], delimiters=['', '~'], digit_tails=['777'])
+        gen = PasswordGenerator(components=extract_components(sample_profile), affixes=affixes)
+        passwords = set(gen.generate())
+        assert {'li99', 'li~19830924', 'li777', '777li'} <= passwords
+        assert 'li123' not in passwords
+        # Prefixes the file lacks stay built in
+        assert gen.prefixes == PasswordGenerator(components={}).prefixes
+
+    def test_explicit_tables_win(self, sample_profile):
+        affixes = AffixTables(suffixes=['99'])
+        gen = PasswordGenerator(components=extract_components(sample_profile), suffixes=['42'], affixes=affixes)
+        assert gen.suffixes == ['42']
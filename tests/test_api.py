@@ -1,6 +1,8 @@
 """Tests for the high-level SDK API (ccupp.generate_passwords and re-exports)."""
 import itertools
 
+import pytest
+
 import ccupp
 from ccupp import Profile
 from ccupp import extract_components
@@ -9,8 +11,10 @@ from ccupp import generate_passwords
 
 def test_public_api_reexports():
     """Core SDK names are importable straight from the top-level package."""
-    for name in ('Profile', 'PasswordGenerator', 'extract_components',
-                 'generate_passwords', 'load_profiles'):
+    for name in (
+        'Profile', 'PasswordGenerator', 'GenerationStats', 'extract_components',
+        'generate_hybrid', 'generate_passwords', 'generate_rules', 'load_profiles',
+    ):
         assert name in ccupp.__all__
         assert hasattr(ccupp, name)
 
@@ -74,3 +78,242 @@ def test_generate_passwords_empty_profile(empty_profile: Profile):
     to assert that nothing is derived from the (empty) profile itself.
     """
     assert list(generate_passwords(empty_profile, enable_keyboard_patterns=False)) == []
+
+
+def test_generate_passwords_limit(sample_profile: Profile):
+    """``limit`` caps the total count and keeps the unlimited prefix."""
+    full = list(itertools.islice(generate_passwords(sample_profile, min_length=8), 300))
+    assert list(generate_passwords(sample_profile, min_length=8, limit=300)) == full
+
+
+def test_generate_passwords_limit_stops_upstream(sample_profile: Profile, monkeypatch):
+    """Profiles and components past the limit are never extracted."""
+    from ccupp.extractors import components as components_module
+
+    extracted: list[str] = []
+    original = components_module._hometown_parts
+
+    def spy(profile: Profile) -> list[str]:
+        extracted.append('hometowns')
+        return original(profile)
+
+    monkeypatch.setitem(
+        components_module._CATEGORIES, 'hometowns',
+        (spy, components_module._CATEGORIES['hometowns'][1]),
+    )
+
+    def profiles():
+        yield sample_profile
+        raise AssertionError('second profile must not be pulled')
+
+    assert len(list(generate_passwords(profiles(), limit=5))) == 5
+    assert extracted == []
+
+
+def test_estimate_passwords_bounds_generation(sample_profile: Profile, minimal_profile: Profile):
+    """The unique-count bound is never below what generation really emits."""
+    profiles = [sample_profile, minimal_profile]
+    estimate = ccupp.estimate_passwords(profiles, min_length=6, max_length=14)
+    actual = list(generate_passwords(profiles, min_length=6, max_length=14))
+    assert len(actual) <= estimate.max_unique
+    assert estimate.in_length <= estimate.candidates
+
+
+def test_estimate_passwords_takes_generation_options(sample_profile: Profile, minimal_profile: Profile):
+    """Budget, policy and affixes reach the estimate as they reach generation."""
+    from ccupp.affixes import AffixTables
+    from ccupp.policy import PasswordPolicy
+
+    profiles = [sample_profile, minimal_profile]
+    affixes = AffixTables(suffixes=['!', '2024'])
+    policy = PasswordPolicy(min_length=8)
+    options = dict(budget=40, policy=policy, affixes=affixes)
+    estimate = ccupp.estimate_passwords(profiles, **options)
+    actual = list(generate_passwords(profiles, **options))
+    assert len(actual) <= estimate.max_unique <= 2 * 40
+    # The budget lifts the plan's top-N cuts, and the policy's minimum length counts
+    plain = ccupp.estimate_passwords(profiles, affixes=affixes)
+    assert estimate.candidates > plain.candidates
+    assert ccupp.estimate_passwords(profiles, policy=policy, affixes=affixes).in_length < plain.in_length
+
+
+@pytest.mark.parametrize('options', [{'budget': 60}, {'scored': True}, {'scored': True, 'budget': 60}])
+def test_generate_passwords_start_in_ranked_modes(sample_profile: Profile, options):
+    """Resuming a scored or budgeted run continues it instead of starting a new one."""
+    full = list(generate_passwords(sample_profile, **options))
+    for start in (10, 59):
+        assert list(generate_passwords(sample_profile, start=start, **options)) == full[start:]
+
+
+def test_generate_passwords_bloom_dedup(sample_profile: Profile, minimal_profile: Profile):
+    """A roomy Bloom filter gives the same output as exact dedup."""
+    from ccupp.dedup import BloomFilter
+
+    profiles = [sample_profile, minimal_profile, sample_profile]
+    exact = list(generate_passwords(profiles))
+    bloom = list(generate_passwords(profiles, dedup=BloomFilter(memory=1 << 20, fp_rate=1e-9)))
+    assert bloom == exact
+
+
+def test_generate_passwords_external_dedup(sample_profile: Profile, minimal_profile: Profile, tmp_path):
+    """Disk-spilling dedup yields exactly the in-memory output and honours limit."""
+    from ccupp.dedup import ExternalDedup
+
+    profiles = [sample_profile, minimal_profile, sample_profile]
+    exact = list(generate_passwords(profiles, min_length=6))
+    spilled = ExternalDedup(memory=64 << 10, temp_dir=tmp_path)
+    assert list(generate_passwords(profiles, min_length=6, dedup=spilled)) == exact
+    assert spilled.spilled_runs > 1
+    limited = list(generate_passwords(profiles, min_length=6, limit=100, dedup=ExternalDedup(temp_dir=tmp_path)))
+    assert limited == exact[:100]
+
+
+def test_generate_passwords_shards_cover_output(sample_profile: Profile, minimal_profile: Profile):
+    """Cross-profile dedup within shards still unions to the unsharded output."""
+    profiles = [sample_profile, minimal_profile, sample_profile]
+    full = list(generate_passwords(profiles, max_length=12))
+    shards = [list(generate_passwords(profiles, max_length=12, shard_index=i, num_shards=4)) for i in range(4)]
+    merged = [pw for shard in shards for pw in shard]
+    assert len(merged) == len(full)
+    assert set(merged) == set(full)
+
+
+def test_generate_passwords_workers_match_serial(sample_profile: Profile, minimal_profile: Profile):
+    """A process pool yields exactly the serial stream, including limit and shards."""
+    from ccupp import parallel
+    from ccupp.policy import PasswordPolicy
+
+    profiles = [sample_profile, minimal_profile, sample_profile] * 3
+    serial = list(generate_passwords(profiles, min_length=6))
+    assert list(generate_passwords(profiles, min_length=6, workers=2)) == serial
+    assert list(generate_passwords(profiles, min_length=6, limit=50, workers=2)) == serial[:50]
+    sharded = list(generate_passwords(profiles, shard_index=1, num_shards=3))
+    assert list(generate_passwords(profiles, shard_index=1, num_shards=3, workers=2)) == sharded
+
+    # Small chunks keep several shared-memory blocks in flight at once
+    policy = PasswordPolicy(min_length=6)
+    chunked = parallel.parallel_profile_blocks(profiles, policy, {}, workers=2, chunk_size=1)
+    expected = [pw for block in parallel.profile_blocks(profiles, policy, {}) for pw in block]
+    assert [pw for block in chunked for pw in block] == expected
+
+
+def test_generate_passwords_workers_keep_any_character(minimal_profile: Profile):
+    """Passwords holding NUL or newlines come back from the workers whole."""
+    odd = Profile(surname='王', passwords=['a\0b', 'c\nd'], accounts=['x\0'])
+    profiles = [odd, minimal_profile]
+    serial = list(generate_passwords(profiles))
+    assert 'a\0b' in serial
+    assert list(generate_passwords(profiles, workers=2)) == serial
+
+
+def test_generate_passwords_start_and_checkpoint(sample_profile: Profile, minimal_profile: Profile):
+    """Resuming from a checkpoint loses nothing, in the serial and pooled paths."""
+    from ccupp import PasswordGenerator
+    from ccupp.checkpoint import Checkpoint
+
+    profiles = [minimal_profile, sample_profile, minimal_profile]
+    sizes = [PasswordGenerator(components=extract_components(p)).plan_size() for p in profiles]
+    full = list(generate_passwords(profiles))
+    for workers in (1, 2):
+        checkpoint = Checkpoint()
+        first = list(itertools.islice(generate_passwords(profiles, checkpoint=checkpoint, workers=workers), 100))
+        assert checkpoint.position in (0, sizes[0])
+        rest = list(generate_passwords(profiles, start=checkpoint.position, workers=workers))
+        assert set(first) | set(rest) == set(full)
+        remaining = set(full[100:])
+        assert [pw for pw in rest if pw in remaining] == full[100:]
+
+        done = Checkpoint()
+        assert list(generate_passwords(profiles, checkpoint=done, workers=workers)) == full
+        assert done.position == sum(sizes)
+
+    # Skipping the first profile's plan is the same as leaving it out
+    tail = list(generate_passwords(profiles[1:]))
+    assert list(generate_passwords(profiles, start=sizes[0])) == tail
+    assert list(generate_passwords(profiles, start=sizes[0], workers=2)) == tail
+
+
+def test_generate_passwords_as_bytes(sample_profile: Profile, minimal_profile: Profile):
+    profiles = [sample_profile, minimal_profile, sample_profile]
+    expected = list(generate_passwords(profiles, min_length=6, limit=3000))
+    batches = list(generate_passwords(profiles, min_length=6, limit=3000, as_bytes=True, batch_size=512))
+    assert all(isinstance(batch, bytes) for batch in batches)
+    assert b''.join(batches).decode('utf-8').split('\n')[:-1] == expected
+
+
+def test_generate_passwords_policy(sample_profile: Profile, minimal_profile: Profile):
+    from ccupp.policy import PasswordPolicy
+
+    profiles = [sample_profile, minimal_profile]
+    policy = PasswordPolicy(required=frozenset({'digit', 'upper'}), max_length=14)
+    expected = [pw for pw in generate_passwords(profiles) if policy.accepts(pw) and len(pw) >= 8]
+    assert list(generate_passwords(profiles, policy=policy, min_length=8)) == expected
+    assert list(generate_passwords(profiles, policy=policy, min_length=8, workers=2)) == expected
+
+
+def test_generate_passwords_pinyin_cache(sample_profile: Profile, tmp_path):
+    """The persistent cache fills up during a run and leaves the output unchanged."""
+    from ccupp.transforms.pinyin import PinyinCache
+
+    path = tmp_path / 'pinyin.tsv'
+    expected = list(generate_passwords(sample_profile))
+    assert list(generate_passwords(sample_profile, pinyin_cache=path)) == expected
+    cache = PinyinCache(path)
+    assert cache.get(sample_profile.surname) is not None
+    assert list(generate_passwords(sample_profile, pinyin_cache=path)) == expected
+    assert PinyinCache(path).entries == cache.entries
+
+
+def test_generate_passwords_scored(sample_profile: Profile, minimal_profile: Profile):
+    """Scored mode reorders each profile's output, pooled or not, and resumes cleanly."""
+    from ccupp.checkpoint import Checkpoint
+
+    profiles = [sample_profile, minimal_profile]
+    full = list(generate_passwords(profiles, scored=True))
+    assert set(full) == set(generate_passwords(profiles))
+    assert full != list(generate_passwords(profiles))
+    assert list(generate_passwords(profiles, scored=True, workers=2)) == full
+
+    checkpoint = Checkpoint()
+    list(itertools.islice(generate_passwords(profiles, scored=True, checkpoint=checkpoint), 100))
+    rest = list(generate_passwords(profiles, scored=True, start=checkpoint.position))
+    assert set(full[100:]) <= set(rest)
+
+    with pytest.raises(ValueError, match='non-negative'):
+        generate_passwords(profiles, scored=True, family_weights={'name_date': -1.0})
+
+
+def test_generate_passwords_budget(sample_profile: Profile, minimal_profile: Profile):
+    """The budget caps each profile's guesses, not the run's."""
+    profiles = [sample_profile, minimal_profile]
+    per_profile = [list(generate_passwords(p, budget=200)) for p in profiles]
+    assert all(len(passwords) <= 200 for passwords in per_profile)
+    combined = list(generate_passwords(profiles, budget=200))
+    assert combined == list(dict.fromkeys(sum(per_profile, [])))
+    assert list(generate_passwords(profiles, budget=200, workers=2)) == combined
+    with pytest.raises(ValueError, match='Budget'):
+        generate_passwords(profiles, budget=-1)
+
+
+def test_generate_passwords_ngram(sample_profile: Profile, minimal_profile: Profile, tmp_path):
+    """A model file reorders within families; workers reopen it and agree."""
+    from ccupp.ngram import NgramModel
+
+    path = tmp_path / 'ngram.bin'
+    NgramModel.train(['li123', 'liwei520', 'password1'] * 10).save(path)
+    profiles = [sample_profile, minimal_profile]
+    reranked = list(generate_passwords(profiles, ngram=path))
+    assert sorted(reranked) == sorted(generate_passwords(profiles))
+    assert list(generate_passwords(profiles, ngram=path, workers=2)) == reranked
+    with pytest.raises(ValueError, match='scored'):
+        generate_passwords(profiles, ngram=path, scored=True)
+
+
+def test_generate_passwords_affixes(sample_profile: Profile, tmp_path):
+    from ccupp.affixes import mine_affixes
+
+    path = tmp_path / 'affixes.json'
+    mine_affixes(['li2024', 'wang2024', 'zhang2024!'], top=3).save(path)
+    passwords = list(generate_passwords(sample_profile, affixes=path))
+    assert 'li2024' in passwords
+    assert 'li2024' not in generate_passwords(sample_profile)
@@ -0,0 +1,84 @@
+"""Tests for the offline hash audit."""
+import hashlib
+
+import pytest
+
+from ccupp import generate_passwords
+from ccupp.audit import audit_profiles
+from ccupp.audit import HashTarget
+from ccupp.audit import load_targets
+from ccupp.audit import TargetIndex
+from ccupp.models import Profile
+
+
+def _line(user: str, password: str, algorithm: str = 'md5', salt: str = '') -> str:
+    digest = hashlib.new(algorithm, (password + salt).encode('utf-8')).hexdigest()
+    return f'{user}:{digest}:{salt}' if salt else f'{user}:{digest}'
+
+
+def test_parse_hash_lines():
+    target = HashTarget.parse(_line('li', 'x', 'sha256', salt='a:b'))
+    assert (target.user, target.algorithm, target.salt) == ('li', 'sha256', 'a:b')
+    for bad in ('nohash', 'li:abc', 'li:' + 'zz' * 16):
+        with pytest.raises(ValueError):
+            HashTarget.parse(bad)
+
+
+def test_load_targets(tmp_path):
+    path = tmp_path / 'hashes.txt'
+    path.write_text(f'# comment\n\n{_line("li", "x")}\n{_line("wang", "y", "sha1")}\n', encoding='utf-8')
+    assert [t.user for t in load_targets(path)] == ['li', 'wang']
+    path.write_text(f'{_line("li", "x")}\nbroken\n', encoding='utf-8')
+    with pytest.raises(ValueError, match=':2:'):
+        load_targets(path)
+
+
+def test_index_finds_each_group():
+    targets = [
+        HashTarget.parse(_line('a', 'pw1')),
+        HashTarget.parse(_line('b', 'pw2', 'sha1', salt='s')),
+    ]
+    hits = TargetIndex(targets).find(['pw0', 'pw1', 'pw2'], [t.group for t in targets])
+    assert sorted((i, group) for i, group, _ in hits) == [(1, ('md5', '')), (2, ('sha1', 's'))]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_audit_reports_guess_rank(sample_profile, workers):
+    candidates = list(generate_passwords(sample_profile))
+    targets = [
+        HashTarget.parse(_line('twodogs', candidates[500], 'sha1')),
+        HashTarget.parse(_line('other', candidates[20], 'sha256', salt='NaCl')),
+        HashTarget.parse(_line('nobody', 'not-a-candidate')),
+    ]
+    matches = list(audit_profiles([sample_profile], targets, workers=workers, batch_size=64))
+    assert [(m.user, m.password, m.rank) for m in matches] == [
+        ('other', candidates[20], 21),
+        ('twodogs', candidates[500], 501),
+    ]
+    assert all(m.profile == 0 and m.seconds >= 0 for m in matches)
+
+
+def test_audit_scopes_users_to_their_profile(sample_profile, minimal_profile):
+    wang = list(generate_passwords(minimal_profile))[3]
+    # 'twodogs' belongs to sample_profile, so minimal_profile never tries it
+    targets = [HashTarget.parse(_line('twodogs', wang)), HashTarget.parse(_line('someone', wang))]
+    matches = list(audit_profiles([sample_profile, minimal_profile], targets))
+    assert [(m.user, m.profile) for m in matches] == [('someone', 1)]
+
+
+def test_audit_claimed_user_in_several_profiles(sample_profile):
+    # Two profiles claim 'twodogs': the first to crack it reports it, once
+    other = Profile(surname='王', accounts=list(sample_profile.accounts))
+    pw = list(generate_passwords(sample_profile))[40]
+    targets = [HashTarget.parse(_line('twodogs', pw)), HashTarget.parse(_line('twodogs', 'nope'))]
+    index = TargetIndex(targets)
+    assert len(index.users['twodogs']) == 2
+    matches = list(audit_profiles([sample_profile, other], targets))
+    assert [(m.user, m.password, m.profile) for m in matches] == [('twodogs', pw, 0)]
+
+
+def test_audit_limit(minimal_profile):
+    late = list(generate_passwords(minimal_profile))[-1]
+    targets = [HashTarget.parse(_line('x', late))]
+    assert not list(audit_profiles([minimal_profile], targets, limit=10))
+    assert list(audit_profiles([minimal_profile], targets))
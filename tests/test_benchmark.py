@@ -1,4 +1,5 @@
 """Tests for the benchmark framework."""
+import gzip
 import json
 import tempfile
 from pathlib import Path
@@ -9,6 +10,8 @@ from ccupp.benchmark.academic import ACADEMIC_RESULTS
 from ccupp.benchmark.academic import get_targeted_papers
 from ccupp.benchmark.datasets import PairedRecord
 from ccupp.benchmark.datasets import get_builtin_common_passwords
+from ccupp.benchmark.datasets import iter_paired_dataset
+from ccupp.benchmark.datasets import iter_password_list
 from ccupp.benchmark.datasets import load_paired_dataset
 from ccupp.benchmark.metrics import GuessNumberStats
 from ccupp.benchmark.metrics import compute_guess_curve
@@ -48,6 +51,16 @@ class TestDatasets:
         assert 'password' in passwords
         assert '5201314' in passwords
 
+    def test_iter_password_list(self, tmp_path):
+        plain, packed = tmp_path / 'list.txt', tmp_path / 'list.txt.gz'
+        plain.write_text('123456\n\n  woaini \n123456\n', encoding='utf-8')
+        with gzip.open(packed, 'wt', encoding='utf-8') as f:
+            f.write(plain.read_text(encoding='utf-8'))
+        # Duplicates and file order are kept
+        assert list(iter_password_list(plain)) == list(iter_password_list(packed)) == ['123456', 'woaini', '123456']
+        with pytest.raises(FileNotFoundError):
+            iter_password_list(tmp_path / 'missing.txt')
+
 
 class TestPairedDataset:
     def test_load_jsonl(self, tmp_path):
@@ -85,9 +98,21 @@ class TestPairedDataset:
         records = load_paired_dataset(jsonl_file)
         assert len(records) == 1
 
+    def test_iter_streams_lazily(self, tmp_path):
+        jsonl_file = tmp_path / 'test.jsonl'
+        jsonl_file.write_text(
+            '\n'.join(json.dumps({'surname': '李', 'target_password': f'li{i}'}) for i in range(3)),
+            encoding='utf-8',
+        )
+        records = iter_paired_dataset(jsonl_file)
+        assert next(records).target_password == 'li0'
+        assert [r.target_password for r in records] == ['li1', 'li2']
+
     def test_file_not_found(self):
         with pytest.raises(FileNotFoundError):
             load_paired_dataset('/nonexistent/file.jsonl')
+        with pytest.raises(FileNotFoundError):
+            iter_paired_dataset('/nonexistent/file.jsonl')
 
     def test_unsupported_format(self, tmp_path):
         (tmp_path / 'test.xml').write_text('<data/>')
@@ -0,0 +1,356 @@
+"""Tests for the ``ccupp`` command-line interface."""
+import hashlib
+import json
+import tracemalloc
+
+import pytest
+import yaml
+from typer.testing import CliRunner
+
+from ccupp.__main__ import _write_passwords
+from ccupp.__main__ import app
+from ccupp.checkpoint import Checkpoint
+from ccupp.metrics import ProgressTracker
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / 'config.yaml'
+    path.write_text(
+        yaml.dump(
+            [
+                {
+                    'surname': '李', 'first_name': '二狗', 'birthdate': ['1983', '09', '24'],
+                    'passwords': ['old_password'],
+                },
+                {'surname': '王', 'first_name': '明'},
+            ], allow_unicode=True,
+        ), encoding='utf-8',
+    )
+    return path
+
+
+def test_generate_txt_to_stdout(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--limit', '5'])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        'old_password', 'Old_password', 'OLD_PASSWORD', 'old_password1', 'old_password12',
+    ]
+
+
+@pytest.mark.parametrize('fmt', ['json', 'jsonl'])
+def test_generate_json_formats_agree_with_txt(config_file, tmp_path, fmt):
+    txt = tmp_path / 'out.txt'
+    out = tmp_path / f'out.{fmt}'
+    assert runner.invoke(app, ['generate', '-c', str(config_file), '-o', str(txt)]).exit_code == 0
+    assert runner.invoke(app, ['generate', '-c', str(config_file), '-f', fmt, '-o', str(out)]).exit_code == 0
+
+    expected = txt.read_text(encoding='utf-8').splitlines()
+    content = out.read_text(encoding='utf-8')
+    if fmt == 'json':
+        assert json.loads(content) == expected
+    else:
+        assert [json.loads(line) for line in content.splitlines()] == expected
+
+
+def test_generate_unknown_format(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-f', 'xml'])
+    assert result.exit_code == 1
+
+
+def test_estimate_json(config_file, tmp_path):
+    result = runner.invoke(app, ['estimate', '-c', str(config_file), '--json'])
+    assert result.exit_code == 0
+    data = json.loads(result.stdout)
+    assert data['candidates'] == sum(f['candidates'] for f in data['families'].values())
+
+    out = tmp_path / 'out.txt'
+    runner.invoke(app, ['generate', '-c', str(config_file), '-o', str(out)])
+    assert len(out.read_text(encoding='utf-8').splitlines()) <= data['max_unique']
+
+
+def test_estimate_budget(config_file):
+    from ccupp import load_profiles
+
+    result = runner.invoke(app, ['estimate', '-c', str(config_file), '--budget', '30', '--json'])
+    assert result.exit_code == 0
+    assert 0 < json.loads(result.stdout)['max_unique'] <= 30 * len(load_profiles(str(config_file)))
+
+
+@pytest.mark.parametrize('backend', ['bloom', 'cuckoo', 'external'])
+def test_generate_probabilistic_dedup(config_file, backend):
+    exact = runner.invoke(app, ['generate', '-c', str(config_file)])
+    approx = runner.invoke(
+        app, [
+            'generate', '-c', str(config_file),
+            '--dedup', backend, '--dedup-memory', '4M', '--dedup-fp-rate', '1e-9',
+        ],
+    )
+    assert approx.exit_code == 0
+    assert approx.stdout == exact.stdout
+
+
+def test_generate_invalid_dedup_memory(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--dedup', 'bloom', '--dedup-memory', 'lots'])
+    assert result.exit_code == 1
+
+
+def test_generate_shards(config_file):
+    full = runner.invoke(app, ['generate', '-c', str(config_file)]).stdout.splitlines()
+    shards = [
+        runner.invoke(app, ['generate', '-c', str(config_file), '--shard', f'{i}/3']).stdout.splitlines()
+        for i in (1, 2, 3)
+    ]
+    assert sorted(pw for shard in shards for pw in shard) == sorted(full)
+
+
+@pytest.mark.parametrize('spec', ['0/3', '4/3', '1', 'a/b', '1/0'])
+def test_generate_invalid_shard(config_file, spec):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--shard', spec])
+    assert result.exit_code == 1
+
+
+def test_generate_workers(config_file):
+    serial = runner.invoke(app, ['generate', '-c', str(config_file)])
+    pooled = runner.invoke(app, ['generate', '-c', str(config_file), '--workers', '2'])
+    assert pooled.exit_code == 0
+    assert pooled.stdout == serial.stdout
+
+
+def test_generate_resume_from_checkpoint(config_file, tmp_path):
+    full = runner.invoke(app, ['generate', '-c', str(config_file)]).stdout.splitlines()
+    out, checkpoint = tmp_path / 'out.txt', tmp_path / 'run.ckpt'
+    args = ['generate', '-c', str(config_file), '-o', str(out), '--resume-from', str(checkpoint)]
+
+    # An interrupted run, then a resumed one appending to the same file
+    assert runner.invoke(app, [*args, '--limit', '50']).exit_code == 0
+    saved = json.loads(checkpoint.read_text())
+    assert saved['emitted'] == 50
+    assert runner.invoke(app, args).exit_code == 0
+    lines = out.read_text(encoding='utf-8').splitlines()
+    assert lines[:50] == full[:50]
+    assert set(lines) == set(full)
+    assert json.loads(checkpoint.read_text())['emitted'] == len(lines)
+
+
+def test_generate_skip(config_file):
+    from ccupp import generate_passwords
+    from ccupp import load_profiles
+
+    expected = list(generate_passwords(load_profiles(str(config_file)), start=10))
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--skip', '10'])
+    assert result.stdout.splitlines() == expected
+
+
+def test_generate_pipe(config_file):
+    text = runner.invoke(app, ['generate', '-c', str(config_file)])
+    piped = runner.invoke(app, ['generate', '-c', str(config_file), '--pipe'])
+    assert piped.exit_code == 0
+    assert piped.stdout == text.stdout
+
+
+def test_generate_pipe_rejects_output(config_file, tmp_path):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--pipe', '-o', str(tmp_path / 'out.txt')])
+    assert result.exit_code == 1
+
+
+def test_generate_policy_options(config_file):
+    result = runner.invoke(
+        app, [
+            'generate', '-c', str(config_file), '--require', 'digit,upper', '--forbid', '@', '--min-length', '8',
+        ],
+    )
+    assert result.exit_code == 0
+    lines = result.stdout.splitlines()
+    assert lines
+    assert all(len(pw) >= 8 and '@' not in pw and any(c.isupper() for c in pw) for pw in lines)
+
+
+def test_generate_invalid_policy(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--require', 'emoji'])
+    assert result.exit_code == 1
+
+
+def test_generate_hashcat_rules(config_file, tmp_path):
+    out = tmp_path / 'words.txt'
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-f', 'hashcat-rules', '-o', str(out)])
+    assert result.exit_code == 0
+    assert out.read_text(encoding='utf-8').splitlines()
+    assert ':' in (tmp_path / 'words.rule').read_text(encoding='utf-8').splitlines()
+    assert (tmp_path / 'words.joined.txt').read_text(encoding='utf-8').splitlines()
+
+
+def test_generate_hashcat_rules_needs_output(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-f', 'hashcat-rules'])
+    assert result.exit_code == 1
+
+
+def test_generate_hashcat_hybrid(config_file, tmp_path):
+    out = tmp_path / 'words.txt'
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-f', 'hashcat-hybrid', '-o', str(out)])
+    assert result.exit_code == 0
+    assert out.read_text(encoding='utf-8').splitlines()
+    assert (tmp_path / 'words.append.hcmask').read_text(encoding='utf-8').splitlines()
+    assert (tmp_path / 'words.prepend.hcmask').read_text(encoding='utf-8').splitlines()
+    assert (tmp_path / 'words.joined.txt').read_text(encoding='utf-8').splitlines()
+
+
+def test_generate_hashcat_hybrid_needs_output(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-f', 'hashcat-hybrid'])
+    assert result.exit_code == 1
+
+
+def test_audit(config_file, tmp_path):
+    hashes = tmp_path / 'hashes.txt'
+    hashes.write_text(
+        f'li:{hashlib.md5(b"old_password1").hexdigest()}\nnobody:{hashlib.md5(b"zzz").hexdigest()}\n',
+        encoding='utf-8',
+    )
+    result = runner.invoke(app, ['audit', str(hashes), '-c', str(config_file), '--json'])
+    assert result.exit_code == 0
+    data = json.loads(result.stdout)
+    assert (data['targets'], data['cracked']) == (2, 1)
+    assert data['matches'][0]['password'] == 'old_password1'
+    assert data['matches'][0]['rank'] == 4
+
+
+def test_audit_invalid_hash_file(config_file, tmp_path):
+    hashes = tmp_path / 'hashes.txt'
+    hashes.write_text('li:nothex\n', encoding='utf-8')
+    result = runner.invoke(app, ['audit', str(hashes), '-c', str(config_file)])
+    assert result.exit_code == 1
+
+
+def test_generate_profile(config_file, tmp_path):
+    out = tmp_path / 'out.txt'
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-o', str(out), '--profile'])
+    assert result.exit_code == 0
+    assert 'Generation Profile' in result.stderr
+    assert 'Pinyin conversion' in result.stderr
+    assert 'Peak traced memory' not in result.stderr
+
+
+def test_generate_trace_memory(config_file, tmp_path):
+    out = tmp_path / 'out.txt'
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '-o', str(out), '--trace-memory'])
+    assert result.exit_code == 0
+    assert 'Peak traced memory' in result.stderr
+    assert not tracemalloc.is_tracing()
+
+
+def test_generate_metrics_file(config_file, tmp_path):
+    metrics = tmp_path / 'metrics.json'
+    result = runner.invoke(
+        app, [
+            'generate', '-c', str(config_file), '-o', str(tmp_path / 'out.txt'), '--metrics-file', str(metrics),
+        ],
+    )
+    assert result.exit_code == 0
+    data = json.loads(metrics.read_text(encoding='utf-8'))
+    assert data['profiles_done'] == data['profiles_total'] == 2
+    assert data['candidates'] == len((tmp_path / 'out.txt').read_text(encoding='utf-8').splitlines())
+    assert 'generation.finished' in result.stderr
+
+
+def test_generate_pinyin_cache_env(config_file, tmp_path):
+    cache = tmp_path / 'pinyin.tsv'
+    result = runner.invoke(
+        app, ['generate', '-c', str(config_file), '-o', str(tmp_path / 'out.txt')],
+        env={'CCUPP_PINYIN_CACHE': str(cache)},
+    )
+    assert result.exit_code == 0
+    assert cache.read_text(encoding='utf-8').strip()
+
+
+def test_generate_scored(config_file):
+    plain = runner.invoke(app, ['generate', '-c', str(config_file)])
+    scored = runner.invoke(app, ['generate', '-c', str(config_file), '--scored'])
+    assert scored.exit_code == 0
+    assert sorted(scored.stdout.splitlines()) == sorted(plain.stdout.splitlines())
+    assert scored.stdout != plain.stdout
+
+
+def test_generate_budget(config_file):
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--budget', '30'])
+    assert result.exit_code == 0
+    assert 30 < len(result.stdout.splitlines()) <= 60
+
+
+def test_train_order_and_generate_with_weights(config_file, tmp_path):
+    dataset, weights = tmp_path / 'pairs.jsonl', tmp_path / 'weights.json'
+    dataset.write_text(
+        '\n'.join(
+            json.dumps(
+                {
+                    'surname': '李', 'first_name': '二狗', 'birthdate': ['1983', '09', '24'], 'target_password': target,
+                }, ensure_ascii=False,
+            ) for target in ('liergou123', 'liergou123', 'li_19830924')
+        ), encoding='utf-8',
+    )
+    result = runner.invoke(app, ['train-order', str(dataset), '-o', str(weights)])
+    assert result.exit_code == 0
+    assert json.loads(weights.read_text())['suffixes'][0] == '123'
+
+    plain = runner.invoke(app, ['generate', '-c', str(config_file)])
+    tuned = runner.invoke(app, ['generate', '-c', str(config_file), '--weights', str(weights)])
+    assert tuned.exit_code == 0
+    assert tuned.stdout != plain.stdout
+
+
+def test_generate_invalid_weights(config_file, tmp_path):
+    path = tmp_path / 'weights.json'
+    path.write_text('not json')
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--weights', str(path)])
+    assert result.exit_code == 1
+    assert result.stdout == ''
+
+
+def test_train_ngram_and_generate_with_model(config_file, tmp_path):
+    wordlist, model = tmp_path / 'list.txt', tmp_path / 'ngram.bin'
+    wordlist.write_text('\n'.join(['liergou!', 'woaini1314', 'password'] * 10), encoding='utf-8')
+    result = runner.invoke(app, ['train-ngram', str(wordlist), '-o', str(model), '--order', '2'])
+    assert result.exit_code == 0
+    assert model.exists()
+
+    plain = runner.invoke(app, ['generate', '-c', str(config_file)])
+    reranked = runner.invoke(app, ['generate', '-c', str(config_file), '--ngram-model', str(model)])
+    assert reranked.exit_code == 0
+    assert sorted(reranked.stdout.splitlines()) == sorted(plain.stdout.splitlines())
+    assert reranked.stdout != plain.stdout
+
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--ngram-model', str(model), '--scored'])
+    assert result.exit_code == 1
+
+
+def test_mine_affixes_and_generate_with_them(config_file, tmp_path):
+    wordlist, affixes = tmp_path / 'list.txt', tmp_path / 'affixes.json'
+    wordlist.write_text('\n'.join(['liergou2024', 'wang2024', 'li~520', 'abc~2024', 'xyz~1']), encoding='utf-8')
+    result = runner.invoke(app, ['mine-affixes', str(wordlist), '-o', str(affixes), '--memory', '1M'])
+    assert result.exit_code == 0
+    mined = json.loads(affixes.read_text(encoding='utf-8'))
+    assert next(iter(mined['suffixes'])) == '2024'
+    assert next(iter(mined['delimiters'])) == '~'
+
+    result = runner.invoke(app, ['generate', '-c', str(config_file), '--affixes', str(affixes)])
+    assert result.exit_code == 0
+    assert 'liergou2024' in result.stdout.splitlines()
+
+
+def test_mine_affixes_invalid_memory(tmp_path):
+    wordlist = tmp_path / 'list.txt'
+    wordlist.write_text('abc123\n')
+    result = runner.invoke(app, ['mine-affixes', str(wordlist), '--memory', 'lots'])
+    assert result.exit_code == 1
+
+
+def test_write_passwords_surfaces_writer_error(tmp_path):
+    """A writer that cannot be created raises its own error, and the checkpoint still saves."""
+    checkpoint_path = tmp_path / 'ckpt.json'
+    progress = ProgressTracker(1)
+    with pytest.raises(ValueError, match='Unknown output format'):
+        _write_passwords(
+            iter(['a']), 'xml', str(tmp_path / 'out'), False, Checkpoint(), str(checkpoint_path), None, progress,
+        )
+    assert checkpoint_path.exists()
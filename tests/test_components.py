@@ -1,5 +1,6 @@
 """Tests for component extraction."""
 from ccupp.extractors.components import extract_components
+from ccupp.extractors.components import LazyComponents
 from ccupp.models import Profile
 
 
@@ -38,6 +39,17 @@ class TestExtractComponents:
         assert '0924' in dates
         assert '830924' in dates
 
+    def test_partial_birthdate_components(self):
+        year_only = extract_components(Profile(birthdate=['1990']))['birthdate']
+        assert year_only[:2] == ['1990', '90']
+        assert '19900101' in year_only
+        by_range = extract_components(Profile(birth_year_range=(1988, 1992)))['birthdate']
+        assert by_range[:4] == ['1990', '90', '1989', '89']
+        by_age = extract_components(Profile(age=30))['birthdate']
+        assert len(by_age[0]) == 4 and by_age[0].isdigit()
+        # Unrecognised partial dates are used as-is
+        assert extract_components(Profile(birthdate=['90']))['birthdate'] == ['90']
+
     def test_hometown_components(self, sample_profile):
         components = extract_components(sample_profile)
         assert 'hometowns' in components
@@ -82,3 +94,23 @@ class TestExtractComponents:
         components = extract_components(sample_profile)
         for category, values in components.items():
             assert len(values) == len(set(values)), f'Duplicates in {category}'
+
+
+class TestLazyComponents:
+    def test_matches_eager_extraction(self, sample_profile, minimal_profile, empty_profile):
+        for profile in (sample_profile, minimal_profile, empty_profile):
+            lazy = LazyComponents(profile)
+            assert list(lazy) == list(extract_components(profile))
+            assert dict(lazy) == extract_components(profile)
+
+    def test_blank_fields_have_no_category(self):
+        lazy = LazyComponents(Profile(hometowns=[''], places=[['']]))
+        assert 'hometowns' not in lazy
+        assert 'places' not in lazy
+
+    def test_extracts_on_first_access(self, sample_profile):
+        lazy = LazyComponents(sample_profile)
+        assert 'workplaces' in lazy
+        assert lazy._values == {}
+        assert 'tengxun' in lazy['workplaces']
+        assert list(lazy._values) == ['workplaces']
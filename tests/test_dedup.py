@@ -0,0 +1,106 @@
+"""Tests for the deduplication backends."""
+import pytest
+
+from ccupp.dedup import BloomFilter
+from ccupp.dedup import CuckooFilter
+from ccupp.dedup import ExactDedup
+from ccupp.dedup import ExternalDedup
+from ccupp.dedup import make_deduplicator
+from ccupp.dedup import parse_size
+
+ITEMS = [f'pw{i}' for i in range(5000)]
+
+
+@pytest.mark.parametrize(
+    'dedup', [
+        ExactDedup(),
+        BloomFilter(memory=64 << 10, fp_rate=1e-6),
+        CuckooFilter(memory=64 << 10, fp_rate=1e-4),
+    ], ids=['exact', 'bloom', 'cuckoo'],
+)
+def test_drops_duplicates(dedup):
+    assert dedup.filter_new(ITEMS) == ITEMS
+    assert dedup.filter_new(ITEMS[::7]) == []
+    assert not dedup.add('pw42')
+    assert dedup.add('brand-new')
+    assert len(dedup) == len(ITEMS) + 1
+
+
+def test_duplicates_within_one_batch():
+    assert ExactDedup().filter_new(['a', 'b', 'a', 'c', 'b']) == ['a', 'b', 'c']
+    assert BloomFilter(memory=1024).filter_new(['a', 'b', 'a']) == ['a', 'b']
+
+
+def test_bloom_false_positive_rate():
+    bloom = BloomFilter(memory=16 << 10, fp_rate=1e-3)
+    inserted = [f'in{i}' for i in range(bloom.capacity)]
+    bloom.filter_new(inserted)
+    probes = [f'out{i}' for i in range(20_000)]
+    false_positives = sum(1 for pw in probes if pw in bloom)
+    assert false_positives / len(probes) < 3e-3
+
+
+def test_cuckoo_overflow_is_counted():
+    cuckoo = CuckooFilter(memory=64, fp_rate=1e-2)
+    cuckoo.filter_new(ITEMS[:500])
+    assert cuckoo.overflowed > 0
+
+
+def test_filters_are_deterministic():
+    first = BloomFilter(memory=256, fp_rate=0.1).filter_new(ITEMS)
+    second = BloomFilter(memory=256, fp_rate=0.1).filter_new(ITEMS)
+    assert first == second
+
+
+@pytest.mark.parametrize(
+    'backend, memory', [
+        (BloomFilter, 0), (BloomFilter, -1), (CuckooFilter, 0), (CuckooFilter, 3),
+    ],
+)
+def test_filters_reject_too_little_memory(backend, memory):
+    with pytest.raises(ValueError):
+        backend(memory=memory)
+
+
+def test_make_deduplicator():
+    assert isinstance(make_deduplicator('exact'), ExactDedup)
+    assert isinstance(make_deduplicator('bloom', memory=1024), BloomFilter)
+    assert isinstance(make_deduplicator('cuckoo', memory=1024), CuckooFilter)
+    with pytest.raises(ValueError):
+        make_deduplicator('hyperloglog')
+
+
+@pytest.mark.parametrize(
+    'text, size', [
+        ('256M', 256 << 20), ('1G', 1 << 30), ('64k', 64 << 10), ('512MiB', 512 << 20),
+        ('4096', 4096), ('1.5K', 1536),
+    ],
+)
+def test_parse_size(text, size):
+    assert parse_size(text) == size
+
+
+@pytest.mark.parametrize('text', ['', 'M', 'lots', '-1M', '0', 'inf', 'nan', '1e400', '-infG'])
+def test_parse_size_invalid(text):
+    with pytest.raises(ValueError):
+        parse_size(text)
+
+
+class TestExternalDedup:
+    STREAM = [f'pw{i % 700}' for i in range(0, 3000, 3)] + ITEMS[::-1] + ['李', 'pw1', '']
+
+    def test_in_memory_fast_path(self):
+        dedup = ExternalDedup(memory=1 << 30)
+        for item in self.STREAM:
+            dedup.add(item)
+        assert list(dedup) == list(dict.fromkeys(self.STREAM))
+        assert dedup.spilled_runs == 0
+
+    def test_spilled_output_matches_set(self, tmp_path, monkeypatch):
+        monkeypatch.setattr('ccupp.dedup.MAX_MERGE_FANIN', 4)
+        dedup = ExternalDedup(memory=4096, temp_dir=tmp_path)
+        for item in self.STREAM:
+            dedup.add(item)
+        assert list(dedup) == list(dict.fromkeys(self.STREAM))
+        assert dedup.spilled_runs > 4
+        assert list(tmp_path.iterdir()) == []
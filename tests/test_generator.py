@@ -1,6 +1,12 @@
 """Tests for the password generator."""
+import pytest
+
 from ccupp.extractors.components import extract_components
+from ccupp.generator import FAMILIES
 from ccupp.generator import PasswordGenerator
+from ccupp.generator import PlanNode
+from ccupp.generator import shard_of
+from ccupp.policy import PasswordPolicy
 
 
 class TestPasswordGenerator:
@@ -77,3 +83,162 @@ class TestPasswordGenerator:
         assert 'test' in passwords
         assert 'test123' in passwords
         assert 'Test' in passwords
+
+
+class TestCompiledPlan:
+    def test_plan_expands_to_generate_output(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        expanded = [pw for node in gen.compile() for pw in node.expand()]
+        deduped = list(dict.fromkeys(pw for pw in expanded if pw))
+        assert deduped == list(gen.generate())
+
+    def test_plan_follows_family_priority(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        ranks = [FAMILIES.index(node.family) for node in gen.compile()]
+        assert ranks == sorted(ranks)
+        assert set(ranks) == set(range(len(FAMILIES)))
+
+    def test_plan_node_join_orders(self):
+        node = PlanNode('name_date', (('li',), ('83', '0924'), ('', '_')), ((0, 2, 1), (1, 2, 0)))
+        assert node.expand() == [
+            'li83', '83li', 'li_83', '83_li',
+            'li0924', '0924li', 'li_0924', '0924_li',
+        ]
+        assert len(node) == 8
+
+    def test_plan_node_generic_kernel(self):
+        node = PlanNode('custom', (('a', 'b'), ('1',), ('x', 'y')), ((2, 0, 1),))
+        assert node.expand() == ['xa1', 'ya1', 'xb1', 'yb1']
+        assert PlanNode('custom', (('a',), ('1',), ('x',))).expand() == ['a1x']
+
+    def test_plan_skips_empty_products(self):
+        gen = PasswordGenerator(components={'name': ['li']}, suffixes=[''], prefixes=[''])
+        assert all(len(node) > 0 for node in gen.compile())
+
+
+class TestLimit:
+    def test_limit_is_prefix_of_full_output(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        full = list(gen.generate())
+        for limit in (1, 7, 500, len(full)):
+            assert list(gen.generate(limit=limit)) == full[:limit]
+
+    def test_limit_larger_than_output(self):
+        gen = PasswordGenerator(components={'name': ['li']})
+        assert list(gen.generate(limit=10**9)) == list(gen.generate())
+
+
+class TestEstimate:
+    def test_exact_before_dedup(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        raw = [(node.family, pw) for node in gen.compile() for pw in node.expand()]
+        estimate = gen.estimate(min_length=8, max_length=12)
+        for family in FAMILIES:
+            expanded = [pw for fam, pw in raw if fam == family]
+            assert estimate.families[family].candidates == len(expanded)
+            assert estimate.families[family].in_length == sum(1 for pw in expanded if 8 <= len(pw) <= 12)
+
+    def test_bounds_unique_output(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        estimate = gen.estimate()
+        assert len(list(gen.generate())) <= estimate.max_unique <= estimate.candidates
+
+    def test_disabled_families_are_zero(self):
+        gen = PasswordGenerator(components={'name': ['li']}, enable_keyboard_patterns=False)
+        assert gen.estimate().families['keyboard_patterns'].candidates == 0
+
+    @pytest.mark.parametrize('scored', [False, True])
+    def test_budget_caps_unique_bound(self, sample_profile, scored):
+        gen = PasswordGenerator(components=extract_components(sample_profile), budget=50, scored=scored)
+        estimate = gen.estimate()
+        emitted = list(gen.generate())
+        assert len(emitted) <= estimate.max_unique <= 50
+        for fam in estimate.families.values():
+            assert fam.max_unique <= 50
+
+
+class TestSharding:
+    def test_shards_partition_the_output(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        full = list(gen.generate())
+        shards = [list(gen.generate(shard_index=i, num_shards=3)) for i in range(3)]
+        assert sum(len(s) for s in shards) == len(full)
+        assert set().union(*shards) == set(full)
+        for i, shard in enumerate(shards):
+            # Each shard is the full output restricted to its slice, in order
+            assert shard == [pw for pw in full if shard_of(pw, 3) == i]
+
+    def test_invalid_shard(self):
+        gen = PasswordGenerator(components={})
+        with pytest.raises(ValueError):
+            list(gen.generate(shard_index=3, num_shards=3))
+
+
+class TestRandomAccess:
+    def test_candidate_at_matches_plan(self, sample_profile):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        raw = [pw for node in gen.compile() for pw in node.expand()]
+        assert gen.plan_size() == len(raw)
+        for i in range(0, len(raw), 97):
+            assert gen.candidate_at(i) == raw[i]
+        assert gen.candidate_at(len(raw) - 1) == raw[-1]
+
+    def test_candidate_at_out_of_range(self, minimal_profile):
+        gen = PasswordGenerator(components=extract_components(minimal_profile))
+        with pytest.raises(IndexError):
+            gen.candidate_at(gen.plan_size())
+        with pytest.raises(IndexError):
+            gen.candidate_at(-1)
+
+    @pytest.mark.parametrize('start', [0, 1, 250, 5000])
+    def test_generate_from_start(self, sample_profile, start):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        raw = [pw for node in gen.compile() for pw in node.expand()]
+        seen = {''}
+        expected = [pw for pw in raw[start:] if not (pw in seen or seen.add(pw))]
+        assert list(gen.generate(start=start)) == expected
+
+    def test_negative_start(self):
+        gen = PasswordGenerator(components={})
+        with pytest.raises(ValueError):
+            list(gen.generate(start=-1))
+
+
+class TestBatches:
+    @pytest.mark.parametrize('batch_size', [1, 1000, 100000])
+    def test_batches_match_generate(self, sample_profile, batch_size):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        expected = list(gen.generate(limit=2500))
+        batches = list(gen.generate_batches(batch_size, limit=2500))
+        assert all(batch.count(b'\n') == batch_size for batch in batches[:-1])
+        assert b''.join(batches) == ''.join(pw + '\n' for pw in expected).encode('utf-8')
+
+
+class TestPolicyPushDown:
+    POLICIES = [
+        PasswordPolicy(min_length=8, max_length=16),
+        PasswordPolicy(max_length=6),
+        PasswordPolicy(min_length=8, required=frozenset({'upper', 'digit'})),
+        PasswordPolicy(required=frozenset({'special'}), forbidden='_'),
+        PasswordPolicy(min_length=6, pattern=r'\d{4}$'),
+    ]
+
+    @pytest.mark.parametrize('policy', POLICIES)
+    def test_nodes_expand_exactly_the_accepted_candidates(self, sample_profile, policy):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        for node in gen.compile():
+            assert node.expand_within(policy) == [pw for pw in node.expand() if policy.accepts(pw)]
+
+    def test_general_shape(self):
+        node = PlanNode('x', (('a', 'B1'), ('', '_', 'cc'), ('2', '')), ((2, 0, 1), (0, 1, 2)))
+        policy = PasswordPolicy(min_length=3, max_length=4, required=frozenset({'digit'}))
+        assert node.expand_within(policy) == [pw for pw in node.expand() if policy.accepts(pw)]
+
+    @pytest.mark.parametrize('policy', POLICIES)
+    def test_generate_with_policy(self, sample_profile, policy):
+        gen = PasswordGenerator(components=extract_components(sample_profile))
+        expected = [pw for pw in gen.generate() if policy.accepts(pw)]
+        assert list(gen.generate(policy=policy)) == expected
+        assert list(gen.generate(policy=policy, start=300)) == [
+            pw for pw in gen.generate(start=300) if policy.accepts(pw)
+        ]
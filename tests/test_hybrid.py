@@ -0,0 +1,133 @@
+"""Tests for hashcat hybrid (word list + mask) export."""
+from itertools import product
+
+import pytest
+
+from ccupp import generate_hybrid
+from ccupp.extractors.components import LazyComponents
+from ccupp.generator import PasswordGenerator
+from ccupp.generator import PlanNode
+from ccupp.hybrid import covers
+from ccupp.hybrid import HybridAttack
+from ccupp.hybrid import keyspace
+from ccupp.hybrid import mask_line
+from ccupp.hybrid import range_masks
+from ccupp.hybrid import shape_mask
+
+
+@pytest.mark.parametrize(
+    ('low', 'high', 'width'), [
+        (1940, 2030, 0), (0, 30, 2), (40, 99, 2), (7, 1234, 0), (1999, 2000, 0), (5, 5, 0),
+    ],
+)
+def test_range_masks_cover_exactly(low, high, width):
+    expanded = [''.join(p) for mask in range_masks(low, high, width) for p in product(*mask)]
+    expected = [str(n).zfill(width) for n in range(low, high + 1)]
+    assert sorted(expanded) == sorted(expected)
+
+
+def test_mask_line_escapes():
+    assert mask_line(shape_mask('Ab1!')) == '?u?l?d?s'
+    assert mask_line(tuple('a,b')) == 'a\\,b'
+    assert mask_line(tuple('#1')) == '\\#1'
+
+
+def _covered(password: str, attack: HybridAttack) -> bool:
+    """Whether stem + append mask, prepend mask + stem or a joined word yields ``password``."""
+    if password in attack.joined:
+        return True
+    for word in attack.words:
+        if password.startswith(word) and any(
+            covers(m, password[len(word):]) for m in attack.append_masks
+        ):
+            return True
+        if password.endswith(word) and any(
+            covers(m, password[:-len(word)]) for m in attack.prepend_masks
+        ):
+            return True
+    return False
+
+
+def test_hybrid_covers_tail_families(sample_profile):
+    attack = generate_hybrid(sample_profile)
+    stems = set(attack.words)
+    generator = PasswordGenerator(components=LazyComponents(sample_profile))
+    checked = 0
+    for node in generator.compile():
+        if node.family not in ('single_component_suffixed', 'name_date', 'name_id', 'cultural_numbers'):
+            continue
+        # Only the stem values; digit components as words are not exported
+        slots = tuple(
+            tuple(v for v in slot if v in stems) if i == 0 else slot
+            for i, slot in enumerate(node.slots)
+        )
+        if node.family == 'single_component_suffixed' and len(slots) == 2 and not slots[0]:
+            continue  # prefix + value
+        for password in PlanNode(node.family, slots, node.orders).expand():
+            if password in stems:
+                continue  # a straight run of the word list
+            assert _covered(password, attack), password
+            checked += 1
+    assert checked > 1000
+    # Years beyond the profile's are covered by range masks
+    assert _covered('li1975', attack)
+    assert _covered('2001_li', attack)
+
+
+def test_hybrid_is_compact(sample_profile):
+    attack = generate_hybrid(sample_profile)
+    assert '' not in attack.words
+    assert len(set(attack.words)) == len(attack.words)
+    assert not {'1983', '13512345678'} & set(attack.words)
+    spaces = [keyspace(m) for m in attack.append_masks]
+    assert spaces == sorted(spaces)
+    # A literal tail a wider mask already covers is dropped
+    assert tuple('1983') not in attack.append_masks
+
+
+def test_hybrid_options(sample_profile):
+    full = generate_hybrid(sample_profile)
+    lucky = tuple('520')
+    assert lucky in full.prepend_masks
+    assert lucky not in generate_hybrid(sample_profile, enable_cultural_numbers=False).prepend_masks
+    assert len(generate_hybrid(sample_profile, enable_case_variants=False).words) < len(full.words)
+    narrow = generate_hybrid(sample_profile, years=(1980, 1989), delimiters=[''])
+    lines = {mask_line(m) for m in narrow.prepend_masks}
+    assert {'198?d', '8?d'} <= lines
+    assert '456789,19?1?d' not in lines
+
+
+def test_hybrid_tails_are_literal_unless_widened(sample_profile):
+    literal = generate_hybrid(sample_profile)
+    assert tuple('123456') in literal.append_masks
+    assert shape_mask('123456') not in literal.append_masks
+    widened = generate_hybrid(sample_profile, widen_tails=True)
+    assert shape_mask('123456') in widened.append_masks
+    assert shape_mask('520') in widened.prepend_masks
+
+
+def test_hybrid_scopes_profile_tails(sample_profile, minimal_profile):
+    single = [generate_hybrid(p) for p in (sample_profile, minimal_profile)]
+    both = generate_hybrid([sample_profile, minimal_profile])
+    # Shared masks only, so adding a profile adds no masks of its own tails
+    assert set(both.append_masks) == set(single[0].append_masks) | set(single[1].append_masks)
+    assert not any(covers(m, '_13512345678') for m in both.append_masks)
+    assert set(both.joined) == set(single[0].joined) | set(single[1].joined)
+    assert 'li_5678' in both.joined
+    minimal_stems = set(single[1].words) - set(single[0].words)
+    assert minimal_stems
+    assert not any(f'{stem}_5678' in both.joined for stem in minimal_stems)
+
+
+def test_hybrid_write(sample_profile, minimal_profile, tmp_path):
+    attack = generate_hybrid([sample_profile, minimal_profile])
+    paths = [
+        tmp_path / 'words.txt', tmp_path / 'words.append.hcmask',
+        tmp_path / 'words.prepend.hcmask', tmp_path / 'words.joined.txt',
+    ]
+    attack.write(*paths)
+    assert paths[0].read_text(encoding='utf-8').splitlines() == attack.words
+    assert paths[1].read_text(encoding='utf-8').splitlines() == [mask_line(m) for m in attack.append_masks]
+    assert paths[3].read_text(encoding='utf-8').splitlines() == attack.joined
+    # '#' + tail masks must not read as comments
+    assert any(line.startswith('\\#') for line in paths[1].read_text(encoding='utf-8').splitlines())
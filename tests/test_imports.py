@@ -0,0 +1,64 @@
+"""Import-time regression tests: heavy dependencies load only when used.
+
+Each check runs in a fresh interpreter, since the test session itself has
+long since imported everything.
+"""
+import subprocess
+import sys
+
+import pytest
+
+import ccupp
+
+HEAVY_MODULES = ('pypinyin', 'pydantic', 'yaml', 'structlog', 'rich', 'ccupp.generator')
+
+
+def _loaded_after(code: str) -> set[str]:
+    """Heavy modules present in ``sys.modules`` after running ``code``."""
+    script = f'{code}\nimport sys\nprint(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])'
+    result = subprocess.run(
+        [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_import_ccupp_is_light():
+    """``import ccupp`` loads none of the generation engine or its dependencies."""
+    assert _loaded_after('import ccupp') == set()
+
+
+def test_cli_import_is_light():
+    """Importing the CLI (what ``ccupp --help`` does first) defers the heavy imports."""
+    assert _loaded_after('import ccupp.__main__') == set()
+
+
+def test_public_name_loads_on_access():
+    """Touching a public name imports its module, and only what that needs."""
+    loaded = _loaded_after('import ccupp; ccupp.GenerationStats')
+    assert loaded == set()
+    loaded = _loaded_after('import ccupp; ccupp.Profile')
+    assert 'pydantic' in loaded
+    assert 'pypinyin' not in loaded
+
+
+def test_pypinyin_loads_only_when_needed():
+    """ASCII words and words in the compact table skip pypinyin; others load it."""
+    ascii_only = 'from ccupp.transforms.pinyin import to_pinyin; to_pinyin("wang")'
+    assert 'pypinyin' not in _loaded_after(ascii_only)
+    common = 'from ccupp.transforms.pinyin import to_pinyin; to_pinyin("李明")'
+    assert 'pypinyin' not in _loaded_after(common)
+    polyphonic = 'from ccupp.transforms.pinyin import to_pinyin; to_pinyin("重庆")'
+    assert 'pypinyin' in _loaded_after(polyphonic)
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError, match='no_such_name'):
+        ccupp.no_such_name
+
+
+def test_dir_lists_lazy_names():
+    assert set(ccupp.__all__) <= set(dir(ccupp))
+
+
+def test_all_matches_lazy_exports():
+    assert sorted(ccupp.__all__) == sorted(ccupp._EXPORTS)
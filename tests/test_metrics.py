@@ -0,0 +1,56 @@
+"""Tests for progress metrics."""
+import json
+
+from ccupp.dedup import ExactDedup
+from ccupp.metrics import ProgressTracker
+from ccupp.metrics import prometheus_text
+from ccupp.metrics import rss_bytes
+from ccupp.metrics import write_metrics
+
+
+def test_prometheus_text_skips_unknown_and_missing():
+    text = prometheus_text({'profiles_done': 3, 'eta_seconds': None, 'other': 1, 'rss_bytes': 123456789})
+    assert text.splitlines() == [
+        '# HELP ccupp_profiles_done Profiles generation has reached.',
+        '# TYPE ccupp_profiles_done gauge',
+        'ccupp_profiles_done 3',
+        '# HELP ccupp_rss_bytes Resident set size of the generating process.',
+        '# TYPE ccupp_rss_bytes gauge',
+        'ccupp_rss_bytes 123456789',
+    ]
+
+
+def test_write_metrics_format_by_suffix(tmp_path):
+    write_metrics(tmp_path / 'm.prom', {'candidates': 5})
+    write_metrics(tmp_path / 'm.json', {'candidates': 5})
+    assert 'ccupp_candidates_written_total 5' in (tmp_path / 'm.prom').read_text(encoding='utf-8')
+    assert json.loads((tmp_path / 'm.json').read_text(encoding='utf-8')) == {'candidates': 5}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['m.json', 'm.prom']
+
+
+def test_tracker_is_rate_limited():
+    events = []
+    dedup = ExactDedup()
+    dedup.filter_new(['a', 'b'])
+    tracker = ProgressTracker(4, lambda event, **kw: events.append((event, kw)), interval=3600, dedup=dedup)
+    for _ in range(3):
+        tracker.profile_started()
+    tracker.written(10)
+    assert events == []
+    snapshot = tracker.report('generation.finished')
+    assert events == [('generation.finished', snapshot)]
+    assert (snapshot['profiles_done'], snapshot['candidates'], snapshot['dedup_size']) == (3, 10, 2)
+    assert snapshot['eta_seconds'] is not None
+
+
+def test_tracker_reports_each_interval(tmp_path):
+    events = []
+    tracker = ProgressTracker(2, lambda event, **kw: events.append(event), interval=1e-9, metrics_file=tmp_path / 'm.json')
+    tracker.profile_started()
+    tracker.written(1)
+    assert events == ['generation.progress'] * 2
+    assert json.loads((tmp_path / 'm.json').read_text(encoding='utf-8'))['candidates'] == 1
+
+
+def test_rss_bytes():
+    assert rss_bytes() > 0
@@ -23,6 +23,26 @@ class TestProfile:
         assert p.birthdate == ('1990', '01', '15')
         assert isinstance(p.birthdate, tuple)
 
+    def test_partial_birthdate_fields(self):
+        p = Profile(birth_year_range=[1988, 1992], age='30')
+        assert p.birth_year_range == (1988, 1992)
+        assert p.age == 30
+        with pytest.raises(ValidationError):
+            Profile(age=-1)
+
+    @pytest.mark.parametrize(
+        'kwargs', [
+            {'age': 151},
+            {'age': 2030},
+            {'birth_year_range': (0, 10)},
+            {'birth_year_range': (1992, 1988)},
+            {'birth_year_range': (1, 10**7)},
+        ],
+    )
+    def test_partial_birthdate_fields_rejected(self, kwargs):
+        with pytest.raises(ValidationError):
+            Profile(**kwargs)
+
     def test_normalize_nested_lists(self):
         p = Profile(places=[['北京', '海淀']])
         assert p.places == [['北京', '海淀']]
@@ -0,0 +1,118 @@
+"""Tests for the character n-gram model and per-family reordering."""
+import math
+import pickle
+
+import pytest
+
+from ccupp.extractors.components import extract_components
+from ccupp.generator import PasswordGenerator
+from ccupp.ngram import encode
+from ccupp.ngram import NgramModel
+from ccupp.ngram import SYMBOLS
+from ccupp.stats import GenerationStats
+
+TRAINING = ['li123456', 'liwei123', 'wang520', 'password123', 'iloveyou', 'woaini1314'] * 20
+
+
+@pytest.fixture(scope='module')
+def model():
+    return NgramModel.train(TRAINING)
+
+
+def _generator(profile, **kwargs):
+    return PasswordGenerator(components=extract_components(profile), **kwargs)
+
+
+def _families(gen):
+    """Each family's generated passwords, in generation order."""
+    stats = GenerationStats()
+    passwords = list(gen.generate(stats=stats))
+    families, start = {}, 0
+    for family, fam in stats.families.items():
+        families[family] = passwords[start:start + fam.emitted]
+        start += fam.emitted
+    return families
+
+
+class TestNgramModel:
+    @pytest.mark.parametrize('order', [2, 3])
+    def test_batch_matches_one_by_one(self, order):
+        model = NgramModel.train(TRAINING, order)
+        batch = ['', 'li', 'liwei123', 'zzz!é', 'password']
+        assert model.score(batch) == [model.score([pw])[0] for pw in batch]
+
+    def test_batch_matches_definition(self, model):
+        # Sum of the costs of each n-gram, end of password included
+        size = SYMBOLS ** 3
+        index = cost = 0
+        for symbol in encode('liwei1') + b'\0':
+            index = (index * SYMBOLS + symbol) % size
+            cost += model.costs[index]
+        assert model.score(['liwei1']) == [pytest.approx(-0.1 * cost)]
+
+    def test_human_like_first(self, model):
+        assert model.rank(['liqz!', 'li123', 'lq!z1']) == ['li123', 'liqz!', 'lq!z1']
+
+    def test_rank_is_stable(self, model):
+        a, b = model.score(['zq', 'qz'])
+        assert a == b
+        assert model.rank(['zq', 'qz', 'zq']) == ['zq', 'qz', 'zq']
+
+    def test_continuations_sum_to_one(self, model):
+        # The start context's distribution, up to quantisation
+        total = sum(math.exp(-0.1 * model.costs[i]) for i in range(SYMBOLS))
+        assert total == pytest.approx(1.0, abs=0.05)
+
+    def test_save_load_round_trip(self, model, tmp_path):
+        path = tmp_path / 'ngram.bin'
+        model.save(path)
+        loaded = NgramModel.load(path)
+        assert loaded.order == 3 and loaded.passwords == len(TRAINING)
+        assert loaded.score(['liwei123', 'zq']) == model.score(['liwei123', 'zq'])
+
+    def test_pickles(self, model, tmp_path):
+        path = tmp_path / 'ngram.bin'
+        model.save(path)
+        for m in (model, NgramModel.load(path)):
+            assert pickle.loads(pickle.dumps(m)).score(['wang520']) == m.score(['wang520'])
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'ngram.bin'
+        path.write_bytes(b'not a model')
+        with pytest.raises(ValueError, match='n-gram model'):
+            NgramModel.load(path)
+
+    def test_order_out_of_range(self):
+        with pytest.raises(ValueError, match='order'):
+            NgramModel.train(TRAINING, 5)
+
+
+class TestReordering:
+    def test_same_passwords_per_family(self, sample_profile, model):
+        plain = _families(_generator(sample_profile))
+        reranked = _families(_generator(sample_profile, ngram=model))
+        assert list(reranked) == list(plain)
+        for family, passwords in plain.items():
+            assert sorted(reranked[family]) == sorted(passwords)
+
+    def test_each_family_by_score(self, sample_profile, model):
+        for passwords in _families(_generator(sample_profile, ngram=model)).values():
+            scores = model.score(passwords)
+            assert scores == sorted(scores, reverse=True)
+
+    @pytest.mark.parametrize('budget', [0, 300])
+    def test_limit_is_a_prefix(self, sample_profile, model, budget):
+        full = list(_generator(sample_profile, ngram=model, budget=budget).generate())
+        stats = GenerationStats()
+        limited = list(_generator(sample_profile, ngram=model, budget=budget).generate(limit=40, stats=stats))
+        assert limited == full[:40]
+        assert sum(fam.emitted for fam in stats.families.values()) == 40
+
+    def test_budget_keeps_quota_choice(self, sample_profile, model):
+        plain = list(_generator(sample_profile, budget=300).generate())
+        reranked = list(_generator(sample_profile, budget=300, ngram=model).generate())
+        assert sorted(reranked) == sorted(plain)
+
+    def test_not_with_scored(self, sample_profile, model):
+        with pytest.raises(ValueError, match='scored'):
+            _generator(sample_profile, ngram=model, scored=True)
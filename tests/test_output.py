@@ -0,0 +1,69 @@
+"""Tests for the streaming password writers."""
+import io
+import json
+
+import pytest
+
+from ccupp.output import encode_batches
+from ccupp.output import JsonArrayWriter
+from ccupp.output import JsonLinesWriter
+from ccupp.output import open_writer
+from ccupp.output import TextWriter
+
+PASSWORDS = ['li1983', '李二狗', 'qu"ote', 'back\\slash']
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 8192])
+def test_json_array_matches_json_dump(batch_size):
+    stream = io.BytesIO()
+    with JsonArrayWriter(stream, batch_size=batch_size) as writer:
+        for pw in PASSWORDS:
+            writer.write(pw)
+    expected = json.dumps(PASSWORDS, ensure_ascii=False, indent=2) + '\n'
+    assert stream.getvalue().decode('utf-8') == expected
+    assert writer.count == len(PASSWORDS)
+
+
+def test_json_array_empty():
+    stream = io.BytesIO()
+    JsonArrayWriter(stream).close()
+    assert stream.getvalue() == b'[]\n'
+
+
+@pytest.mark.parametrize('batch_size', [1, 3, 8192])
+def test_text_writer(batch_size):
+    stream = io.BytesIO()
+    with TextWriter(stream, batch_size=batch_size) as writer:
+        for pw in PASSWORDS:
+            writer.write(pw)
+    assert stream.getvalue().decode('utf-8').splitlines() == PASSWORDS
+
+
+def test_json_lines_writer():
+    stream = io.BytesIO()
+    with JsonLinesWriter(stream, batch_size=2) as writer:
+        for pw in PASSWORDS:
+            writer.write(pw)
+    lines = stream.getvalue().decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == PASSWORDS
+
+
+def test_writes_in_batches():
+    stream = io.BytesIO()
+    writer = TextWriter(stream, batch_size=2)
+    writer.write('a')
+    assert stream.getvalue() == b''
+    writer.write('b')
+    assert stream.getvalue() == b'a\nb\n'
+
+
+def test_unknown_format():
+    with pytest.raises(ValueError, match='Unknown output format'):
+        open_writer('xml', io.BytesIO())
+
+
+def test_encode_batches_regroups_blocks():
+    blocks = [['a', 'b', 'c'], [], ['d', '二狗'], ['e'] * 7]
+    batches = list(encode_batches(blocks, batch_size=4))
+    assert [batch.count(b'\n') for batch in batches] == [4, 4, 4]
+    assert b''.join(batches).decode('utf-8').split('\n')[:-1] == [pw for block in blocks for pw in block]
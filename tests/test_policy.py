@@ -0,0 +1,77 @@
+"""Tests for password policies."""
+import pickle
+
+import pytest
+
+from ccupp.policy import char_mask
+from ccupp.policy import DIGIT
+from ccupp.policy import PasswordPolicy
+from ccupp.policy import SPECIAL
+from ccupp.policy import UPPER
+
+
+def test_char_mask():
+    assert char_mask('') == 0
+    assert char_mask('ABC') == UPPER
+    assert char_mask('李1') == SPECIAL | DIGIT
+
+
+@pytest.mark.parametrize(
+    ('password', 'accepted'), [
+        ('Lier1983', True),
+        ('lier1983', False),   # no upper-case letter
+        ('Li1983', False),     # too short
+        ('Lier19831983', False),  # too long
+        ('Lier_1983', False),  # forbidden character
+        ('Lier1983x', False),  # does not match the pattern
+    ],
+)
+def test_accepts(password, accepted):
+    policy = PasswordPolicy(
+        min_length=8, max_length=10, required=frozenset({'upper', 'digit'}), forbidden='_', pattern=r'\d$',
+    )
+    assert policy.accepts(password) is accepted
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        PasswordPolicy(required=frozenset({'emoji'}))
+    with pytest.raises(ValueError):
+        PasswordPolicy(pattern='(')
+
+
+def test_from_options():
+    assert PasswordPolicy.from_options() is None
+    assert PasswordPolicy.from_options(max_length=12) == PasswordPolicy(max_length=12)
+
+
+def test_with_length_tightens():
+    policy = PasswordPolicy(min_length=6, max_length=16).with_length(8, 20)
+    assert (policy.min_length, policy.max_length) == (8, 16)
+    assert PasswordPolicy().with_length(max_length=12).max_length == 12
+
+
+def test_slot_signatures_drop_forbidden_values():
+    policy = PasswordPolicy(forbidden='@')
+    assert policy.slot_signatures(('li', 'l@', '88')) == [('li', 2, 0), ('88', 2, 0)]
+
+
+def test_picklable():
+    policy = PasswordPolicy(min_length=8, pattern='^a')
+    assert pickle.loads(pickle.dumps(policy)) == policy
+
+
+def test_signature_caches_are_bounded(monkeypatch):
+    import ccupp.policy
+
+    monkeypatch.setattr(ccupp.policy, 'SLOT_CACHE_SIZE', 4)
+    policy = PasswordPolicy(required=frozenset({'digit'}))
+    shared = ('!', '123')
+    for i in range(100):
+        policy.slot_signatures((f'name{i}',))
+        policy.slot_signatures(shared)
+    info = policy._slot_signatures.cache_info()
+    assert info.currsize == 4
+    # The shared table stayed cached while the per-profile slots aged out
+    assert info.hits == 99
+    assert policy.slot_signatures(shared) == [('!', 1, SPECIAL), ('123', 3, DIGIT)]
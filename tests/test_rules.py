@@ -0,0 +1,76 @@
+"""Tests for hashcat/JtR rule export."""
+import pytest
+
+from ccupp import generate_passwords
+from ccupp import generate_rules
+from ccupp.rules import append_rule
+from ccupp.rules import prepend_rule
+
+
+def apply_rule(rule: str, word: str) -> str:
+    """Minimal interpreter for the rule functions the exporter emits."""
+    i = 0
+    while i < len(rule):
+        op = rule[i]
+        if op == ':':
+            i += 1
+        elif op == 'u':
+            word, i = word.upper(), i + 1
+        elif op == 't':
+            word, i = word.swapcase(), i + 1
+        elif op == 'T':
+            pos = int(rule[i + 1])
+            if pos < len(word):
+                word = word[:pos] + word[pos].swapcase() + word[pos + 1:]
+            i += 2
+        elif op == '$':
+            word, i = word + rule[i + 1], i + 2
+        elif op == '^':
+            word, i = rule[i + 1] + word, i + 2
+        elif op == 's':
+            word, i = word.replace(rule[i + 1], rule[i + 2]), i + 3
+        else:
+            raise ValueError(f'Unsupported rule function {op!r} in {rule!r}')
+    return word
+
+
+def test_append_and_prepend_rules():
+    assert apply_rule(append_rule('_1983'), 'li') == 'li_1983'
+    assert apply_rule(prepend_rule('1983.'), 'li') == '1983.li'
+
+
+def test_rules_cover_generated_passwords(sample_profile):
+    rule_set = generate_rules(sample_profile)
+    expanded = {apply_rule(rule, word) for word in rule_set.words for rule in rule_set.rules}
+    expanded.update(rule_set.joined)
+    generated = [pw for pw in generate_passwords(sample_profile) if pw.isascii()]
+    assert generated
+    assert set(generated) <= expanded
+    # A keyspace of the order of the expanded list, not a multiple of it
+    assert len(rule_set.words) * len(rule_set.rules) + len(rule_set.joined) < 3 * len(generated)
+
+
+def test_rules_scale_linearly_with_profiles(sample_profile, minimal_profile):
+    single = [generate_rules(p) for p in (sample_profile, minimal_profile)]
+    both = generate_rules([sample_profile, minimal_profile])
+    # Only the shared table rules are applied to every profile's words
+    assert set(both.rules) == set(single[0].rules) | set(single[1].rules)
+    assert set(both.joined) == set(single[0].joined) | set(single[1].joined)
+
+
+@pytest.mark.parametrize('option', ['enable_leetspeak', 'enable_case_variants', 'enable_cultural_numbers'])
+def test_disabled_transforms_have_no_rules(sample_profile, option):
+    full = generate_rules(sample_profile)
+    reduced = generate_rules(sample_profile, **{option: False})
+    assert len(reduced.rules) < len(full.rules)
+    assert set(reduced.rules) <= set(full.rules)
+
+
+def test_rule_set_write(sample_profile, minimal_profile, tmp_path):
+    rule_set = generate_rules([sample_profile, minimal_profile])
+    assert len(set(rule_set.words)) == len(rule_set.words)
+    assert '' not in rule_set.words
+    rule_set.write(tmp_path / 'words.txt', tmp_path / 'words.rule', tmp_path / 'words.joined.txt')
+    assert (tmp_path / 'words.txt').read_text(encoding='utf-8').splitlines() == rule_set.words
+    assert (tmp_path / 'words.rule').read_text(encoding='utf-8').splitlines() == rule_set.rules
+    assert (tmp_path / 'words.joined.txt').read_text(encoding='utf-8').splitlines() == rule_set.joined
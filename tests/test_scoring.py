@@ -0,0 +1,176 @@
+"""Tests for probability-ranked (scored) generation and guess budgets."""
+from collections import Counter
+from itertools import islice
+
+import pytest
+
+from ccupp.extractors.components import extract_components
+from ccupp.generator import PasswordGenerator
+from ccupp.generator import PlanNode
+from ccupp.policy import PasswordPolicy
+from ccupp.scoring import allocate_budget
+from ccupp.scoring import FAMILY_WEIGHTS
+from ccupp.scoring import node_probabilities
+from ccupp.scoring import rank_probabilities
+from ccupp.scoring import ranked_candidates
+from ccupp.scoring import resolve_family_weights
+from ccupp.stats import GenerationStats
+
+
+def _generator(profile, scored=True, **kwargs):
+    return PasswordGenerator(components=extract_components(profile), scored=scored, **kwargs)
+
+
+class TestRankedCandidates:
+    def test_every_plan_position_once(self, sample_profile):
+        plan = PasswordGenerator(components=extract_components(sample_profile)).compile()
+        raw = Counter(pw for node in plan for pw in node.expand())
+        ranked = Counter(pw for _, pw, _ in ranked_candidates(plan))
+        assert ranked == raw
+
+    def test_descending_probabilities(self, sample_profile):
+        plan = PasswordGenerator(components=extract_components(sample_profile)).compile()
+        scores = [score for score, _, _ in ranked_candidates(plan)]
+        assert scores == sorted(scores, reverse=True)
+
+    def test_probabilities_sum_to_one(self, sample_profile):
+        plan = PasswordGenerator(components=extract_components(sample_profile)).compile()
+        assert sum(score for score, _, _ in ranked_candidates(plan)) == pytest.approx(1.0)
+
+    def test_ties_in_plan_order(self):
+        node = PlanNode('single_component_suffixed', (('a', 'b'),))
+        twin = PlanNode('single_component_suffixed', (('c', 'd'),))
+        assert [pw for _, pw, _ in ranked_candidates([node, twin])] == ['a', 'c', 'b', 'd']
+
+    def test_lazy(self):
+        # A product far too large to enumerate up front
+        big = tuple(str(i) for i in range(10_000))
+        node = PlanNode('two_component', (big, big, big))
+        assert [pw for _, pw, _ in islice(ranked_candidates([node]), 2)] == ['000', '001']
+
+    def test_rank_probabilities(self):
+        assert sum(rank_probabilities(30)) == pytest.approx(1.0)
+        assert rank_probabilities(1) == (1.0,)
+
+    def test_node_probabilities_normalised_over_present_families(self):
+        nodes = [
+            PlanNode('name_date', (('a',),)),
+            PlanNode('keyboard_patterns', (('b',),), weight=3.0),
+            PlanNode('keyboard_patterns', (('c',),)),
+        ]
+        probabilities = node_probabilities(nodes, FAMILY_WEIGHTS)
+        mass = FAMILY_WEIGHTS['name_date'] + FAMILY_WEIGHTS['keyboard_patterns']
+        assert probabilities[0] == pytest.approx(FAMILY_WEIGHTS['name_date'] / mass)
+        assert probabilities[1] == pytest.approx(3 * probabilities[2])
+        assert sum(probabilities) == pytest.approx(1.0)
+
+    def test_negative_weight(self):
+        with pytest.raises(ValueError, match='non-negative'):
+            resolve_family_weights({'name_date': -1})
+
+
+class TestScoredGeneration:
+    def test_same_passwords_as_plan_order(self, sample_profile):
+        plain = PasswordGenerator(components=extract_components(sample_profile))
+        scored = list(_generator(sample_profile).generate())
+        assert len(scored) == len(set(scored))
+        assert set(scored) == set(plain.generate())
+
+    def test_families_interleave(self, sample_profile):
+        first = list(_generator(sample_profile).generate(limit=50))
+        # name + birthdate candidates no longer wait for every single-component one
+        assert 'li19830924' in first
+
+    def test_family_weights_override(self, sample_profile):
+        gen = _generator(sample_profile, family_weights={'old_password_variants': 0.0})
+        assert next(gen.generate()) != 'old_password'
+        gen = _generator(sample_profile, family_weights={'keyboard_patterns': 100.0})
+        assert next(gen.generate()) == 'qwerty'
+
+    def test_limit_policy_and_shards(self, sample_profile):
+        policy = PasswordPolicy(min_length=8, required={'digit'})
+        full = list(_generator(sample_profile).generate(policy=policy))
+        assert full and all(policy.accepts(pw) for pw in full)
+        assert list(_generator(sample_profile).generate(limit=7, policy=policy)) == full[:7]
+        shards = [list(_generator(sample_profile).generate(shard_index=i, num_shards=3)) for i in range(3)]
+        merged = list(_generator(sample_profile).generate())
+        assert sorted(sum(shards, [])) == sorted(merged)
+        assert shards[1] == [pw for pw in merged if pw in set(shards[1])]
+
+    @pytest.mark.parametrize('start', [10, 100, 5000])
+    def test_start_counts_emitted_passwords(self, sample_profile, start):
+        full = list(_generator(sample_profile).generate())
+        assert list(_generator(sample_profile).generate(start=start)) == full[start:]
+
+    def test_stats(self, sample_profile):
+        stats = GenerationStats()
+        passwords = list(_generator(sample_profile).generate(stats=stats))
+        assert sum(fam.emitted for fam in stats.families.values()) == len(passwords)
+        assert sum(fam.candidates for fam in stats.families.values()) == _generator(sample_profile).plan_size()
+
+
+class TestAllocateBudget:
+    def test_proportional_with_caps(self):
+        quotas = allocate_budget(100, {'a': 1000, 'b': 10, 'c': 1000}, {'a': 1, 'b': 1, 'c': 2})
+        assert quotas == {'a': 30, 'b': 10, 'c': 60}
+
+    def test_rounding_adds_up(self):
+        quotas = allocate_budget(7, {'a': 100, 'b': 100, 'c': 100}, {'a': 1, 'b': 1, 'c': 1})
+        assert quotas == {'a': 3, 'b': 2, 'c': 2}
+
+    def test_more_budget_than_candidates(self):
+        assert allocate_budget(50, {'a': 3, 'b': 4}, {'a': 1, 'b': 9}) == {'a': 3, 'b': 4}
+
+    def test_zero_weight_gets_leftovers_only(self):
+        assert allocate_budget(10, {'a': 100, 'b': 100}, {'a': 1, 'b': 0}) == {'a': 10, 'b': 0}
+        assert allocate_budget(10, {'a': 4, 'b': 100}, {'a': 1, 'b': 0}) == {'a': 4, 'b': 6}
+
+
+class TestBudget:
+    @pytest.mark.parametrize('scored', [False, True])
+    def test_families_stop_at_quota(self, sample_profile, scored):
+        gen = _generator(sample_profile, scored=scored, budget=300)
+        quotas = gen.budget_quotas()
+        assert sum(quotas.values()) == 300
+        stats = GenerationStats()
+        passwords = list(gen.generate(stats=stats))
+        assert len(passwords) == len(set(passwords)) <= 300
+        for family, fam in stats.families.items():
+            if scored:
+                assert fam.emitted <= quotas[family]
+            assert fam.emitted > 0
+
+    def test_unused_quota_rolls_over(self, sample_profile):
+        # Dedup leaves some families short; later ones make up for it
+        passwords = list(_generator(sample_profile, scored=False, budget=2000).generate())
+        assert len(passwords) == 2000
+
+    def test_lifts_top_n_cuts(self, sample_profile):
+        plain = PasswordGenerator(components=extract_components(sample_profile))
+        budgeted = _generator(sample_profile, scored=False, budget=10)
+        assert budgeted.plan_size() > plain.plan_size()
+
+    def test_order_within_family(self, sample_profile):
+        # Families keep their order; each starts with its likeliest candidates
+        passwords = list(_generator(sample_profile, scored=False, budget=100).generate())
+        assert passwords[0] == 'old_password'
+        assert 'li19830924' in passwords
+
+    def test_limit_and_budget(self, sample_profile):
+        full = list(_generator(sample_profile, scored=False, budget=500).generate())
+        assert list(_generator(sample_profile, scored=False, budget=500).generate(limit=40)) == full[:40]
+
+    @pytest.mark.parametrize('scored', [False, True])
+    @pytest.mark.parametrize('start', [10, 59, 60, 200])
+    def test_start_stays_within_budget(self, sample_profile, scored, start):
+        # Skipped passwords are charged to the budget, in emission order
+        full = list(_generator(sample_profile, scored=scored, budget=60).generate())
+        assert list(_generator(sample_profile, scored=scored, budget=60).generate(start=start)) == full[start:]
+
+    def test_start_with_limit(self, sample_profile):
+        full = list(_generator(sample_profile, scored=False, budget=500).generate(limit=40))
+        assert list(_generator(sample_profile, scored=False, budget=500).generate(limit=40, start=10)) == full[10:]
+
+    def test_negative_budget(self, sample_profile):
+        with pytest.raises(ValueError, match='Budget'):
+            _generator(sample_profile, budget=-1)
@@ -0,0 +1,98 @@
+"""Tests for generation profiling."""
+import tracemalloc
+
+import pytest
+
+from ccupp import generate_passwords
+from ccupp import GenerationStats
+from ccupp.extractors.components import extract_components
+from ccupp.extractors.components import LazyComponents
+from ccupp.generator import FAMILIES
+from ccupp.generator import PasswordGenerator
+from ccupp.policy import PasswordPolicy
+
+
+def test_counters_add_up(sample_profile, minimal_profile):
+    stats = GenerationStats()
+    passwords = list(generate_passwords([sample_profile, minimal_profile], stats=stats))
+    assert stats.emitted == len(passwords)
+    assert list(stats.families) == [f for f in FAMILIES if f in stats.families]
+    emitted = sum(f.emitted for f in stats.families.values())
+    assert emitted - stats.cross_profile_duplicates == len(passwords)
+    for fam in stats.families.values():
+        assert fam.candidates == fam.filtered + fam.other_shards + fam.duplicates + fam.emitted
+        assert fam.wall_time >= 0 and fam.cpu_time >= 0
+    assert stats.pinyin_calls > 0
+    assert 0 < stats.pinyin_time <= stats.extract_time <= stats.wall_time
+
+
+def test_candidates_match_estimate(sample_profile):
+    stats = GenerationStats()
+    generator = PasswordGenerator(components=LazyComponents(sample_profile))
+    list(generator.generate(stats=stats))
+    estimate = generator.estimate()
+    assert {name: fam.candidates for name, fam in stats.families.items()} == {
+        name: fam.candidates for name, fam in estimate.families.items() if fam.candidates
+    }
+
+
+def test_policy_shards_and_limit(sample_profile):
+    stats = GenerationStats()
+    policy = PasswordPolicy(min_length=8, required=frozenset({'digit'}))
+    passwords = list(
+        generate_passwords(
+            sample_profile, policy=policy, num_shards=2, shard_index=1, limit=500, stats=stats,
+        ),
+    )
+    assert stats.emitted == len(passwords) == 500
+    # The last block is cut at the limit after the family counted it
+    assert sum(f.emitted for f in stats.families.values()) >= 500
+    assert sum(f.filtered for f in stats.families.values()) > 0
+    assert sum(f.other_shards for f in stats.families.values()) > 0
+
+
+def test_workers_merge_stats(sample_profile, minimal_profile):
+    serial, parallel = GenerationStats(), GenerationStats()
+    profiles = [sample_profile, minimal_profile] * 2
+    list(generate_passwords(profiles, stats=serial))
+    list(generate_passwords(profiles, stats=parallel, workers=2))
+    counts = {n: (f.candidates, f.duplicates, f.emitted) for n, f in serial.families.items()}
+    assert counts == {n: (f.candidates, f.duplicates, f.emitted) for n, f in parallel.families.items()}
+    assert parallel.cross_profile_duplicates == serial.cross_profile_duplicates
+    assert parallel.pinyin_calls == serial.pinyin_calls
+
+
+def test_peak_memory_needs_tracemalloc(minimal_profile):
+    stats = GenerationStats()
+    list(generate_passwords(minimal_profile, stats=stats))
+    assert stats.peak_memory == 0
+    tracemalloc.start()
+    try:
+        list(generate_passwords(minimal_profile, stats=stats))
+    finally:
+        tracemalloc.stop()
+    assert stats.peak_memory > 0
+
+
+def test_extract_components_records_pinyin(sample_profile):
+    stats = GenerationStats()
+    assert extract_components(sample_profile, stats) == extract_components(sample_profile)
+    assert stats.pinyin_calls > 0
+    assert stats.extract_time >= stats.pinyin_time > 0
+
+
+def test_merge():
+    a, b = GenerationStats(), GenerationStats(pinyin_calls=2)
+    b.family('name_date').emitted = 3
+    a.merge(b)
+    a.merge(b)
+    assert (a.pinyin_calls, a.families['name_date'].emitted) == (4, 6)
+    assert a.as_dict()['families']['name_date']['emitted'] == 6
+
+
+@pytest.mark.parametrize('as_bytes', [False, True])
+def test_stats_with_bytes(minimal_profile, as_bytes):
+    stats = GenerationStats()
+    out = list(generate_passwords(minimal_profile, stats=stats, as_bytes=as_bytes))
+    assert stats.emitted == len(list(generate_passwords(minimal_profile)))
+    assert out
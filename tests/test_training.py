@@ -0,0 +1,128 @@
+"""Tests for learned rule ordering (training and weights files)."""
+import json
+
+import pytest
+
+from ccupp.benchmark.datasets import iter_paired_dataset
+from ccupp.benchmark.datasets import PairedRecord
+from ccupp.extractors.components import extract_components
+from ccupp.generator import FAMILIES
+from ccupp.generator import PasswordGenerator
+from ccupp.models import Profile
+from ccupp.training import train_order
+from ccupp.training import TrainingCounts
+from ccupp.weights import OrderWeights
+from ccupp.weights import rank_by
+
+
+def _records():
+    li = Profile(surname='李', first_name='伟', birthdate=['1990', '01', '15'])
+    wang = Profile(surname='王', first_name='芳', birthdate=['1985', '06', '02'])
+    return [
+        PairedRecord(li, 'liwei123'),
+        PairedRecord(li, 'liwei_1990'),
+        PairedRecord(wang, 'wangfang123'),
+        PairedRecord(wang, 'wangfang_19850602'),
+        PairedRecord(wang, 'not-a-guess'),
+    ]
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / 'pairs.jsonl'
+    with open(path, 'w', encoding='utf-8') as f:
+        for record in _records() * 20:
+            data = record.profile.model_dump(exclude_defaults=True)
+            f.write(json.dumps({**data, 'target_password': record.target_password}, ensure_ascii=False) + '\n')
+    return path
+
+
+class TestTrainingCounts:
+    def test_rank_matches_generation_order(self):
+        record = _records()[0]
+        output = list(PasswordGenerator(components=extract_components(record.profile)).generate())
+        assert TrainingCounts().add(record) == output.index('liwei123') + 1
+        assert TrainingCounts().add(_records()[-1]) == 0
+
+    def test_credits_family_and_entries(self):
+        counts = TrainingCounts()
+        for record in _records():
+            counts.add(record)
+        assert counts.records == 5
+        assert counts.cracked == 4
+        assert counts.hits == {'single_component_suffixed': 2, 'name_date': 2}
+        assert counts.entries['suffixes']['123'][0] == 2
+        assert counts.entries['delimiters']['_'][0] == 2
+        assert set(counts.candidates) >= {'single_component_suffixed', 'name_date', 'two_component'}
+
+    def test_weights(self):
+        counts = TrainingCounts()
+        for record in _records():
+            counts.add(record)
+        weights = counts.to_weights()
+        assert weights.suffixes == ['123']
+        assert weights.delimiters == ['_']
+        assert sorted(weights.family_order) == sorted(FAMILIES)
+        # Unexercised families keep their built-in place
+        assert weights.family_order[0] == 'old_password_variants'
+        assert weights.families['name_date'].weight > weights.families['keyboard_patterns'].weight > 0
+
+    def test_pool_matches_serial(self, dataset):
+        serial = train_order(iter_paired_dataset(dataset))
+        pooled = train_order(iter_paired_dataset(dataset), workers=2, chunk_size=7)
+        assert pooled == serial
+        assert pooled.to_weights() == serial.to_weights()
+
+
+class TestOrderWeights:
+    def test_round_trip(self, tmp_path):
+        counts = train_order(_records())
+        path = tmp_path / 'weights.json'
+        counts.to_weights().save(path)
+        assert OrderWeights.load(path) == counts.to_weights()
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'weights.json'
+        path.write_text('{"version": 99}')
+        with pytest.raises(ValueError, match='Invalid weights file'):
+            OrderWeights.load(path)
+
+    def test_rank_by_keeps_unranked_entries(self):
+        assert rank_by(['', '1', '12', '123'], ['123', 'zzz', '']) == ['123', '', '1', '12']
+
+    def test_generator_reorders(self, sample_profile):
+        components = extract_components(sample_profile)
+        weights = OrderWeights(
+            family_order=['name_date'],
+            suffixes=['520'],
+            delimiters=['_'],
+            category_pairs=[('birthdate', 'name')],
+        )
+        gen = PasswordGenerator(components=components, weights=weights)
+        plain = PasswordGenerator(components=components)
+        assert gen.suffixes[0] == '520'
+        assert gen.delimiters[0] == '_'
+        nodes = gen.compile()
+        assert nodes[0].family == 'name_date'
+        pairs = [node.sources[:2] for node in nodes if node.family == 'two_component']
+        assert pairs[0] == ('name', 'birthdate')
+        # Top-N cuts take the learned top entries
+        assert all(node.slots[2][0] == '_' for node in nodes if node.family == 'two_component')
+        assert list(gen.generate()) == list(PasswordGenerator(components=components, weights=weights).generate())
+        # Reordering families and pairs alone changes only the order
+        reordered = PasswordGenerator(
+            components=components, weights=OrderWeights(
+                family_order=['keyboard_patterns', 'name_date'], category_pairs=[('birthdate', 'name')],
+            ),
+        )
+        assert list(reordered.generate()) != list(plain.generate())
+        assert set(reordered.generate()) == set(plain.generate())
+
+    def test_family_weights(self, sample_profile):
+        weights = train_order(_records()).to_weights()
+        gen = PasswordGenerator(components=extract_components(sample_profile), weights=weights)
+        assert gen.family_weights['name_date'] == weights.families['name_date'].weight
+        gen = PasswordGenerator(
+            components=extract_components(sample_profile), weights=weights, family_weights={'name_date': 1.0},
+        )
+        assert gen.family_weights['name_date'] == 1.0
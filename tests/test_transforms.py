@@ -1,11 +1,24 @@
 """Tests for transform modules."""
+import pytest
+
 from ccupp.transforms.case import case_variants
+from ccupp.transforms.date import birth_years
+from ccupp.transforms.date import cached_date_variants
+from ccupp.transforms.date import candidate_dates
 from ccupp.transforms.date import date_variants
+from ccupp.transforms.date import DateTable
+from ccupp.transforms.date import partial_date_variants
 from ccupp.transforms.leetspeak import leetspeak
 from ccupp.transforms.leetspeak import leetspeak_variants
+from ccupp.transforms.pinyin import _convert
+from ccupp.transforms.pinyin import pinyin_cache
 from ccupp.transforms.pinyin import pinyin_variants
+from ccupp.transforms.pinyin import PinyinCache
 from ccupp.transforms.pinyin import to_pinyin
 from ccupp.transforms.pinyin import to_pinyin_initials
+from ccupp.transforms.pinyin_table import build_table
+from ccupp.transforms.pinyin_table import default_table
+from ccupp.transforms.pinyin_table import PinyinTable
 
 
 class TestPinyin:
@@ -37,6 +50,83 @@ class TestPinyin:
         assert len(variants) == len(set(variants))
 
 
+class TestPinyinCache:
+    def test_conversions_are_memoized(self):
+        to_pinyin('清华大学')
+        hits = _convert.cache_info().hits
+        assert to_pinyin_initials('清华大学') == 'qhdx'
+        assert _convert.cache_info().hits == hits + 1
+
+    def test_saves_converted_words(self, tmp_path):
+        path = tmp_path / 'cache' / 'pinyin.tsv'
+        with pinyin_cache(path) as cache:
+            assert list(pinyin_variants('北京')) == ['beijing', 'bj', 'Beijing']
+            to_pinyin('wang')
+        assert cache.get('北京') == ('beijing', 'bj')
+        # ASCII words convert to themselves and are not stored
+        assert path.read_text(encoding='utf-8') == '北京\tbeijing\tbj\n'
+
+    def test_file_entries_are_used(self, tmp_path):
+        path = tmp_path / 'pinyin.tsv'
+        path.write_text('腾讯朝阳\ttengxunzy\ttxzy\nmalformed line\n', encoding='utf-8')
+        _convert.cache_clear()
+        with pinyin_cache(path):
+            assert to_pinyin('腾讯朝阳') == 'tengxunzy'
+        _convert.cache_clear()
+        assert len(PinyinCache(path)) == 1
+
+    def test_save_merges_concurrent_writes(self, tmp_path):
+        path = tmp_path / 'pinyin.tsv'
+        ours = PinyinCache(path)
+        ours.add('李', ('li', 'l'))
+        theirs = PinyinCache(path)
+        theirs.add('王', ('wang', 'w'))
+        theirs.save()
+        ours.save()
+        assert PinyinCache(path).entries == {'李': ('li', 'l'), '王': ('wang', 'w')}
+
+    def test_unchanged_cache_is_not_rewritten(self, tmp_path):
+        path = tmp_path / 'pinyin.tsv'
+        with pinyin_cache(path):
+            pass
+        assert not path.exists()
+
+
+class TestPinyinTable:
+    def test_matches_pypinyin(self):
+        from pypinyin import lazy_pinyin
+        from pypinyin import Style
+
+        table = default_table()
+        assert table is not None
+        for word in ('李', '王明', '北京', '腾讯', '张伟', '二狗'):
+            expected = ''.join(lazy_pinyin(word)), ''.join(lazy_pinyin(word, style=Style.FIRST_LETTER))
+            assert table.lookup(word) == expected
+
+    def test_misses(self):
+        table = default_table()
+        assert table is not None
+        # Polyphonic characters, characters outside GB2312 and non-hanzi
+        assert table.lookup('重庆') is None
+        assert table.lookup('李𠀀') is None
+        assert table.lookup('李2008') is None
+
+    def test_build(self, tmp_path):
+        path = tmp_path / 'table.bin'
+        # 重 reads "chong" in the phrase 重庆, not "zhong", so it is left out
+        assert build_table(path, '李张重庆') == 3
+        table = PinyinTable(path)
+        assert len(table) == 3
+        assert table.lookup('张李') == ('zhangli', 'zl')
+        assert table.lookup('重') is None
+
+    def test_not_a_table(self, tmp_path):
+        path = tmp_path / 'table.bin'
+        path.write_bytes(b'\0' * 64)
+        with pytest.raises(ValueError, match='pinyin table'):
+            PinyinTable(path)
+
+
 class TestDateVariants:
     def test_basic_date(self):
         variants = list(date_variants('1983', '09', '24'))
@@ -70,6 +160,58 @@ class TestDateVariants:
         assert len(variants) == len(set(variants))
 
 
+class TestDateTable:
+    def test_matches_date_variants(self):
+        table = DateTable(1980, 1985)
+        for year, month, day in ((1980, 1, 1), (1983, 9, 24), (1985, 12, 31), (1984, 2, 30)):
+            expected = tuple(date_variants(f'{year}', f'{month:02d}', f'{day:02d}'))
+            assert table.variants(year, month, day) == expected
+        # Formatted once, then shared
+        assert table.variants(1983, 9, 24) is table.variants(1983, 9, 24)
+
+    def test_out_of_range(self):
+        table = DateTable(1980, 1985)
+        assert (1979, 1, 1) not in table
+        assert (1980, 13, 1) not in table
+        assert table.get(1986, 1, 1) is None
+        with pytest.raises(KeyError):
+            table.variants(1980, 1, 32)
+        with pytest.raises(ValueError, match='year range'):
+            DateTable(1990, 1980)
+
+    def test_cached_date_variants(self):
+        assert cached_date_variants('1983', '09', '24') == tuple(date_variants('1983', '09', '24'))
+        # Unpadded or out-of-range dates are formatted as given
+        assert cached_date_variants('1990', '1', '1') == tuple(date_variants('1990', '1', '1'))
+        assert cached_date_variants('1890', '01', '01') == tuple(date_variants('1890', '01', '01'))
+
+
+class TestPartialDates:
+    def test_birth_years(self):
+        import datetime
+
+        assert birth_years('1990', (1980, 1985), 30) == [1990]
+        assert birth_years('', (1992, 1988)) == [1990, 1989, 1991, 1988, 1992]
+        assert birth_years(age=30, today=datetime.date(2024, 2, 1)) == [1993, 1994]
+        assert birth_years(age=30, today=datetime.date(2024, 11, 1)) == [1994, 1993]
+        assert birth_years('90') == []
+
+    def test_candidate_dates(self):
+        dates = list(candidate_dates([2000, 1999], month=2))
+        assert dates[0] == (2000, 2, 1)
+        assert len(dates) == 29 + 28
+        assert len(list(candidate_dates([2001]))) == 365
+
+    def test_partial_variants_order(self):
+        variants = partial_date_variants([1990], month=9)
+        assert [next(variants) for _ in range(4)] == ['1990', '90', '199009', '9009']
+        rest = list(variants)
+        assert '19900901' in rest
+        assert '19900930' in rest
+        assert '19901001' not in rest
+        assert len(rest) == len(set(rest))
+
+
 class TestLeetspeak:
     def test_leetspeak(self):
         assert leetspeak('password') == 'p@$$w0rd'